@@ -0,0 +1,232 @@
+from google.adk.agents.remote_a2a_agent import RemoteA2aAgent, AgentCardResolutionError
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from a2a.client.card_resolver import A2ACardResolver
+from a2a.client.client import ClientConfig as A2AClientConfig
+from a2a.client.client_factory import ClientFactory as A2AClientFactory
+from a2a.types import AgentCard, TransportProtocol
+
+import time
+import asyncio
+import contextvars
+from typing import Any, AsyncGenerator, Optional, Sequence
+from urllib.parse import urlparse
+
+import httpx
+
+# Connection pool of the shared A2A client, for every host unless host_limits says otherwise
+A2A_MAX_CONNECTIONS_PER_HOST = 32
+A2A_MAX_KEEPALIVE_CONNECTIONS_PER_HOST = 16
+A2A_KEEPALIVE_EXPIRY_SECONDS = 30.0
+
+# db_agent answers take several model calls, so reads can be slow; connecting should not be
+A2A_TIMEOUT_SECONDS = 600.0
+A2A_CONNECT_TIMEOUT_SECONDS = 5.0
+
+# Agent cards are fetched again after this time, so a redeployed server's card is picked up
+AGENT_CARD_TTL_SECONDS = 300.0
+
+
+def a2a_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=A2A_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=A2A_MAX_KEEPALIVE_CONNECTIONS_PER_HOST,
+        keepalive_expiry=A2A_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def base_url(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class A2AHttpClient:
+    """
+    One pooled keep-alive httpx.AsyncClient for all calls to A2A servers,
+    with a TTL cache of their agent cards.
+    Every host in host_limits gets its own connection pool with these limits,
+    other hosts share a pool with default limits.
+    """
+
+    def __init__(
+            self,
+            host_limits: Optional[dict[str, httpx.Limits]] = None,
+            default_limits: Optional[httpx.Limits] = None,
+            timeout: float = A2A_TIMEOUT_SECONDS,
+            connect_timeout: float = A2A_CONNECT_TIMEOUT_SECONDS,
+            card_ttl_seconds: float = AGENT_CARD_TTL_SECONDS,
+        ) -> None:
+        self.card_ttl_seconds = card_ttl_seconds
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=default_limits or a2a_limits(),
+            mounts={
+                f"{base_url(host)}/": httpx.AsyncHTTPTransport(limits=limits)
+                for host, limits in (host_limits or {}).items()
+            },
+        )
+
+        # Card URL -> (card, monotonic time it was fetched)
+        self._cards: dict[str, tuple[AgentCard, float]] = {}
+        self._card_locks: dict[str, asyncio.Lock] = {}
+        self._card_hits = 0
+        self._card_fetches = 0
+
+    def _cached_card(self, card_url: str) -> Optional[AgentCard]:
+        cached = self._cards.get(card_url)
+        if cached is not None and time.monotonic() - cached[1] < self.card_ttl_seconds:
+            return cached[0]
+        return None
+
+    async def get_agent_card(self, card_url: str) -> AgentCard:
+        """
+        Return the agent card from card_url, fetching it only when the cached one is older than the TTL
+        """
+
+        card = self._cached_card(card_url)
+        if card is not None:
+            self._card_hits += 1
+            return card
+
+        # Concurrent sessions wait for one fetch instead of all fetching the card
+        lock = self._card_locks.setdefault(card_url, asyncio.Lock())
+        async with lock:
+            card = self._cached_card(card_url)
+            if card is not None:
+                self._card_hits += 1
+                return card
+
+            resolver = A2ACardResolver(httpx_client=self.client, base_url=base_url(card_url))
+            card = await resolver.get_agent_card(relative_card_path=urlparse(card_url).path)
+            self._cards[card_url] = (card, time.monotonic())
+            self._card_fetches += 1
+            return card
+
+    def invalidate_agent_card(self, card_url: str) -> None:
+        self._cards.pop(card_url, None)
+
+    async def check_agent(self, card_url: str) -> Optional[str]:
+        """
+        Fetch a fresh agent card to check that the A2A server is up. Returns None if it is, otherwise the error.
+        """
+
+        self.invalidate_agent_card(card_url)
+        try:
+            await self.get_agent_card(card_url)
+        except Exception as e:
+            return str(e)
+        return None
+
+    def client_factory(self) -> A2AClientFactory:
+        return A2AClientFactory(
+            config=A2AClientConfig(
+                httpx_client=self.client,
+                streaming=False,
+                polling=False,
+                supported_transports=[TransportProtocol.jsonrpc],
+            )
+        )
+
+    def stats(self) -> dict:
+        return {
+            "cards": len(self._cards),
+            "card_hits": self._card_hits,
+            "card_fetches": self._card_fetches,
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+# A2A request metadata of the request being sent in the current task (see PooledRemoteA2aAgent)
+_request_metadata: contextvars.ContextVar[Optional[dict[str, Any]]] = contextvars.ContextVar(
+    "a2a_request_metadata", default=None
+)
+
+
+class _RequestMetadataClient:
+    """
+    A2A client that attaches the current task's request metadata to the messages it sends
+    """
+
+    def __init__(self, client) -> None:
+        self._client = client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    async def send_message(self, request, **kwargs) -> AsyncGenerator:
+        if kwargs.get("request_metadata") is None:
+            kwargs["request_metadata"] = _request_metadata.get()
+        async for response in self._client.send_message(request=request, **kwargs):
+            yield response
+
+
+class PooledRemoteA2aAgent(RemoteA2aAgent):
+    """
+    RemoteA2aAgent that sends its requests with a shared A2AHttpClient
+    and takes its agent card from the client's TTL cache.
+    Session state values under state_metadata_keys are sent as A2A request metadata under the same keys,
+    the server's ADK runner passes them in run_config.custom_metadata["a2a_metadata"] and db_agent's
+    DBAgentPlugin saves them in its session state.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            agent_card: str,
+            http_client: "A2AHttpClient",
+            description: str = "",
+            state_metadata_keys: Sequence[str] = (),
+        ) -> None:
+        super().__init__(
+            name=name,
+            agent_card=agent_card,
+            description=description,
+            a2a_client_factory=http_client.client_factory(),
+        )
+        self._http_client = http_client
+        self._state_metadata_keys = tuple(state_metadata_keys)
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        metadata = {key: ctx.session.state[key] for key in self._state_metadata_keys if ctx.session.state.get(key)}
+        # The context variable is local to the asyncio task running the session, so concurrent sessions are kept apart
+        _request_metadata.set(metadata or None)
+        async for event in super()._run_async_impl(ctx):
+            yield event
+
+    async def _ensure_resolved(self) -> None:
+        try:
+            card = await self._http_client.get_agent_card(self._agent_card_source)
+        except Exception as e:
+            raise AgentCardResolutionError(f"Failed to resolve AgentCard from URL {self._agent_card_source}: {e}") from e
+        if card is not self._agent_card:
+            # First call, or the cached card was fetched again after its TTL
+            await self._validate_agent_card(card)
+            self._agent_card = card
+            self._a2a_client = None
+            self._is_resolved = False
+        await super()._ensure_resolved()
+        if not isinstance(self._a2a_client, _RequestMetadataClient):
+            self._a2a_client = _RequestMetadataClient(self._a2a_client)
+
+
+_a2a_http_client: Optional[A2AHttpClient] = None
+
+
+def get_a2a_http_client() -> A2AHttpClient:
+    """
+    Return the process-wide A2A client, shared by all remote agents and health checks
+    """
+
+    global _a2a_http_client
+    if _a2a_http_client is None:
+        _a2a_http_client = A2AHttpClient()
+    return _a2a_http_client
+
+
+async def close_a2a_http_client() -> None:
+    global _a2a_http_client
+    if _a2a_http_client is not None:
+        await _a2a_http_client.aclose()
+        _a2a_http_client = None
@@ -1,21 +1,29 @@
 from google.adk.agents import BaseAgent, Agent, SequentialAgent
-from google.adk.models.google_llm import Gemini
-from google.genai import types
+from google.adk.models.base_llm import BaseLlm
 from google.adk.tools import AgentTool
 from google.adk.plugins.base_plugin import BasePlugin
 from google.adk.agents.callback_context import CallbackContext
 from google.adk.agents.invocation_context import InvocationContext
-from google.adk.agents.remote_a2a_agent import (
-    RemoteA2aAgent,
-    AGENT_CARD_WELL_KNOWN_PATH,
-)
+from google.adk.agents.remote_a2a_agent import AGENT_CARD_WELL_KNOWN_PATH
+
+from booskshop_agent.a2a_client import A2AHttpClient, PooledRemoteA2aAgent, get_a2a_http_client
+from booskshop_agent.response_cache import ResponseCache
+from db_agent.db_agent import DISLIKES_STATE_KEY, get_db_agent, get_default_model
 
 import os
 import logging
-from typing import Optional
+from typing import Optional, Union
+
+# Address of the db_agent A2A server (see scripts/a2a_db_agent.py)
+DB_AGENT_URL = "http://localhost:8001"
+DB_AGENT_CARD_URL = f"{DB_AGENT_URL}{AGENT_CARD_WELL_KNOWN_PATH}"
+
+# "remote" reaches the db_agent A2A server over HTTP, "in_process" runs the db_agent in this process
+DB_AGENT_TRANSPORTS = ("remote", "in_process")
+DB_AGENT_TRANSPORT_ENV = "DB_AGENT_TRANSPORT"
 
 class BookshopAgentPlugin(BasePlugin):
-    def __init__(self, log_level=logging.INFO, log_console=True) -> None:
+    def __init__(self, log_level=logging.INFO, log_console=True, response_cache: Optional[ResponseCache] = None) -> None:
         super().__init__(name="bookshop_agent_plugin")
         os.makedirs("logs", exist_ok=True)
 
@@ -38,6 +46,8 @@ class BookshopAgentPlugin(BasePlugin):
                 handler.setFormatter(formatter)
                 self.logger.addHandler(handler)
 
+        self.response_cache = response_cache
+
     async def before_run_callback(
       self, 
       *, 
@@ -52,61 +62,91 @@ class BookshopAgentPlugin(BasePlugin):
     ) -> None:
         self.logger.info(f"[BookshopAgentPlugin] Agent {invocation_context.agent.name} returned the answer.")
 
+        if self.response_cache is not None:
+            stats = self.response_cache.stats()
+            self.logger.info(
+                f"[BookshopAgentPlugin] Response cache hit rate: {stats['hit_rate']:.1%} "
+                f"({stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries)"
+            )
 
-def get_bookshop_agent():
-    remote_db_agent = RemoteA2aAgent(
-        name="db_agent",
-        description="Remote agent that queries the BOOKS database for titles matching the user's request.",
-        agent_card=f"http://localhost:8001{AGENT_CARD_WELL_KNOWN_PATH}",
-    )
+
+def db_agent_transport_from_env() -> str:
+    """
+    db_agent transport set with DB_AGENT_TRANSPORT (remote by default)
+    """
+
+    transport = os.getenv(DB_AGENT_TRANSPORT_ENV, "remote")
+    if transport not in DB_AGENT_TRANSPORTS:
+        raise ValueError(f"{DB_AGENT_TRANSPORT_ENV} must be one of {DB_AGENT_TRANSPORTS}, got {transport!r}")
+    return transport
+
+
+def get_bookshop_agent(
+        model: Optional[Union[str, BaseLlm]] = None,
+        db_agent_transport: str = "remote",
+        a2a_http_client: Optional[A2AHttpClient] = None,
+    ):
+    """
+    Create the bookshop agents system. By default its agents use Gemini, pass another model
+    (e.g. stand_in_llm.StandInLlm for offline load tests) to replace it.
+
+    With db_agent_transport="remote" search_agent calls the db_agent A2A server at DB_AGENT_URL
+    through a2a_http_client (the process-wide pooled client by default).
+    With "in_process" the db_agent runs in this process, which saves the HTTP round trip when
+    both run on the same host. Add DBAgentPlugin to the Runner to log its queries in that case.
+    Add DislikeProfilePlugin to the Runner so db_agent excludes what the user said they dislike.
+    """
+
+    if db_agent_transport not in DB_AGENT_TRANSPORTS:
+        raise ValueError(f"db_agent_transport must be one of {DB_AGENT_TRANSPORTS}, got {db_agent_transport!r}")
+
+    if db_agent_transport == "remote":
+        db_agent = PooledRemoteA2aAgent(
+            name="db_agent",
+            description="Remote agent that queries the BOOKS database for titles matching the user's request.",
+            agent_card=DB_AGENT_CARD_URL,
+            http_client=a2a_http_client or get_a2a_http_client(),
+            # The dislike profile is applied by query_books_db (see DislikeProfilePlugin)
+            state_metadata_keys=(DISLIKES_STATE_KEY,),
+        )
+    else:
+        # AgentTool runs it like the A2A server would: a new session per call, with only the request as the user message
+        db_agent = get_db_agent(model=model)
+
+    if model is None:
+        model = get_default_model()
 
     search_agent = Agent(
         name="search_agent",
-        model=Gemini(
-            model="gemini-2.5-flash-lite", 
-            retry_options=types.HttpRetryOptions(
-                attempts=5, 
-                exp_base=7,  
-                initial_delay=1,
-                http_status_codes=[429, 500, 503, 504]
-            )
-        ),
-        description="Agent that receives user request, modifies it using memory, and delegates the query to db_agent.",
+        model=model,
+        description="Agent that receives user request and delegates the query to db_agent.",
         instruction="""
         You are a bookshop search assistant.
 
         Task:
-        1. Use session memory to modify the user’s original request.
-           Example: if earlier the user said they dislike politics, add this as a constraint.
-        2. Call db_agent with the modified search prompt.
-        3. Return your final output in this format:
+        1. Call db_agent with the user's request.
+           If the user asks for more books of the previous search, call db_agent with
+           "More books for results cursor <cursor>" instead, using the "More results cursor" of your last Books search.
+        2. Return your final output in this format:
 
            Books search: <result returned by db_agent>
            User prompt: <original user prompt>
 
         Important rule:
-        - Only modify the prompt using things the user *dislikes*.
-          Do NOT add things the user likes or was searching beforehand to the modified query.
+        - Do NOT add anything from earlier messages to the request, including the user's dislikes.
+          db_agent already excludes everything the user said they dislike.
 
         Guidelines:
         - Start the search immediately after receiving a request.
         - Never ask the user for clarification.
         """,
-        tools=[AgentTool(remote_db_agent)],
+        tools=[AgentTool(db_agent)],
         output_key="book_search",
     )
 
     recommend_agent = Agent(
         name="recommend_agent",
-        model=Gemini(
-            model="gemini-2.5-flash-lite",
-            retry_options=types.HttpRetryOptions(
-                attempts=5, 
-                exp_base=7,  
-                initial_delay=1,
-                http_status_codes=[429, 500, 503, 504]
-            )
-        ),
+        model=model,
         description="Agent that selects top book recommendations.",
         instruction="""
         You are a book recommendation assistant.
@@ -0,0 +1,114 @@
+from google.genai import types
+from google.adk.agents import BaseAgent
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.agents.callback_context import CallbackContext
+
+from db_agent.books_db import BOOKS_DB_PATH, books_db_generation
+from db_agent.db_agent import DISLIKES_STATE_KEY, DISLIKE_FIELDS
+from db_agent.fast_path import BooksVocabulary, extract_preference_changes, get_books_vocabulary
+
+import asyncio
+import sqlite3
+import logging
+from typing import Optional
+
+# Values kept per excluded field, the oldest are dropped first
+DISLIKE_PROFILE_MAX_VALUES = 20
+
+def extract_dislikes(message: str, vocabulary: BooksVocabulary) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+    """
+    Catalog categories and authors the user says they dislike in a message, and the dislikes they take back.
+    Exclusions are never relaxed, so only what the catalog knows and directly follows a dislike cue is taken.
+    """
+
+    disliked, liked = extract_preference_changes(message, vocabulary)
+    return (
+        {name: disliked[name] for name in DISLIKE_FIELDS if disliked.get(name)},
+        {name: liked[name] for name in DISLIKE_FIELDS if liked.get(name)},
+    )
+
+
+def merge_dislikes(
+        profile: dict[str, list[str]],
+        dislikes: dict[str, list[str]],
+        retracted: Optional[dict[str, list[str]]] = None,
+    ) -> Optional[dict[str, list[str]]]:
+    """
+    Return the profile updated with new dislikes and without the retracted ones,
+    or None if that doesn't change the profile
+    """
+
+    merged = {name: list(profile.get(name, [])) for name in DISLIKE_FIELDS}
+    changed = False
+    for name, values in (retracted or {}).items():
+        removed = {v.casefold() for v in values}
+        kept = [v for v in merged[name] if v.casefold() not in removed]
+        changed = changed or len(kept) != len(merged[name])
+        merged[name] = kept
+    for name, values in dislikes.items():
+        known = {v.casefold() for v in merged[name]}
+        for value in values:
+            if value.casefold() not in known:
+                merged[name].append(value)
+                known.add(value.casefold())
+                changed = True
+        merged[name] = merged[name][-DISLIKE_PROFILE_MAX_VALUES:]
+
+    if not changed:
+        return None
+    return {name: values for name, values in merged.items() if values}
+
+
+class DislikeProfilePlugin(BasePlugin):
+    """
+    Keeps the user's dislikes as a structured profile in the session state (DISLIKES_STATE_KEY),
+    updated from every user message that expresses or takes back a dislike. db_agent adds the profile's exclusions
+    to its searches, so search_agent doesn't have to rewrite the request from the conversation history.
+    Add it before ResponseCachePlugin, so cached responses are looked up with the updated profile.
+    """
+
+    def __init__(self, agent_name: str = "book_search_agent_system") -> None:
+        super().__init__(name="dislike_profile_plugin")
+        self.agent_name = agent_name
+        self.logger = logging.getLogger("bookshop_agent_logger")
+        self._missing_catalog_logged = False
+
+    async def vocabulary(self) -> Optional[BooksVocabulary]:
+        """
+        Vocabulary of the local books database, loaded on a worker thread so the event loop isn't blocked.
+        None if the bookshop runs without a local books database (remote db_agent on another host).
+        """
+
+        try:
+            if books_db_generation(BOOKS_DB_PATH) is not None:
+                return await asyncio.to_thread(get_books_vocabulary)
+        except sqlite3.Error as e:
+            self.logger.warning(f"[DislikeProfilePlugin] Can't read the books database: {e}")
+        if not self._missing_catalog_logged:
+            self.logger.warning("[DislikeProfilePlugin] No local books database, dislikes can't be checked and aren't kept")
+            self._missing_catalog_logged = True
+        return None
+
+    async def before_agent_callback(
+        self,
+        *,
+        agent: BaseAgent,
+        callback_context: CallbackContext
+    ) -> Optional[types.Content]:
+        if agent.name != self.agent_name or not callback_context.user_content:
+            return None
+
+        message = " ".join(part.text for part in callback_context.user_content.parts or [] if part.text)
+        vocabulary = await self.vocabulary()
+        if vocabulary is None:
+            return None
+        dislikes, retracted = extract_dislikes(message, vocabulary)
+        if not dislikes and not retracted:
+            return None
+
+        profile = merge_dislikes(callback_context.state.get(DISLIKES_STATE_KEY) or {}, dislikes, retracted)
+        if profile is not None:
+            self.logger.info(f"[DislikeProfilePlugin] Updated dislikes: {profile}")
+            # ADK saves the state delta of before_agent callbacks in an event of the agent
+            callback_context.state[DISLIKES_STATE_KEY] = profile
+        return None
@@ -0,0 +1,236 @@
+from google.genai import types
+from google.adk.agents import BaseAgent
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.sessions import Session
+
+from db_agent.db_agent import DISLIKES_STATE_KEY
+from db_agent.fast_path import extract_cursor
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+RESPONSE_CACHE_DB_PATH = "db/bookshop_response_cache.db"
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+RESPONSE_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Session state keys (and DISLIKES_STATE_KEY with the structured dislike profile)
+# User messages with dislikes from turns removed by session compaction (booskshop_agent/session_compaction.py)
+EARLIER_DISLIKES_STATE_KEY = "earlier_dislikes"
+RESPONSE_STATE_KEY = "book_search_response"
+
+# Requests that continue the previous search of the session ("show me more", "anything else?").
+# Their answer depends on that search, so they are neither served from nor put in the cache
+CONTINUATION_PATTERN = re.compile(r"\b(more|another|next|other|others|else)\b", re.IGNORECASE)
+
+# Earlier user messages with these words may carry dislikes that search_agent adds to the prompt
+DISLIKE_CUES = {
+    "no", "not", "nothing", "without", "hate", "dislike", "don't", "dont", "never",
+    "avoid", "except", "none", "boring", "stop",
+}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(_WORD_PATTERN.findall(prompt.lower().replace("’", "'")))
+
+
+def is_continuation(prompt: str) -> bool:
+    """
+    Whether the prompt asks for more books of the previous search (in words or with its cursor)
+    """
+
+    return bool(CONTINUATION_PATTERN.search(prompt)) or extract_cursor(prompt) is not None
+
+
+def dislikes_fingerprint(session: Session, invocation_id: str) -> str:
+    """
+    Fingerprint of what the session knows about the user's dislikes.
+    Uses the structured dislikes from the session state if present, otherwise
+    the earlier user messages that may express a dislike (including the ones compacted into the state).
+    """
+
+    if session.state.get(DISLIKES_STATE_KEY):
+        payload = json.dumps(session.state[DISLIKES_STATE_KEY], sort_keys=True)
+    else:
+        messages = {normalize_prompt(text) for text in session.state.get(EARLIER_DISLIKES_STATE_KEY, [])}
+        for event in session.events:
+            if event.author != "user" or event.invocation_id == invocation_id or not event.content:
+                continue
+            text = " ".join(part.text for part in event.content.parts or [] if part.text)
+            message = normalize_prompt(text)
+            if DISLIKE_CUES & set(message.split()):
+                messages.add(message)
+        payload = json.dumps(sorted(messages))
+
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Bounded cache with TTL of final book_search_agent_system responses, persisted in an SQLite table
+    so it survives restarts. Least recently used entries are removed when the cache is full.
+    """
+
+    def __init__(
+            self,
+            db_path: str = RESPONSE_CACHE_DB_PATH,
+            max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        ) -> None:
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS RESPONSE_CACHE
+            (
+                KEY TEXT PRIMARY KEY NOT NULL,
+                RESPONSE TEXT NOT NULL,
+                CREATED REAL NOT NULL,
+                LAST_USED REAL NOT NULL
+            );
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS IX_RESPONSE_CACHE_LAST_USED ON RESPONSE_CACHE (LAST_USED);")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, dislikes: str) -> str:
+        return hashlib.sha1(f"{normalize_prompt(prompt)}\n{dislikes}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT RESPONSE, CREATED FROM RESPONSE_CACHE WHERE KEY = ?;", (key,)
+            ).fetchone()
+
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM RESPONSE_CACHE WHERE KEY = ?;", (key,))
+                row = None
+
+            if row is None:
+                self._misses += 1
+                return None
+
+            self._conn.execute("UPDATE RESPONSE_CACHE SET LAST_USED = ? WHERE KEY = ?;", (now, key))
+            self._hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO RESPONSE_CACHE (KEY, RESPONSE, CREATED, LAST_USED) VALUES (?, ?, ?, ?);",
+                (key, response, now, now)
+            )
+            self._conn.execute(
+                """
+                    DELETE FROM RESPONSE_CACHE WHERE KEY IN (
+                        SELECT KEY FROM RESPONSE_CACHE ORDER BY LAST_USED DESC LIMIT -1 OFFSET ?
+                    );
+                """,
+                (self.max_entries,)
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            entries = self._conn.execute("SELECT COUNT(*) FROM RESPONSE_CACHE;").fetchone()[0]
+            return {
+                "entries": entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCachePlugin(BasePlugin):
+    """
+    Returns a cached response for a repeated prompt (with the same known dislikes)
+    before book_search_agent_system starts, skipping all of its LLM calls.
+    Requests for more books of the previous search depend on the session and are never cached (see is_continuation).
+    """
+
+    def __init__(
+            self,
+            cache: ResponseCache,
+            agent_name: str = "book_search_agent_system",
+            response_author: str = "recommend_agent",
+        ) -> None:
+        super().__init__(name="response_cache_plugin")
+        self.cache = cache
+        self.agent_name = agent_name
+        self.response_author = response_author
+        self.logger = logging.getLogger("bookshop_agent_logger")
+        # Cache keys of runs that missed the cache, by invocation
+        self.pending_keys: dict[str, str] = {}
+
+    async def before_agent_callback(
+        self,
+        *,
+        agent: BaseAgent,
+        callback_context: CallbackContext
+    ) -> Optional[types.Content]:
+        if agent.name != self.agent_name or not callback_context.user_content:
+            return None
+
+        prompt = " ".join(part.text for part in callback_context.user_content.parts or [] if part.text)
+        if is_continuation(prompt):
+            return None
+        dislikes = dislikes_fingerprint(callback_context.session, callback_context.invocation_id)
+        key = self.cache.make_key(prompt, dislikes)
+
+        response = self.cache.get(key)
+        if response is None:
+            self.pending_keys[callback_context.invocation_id] = key
+            return None
+
+        self.logger.info("[ResponseCachePlugin] Returning cached response")
+        callback_context.state[RESPONSE_STATE_KEY] = response
+        return types.Content(role="model", parts=[types.Part(text=response)])
+
+    async def after_agent_callback(
+        self,
+        *,
+        agent: BaseAgent,
+        callback_context: CallbackContext
+    ) -> Optional[types.Content]:
+        if agent.name != self.agent_name:
+            return None
+
+        key = self.pending_keys.pop(callback_context.invocation_id, None)
+        if key is None:
+            return None
+
+        # Only a response produced by this run is cached (the state may still hold the previous one)
+        for event in reversed(callback_context.session.events):
+            if (event.invocation_id == callback_context.invocation_id
+                and event.author == self.response_author
+                and event.is_final_response()
+                and event.content
+            ):
+                response = "".join(part.text for part in event.content.parts or [] if part.text)
+                if response:
+                    self.cache.put(key, response)
+                break
+        return None
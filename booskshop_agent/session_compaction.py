@@ -0,0 +1,168 @@
+from google.adk.events import Event, EventActions
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.sessions.database_session_service import DatabaseSessionService
+
+from booskshop_agent.response_cache import DISLIKE_CUES, EARLIER_DISLIKES_STATE_KEY, normalize_prompt
+
+import json
+import logging
+from sqlalchemy import text
+
+# A session is compacted when it has more user turns than this,
+# and only the most recent SESSION_RECENT_TURNS turns are kept in the events table
+SESSION_COMPACTION_MAX_TURNS = 20
+SESSION_RECENT_TURNS = 10
+
+# Compacted events are moved to this table (same columns as the ADK events table)
+SESSION_EVENTS_ARCHIVE_TABLE = "events_archive"
+
+# What the compacted turns carried is kept in the session state: messages with the user's dislikes
+# (see EARLIER_DISLIKES_STATE_KEY) and the number of compacted turns
+EARLIER_DISLIKES_MAX = 20
+COMPACTED_TURNS_STATE_KEY = "compacted_turns"
+
+class SessionCompactor:
+    """
+    Keeps DatabaseSessionService sessions short: when a session has more than max_turns user turns,
+    events older than the last recent_turns turns are moved to an archive table, and the user messages
+    among them that express dislikes are folded into the session state.
+    Session fetch time and the history given to the agents then stay flat however long the session is.
+    """
+
+    def __init__(
+            self,
+            session_service: DatabaseSessionService,
+            max_turns: int = SESSION_COMPACTION_MAX_TURNS,
+            recent_turns: int = SESSION_RECENT_TURNS,
+        ) -> None:
+        if not 0 < recent_turns <= max_turns:
+            raise ValueError("recent_turns must be positive and not greater than max_turns")
+
+        self.session_service = session_service
+        self.max_turns = max_turns
+        self.recent_turns = recent_turns
+        self.logger = logging.getLogger("bookshop_agent_logger")
+
+        self._compactions = 0
+        self._archived_events = 0
+
+        with session_service.db_engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {SESSION_EVENTS_ARCHIVE_TABLE} AS SELECT * FROM events WHERE 1 = 0;"
+            ))
+            # get_session filters and orders events by session and timestamp, which the primary key doesn't cover
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_events_session_timestamp "
+                "ON events (app_name, user_id, session_id, timestamp);"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{SESSION_EVENTS_ARCHIVE_TABLE}_session_timestamp "
+                f"ON {SESSION_EVENTS_ARCHIVE_TABLE} (app_name, user_id, session_id, timestamp);"
+            ))
+
+    async def maybe_compact(self, app_name: str, user_id: str, session_id: str, author: str = "session_compaction") -> int:
+        """
+        Compact the session if it has too many turns. Returns the number of archived events.
+        The state change is stored as an event of author, which should be the root agent's name
+        when the session is run by a Runner (it picks the agent to run from the authors of the events).
+        """
+
+        session_filter = "app_name = :app_name AND user_id = :user_id AND session_id = :session_id"
+        params = {"app_name": app_name, "user_id": user_id, "session_id": session_id}
+
+        with self.session_service.db_engine.begin() as conn:
+            turns = conn.execute(
+                text(f"SELECT COUNT(*) FROM events WHERE {session_filter} AND author = 'user';"),
+                params
+            ).scalar()
+            if turns <= self.max_turns:
+                return 0
+
+            # The oldest user message that stays in the session
+            cutoff = conn.execute(
+                text(
+                    f"SELECT timestamp FROM events WHERE {session_filter} AND author = 'user' "
+                    "ORDER BY timestamp DESC LIMIT 1 OFFSET :offset;"
+                ),
+                {**params, "offset": self.recent_turns - 1}
+            ).scalar()
+            params["cutoff"] = cutoff
+
+            old_messages = conn.execute(
+                text(
+                    f"SELECT content FROM events WHERE {session_filter} AND author = 'user' "
+                    "AND timestamp < :cutoff ORDER BY timestamp;"
+                ),
+                params
+            ).scalars().all()
+
+            conn.execute(
+                text(
+                    f"INSERT INTO {SESSION_EVENTS_ARCHIVE_TABLE} "
+                    f"SELECT * FROM events WHERE {session_filter} AND timestamp < :cutoff;"
+                ),
+                params
+            )
+            archived = conn.execute(
+                text(f"DELETE FROM events WHERE {session_filter} AND timestamp < :cutoff;"),
+                params
+            ).rowcount
+
+        session = await self.session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        dislikes = list(session.state.get(EARLIER_DISLIKES_STATE_KEY, []))
+        for content in old_messages:
+            message = self._message_text(content)
+            if message and DISLIKE_CUES & set(normalize_prompt(message).split()) and message not in dislikes:
+                dislikes.append(message)
+
+        await self.session_service.append_event(
+            session,
+            Event(
+                author=author,
+                actions=EventActions(state_delta={
+                    EARLIER_DISLIKES_STATE_KEY: dislikes[-EARLIER_DISLIKES_MAX:],
+                    COMPACTED_TURNS_STATE_KEY: session.state.get(COMPACTED_TURNS_STATE_KEY, 0) + turns - self.recent_turns,
+                }),
+            )
+        )
+
+        self._compactions += 1
+        self._archived_events += archived
+        self.logger.info(f"[SessionCompactor] Archived {archived} events of session {session_id}")
+        return archived
+
+    @staticmethod
+    def _message_text(content) -> str:
+        # The content column is JSON, returned as a string or a dict depending on the database
+        if isinstance(content, str):
+            content = json.loads(content)
+        if not content:
+            return ""
+        return " ".join(part.get("text") or "" for part in content.get("parts") or []).strip()
+
+    def stats(self) -> dict:
+        return {
+            "compactions": self._compactions,
+            "archived_events": self._archived_events,
+        }
+
+
+class SessionCompactionPlugin(BasePlugin):
+    """
+    Compacts the session after every run of the agents (see SessionCompactor)
+    """
+
+    def __init__(self, compactor: SessionCompactor) -> None:
+        super().__init__(name="session_compaction_plugin")
+        self.compactor = compactor
+
+    async def after_run_callback(
+        self,
+        *,
+        invocation_context: InvocationContext
+    ) -> None:
+        session = invocation_context.session
+        await self.compactor.maybe_compact(
+            session.app_name, session.user_id, session.id, author=invocation_context.agent.root_agent.name
+        )
@@ -0,0 +1,179 @@
+import sqlite3
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+
+AGENT_DATA_DB_PATH = "db/db_agent_data.db"
+AGENT_DATA_TABLES = ("SUCCESSES", "FAILURES")
+
+# Records are written in batches of up to WRITER_BATCH_SIZE rows or every WRITER_FLUSH_INTERVAL seconds
+WRITER_QUEUE_SIZE = 10000
+WRITER_BATCH_SIZE = 500
+WRITER_FLUSH_INTERVAL = 1.0
+
+_STOP = object()
+
+logger = logging.getLogger("db_agent_logger")
+
+
+def create_agent_data_tables(conn: sqlite3.Connection) -> None:
+    for table in AGENT_DATA_TABLES:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table}
+            (
+                ID INTEGER PRIMARY KEY NOT NULL,
+                DATE TEXT NOT NULL,
+                USER_QUERY TEXT NOT NULL,
+                FUNC_ARGUMENTS TEXT NOT NULL
+            );
+        ''')
+    conn.commit()
+
+
+class AgentDataWriter:
+    """
+    Background writer for the SUCCESSES/FAILURES tables of the db_agent data database.
+    Records are put on a bounded queue (dropped when it's full, so the request path never waits)
+    and a worker thread inserts them in batched transactions in WAL mode.
+    """
+
+    def __init__(
+            self,
+            db_path: str = AGENT_DATA_DB_PATH,
+            queue_size: int = WRITER_QUEUE_SIZE,
+            batch_size: int = WRITER_BATCH_SIZE,
+            flush_interval: float = WRITER_FLUSH_INTERVAL,
+        ) -> None:
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self._queued = 0
+        self._dropped = 0
+        self._flushed = 0
+        self._failed = 0
+        self._batches = 0
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="agent_data_writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def write(self, table: str, date: str, user_query: str, func_arguments: str) -> bool:
+        """
+        Queue a record for the given table. Returns False if the record was dropped.
+        """
+
+        if table not in AGENT_DATA_TABLES:
+            raise ValueError(f"Unknown table: {table}. Use one of {AGENT_DATA_TABLES}")
+
+        if self._closed:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+        self._start()
+        try:
+            self._queue.put_nowait((table, date, user_query, func_arguments))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+        with self._lock:
+            self._queued += 1
+        return True
+
+    def _run(self) -> None:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        create_agent_data_tables(conn)
+
+        stop = False
+        while not stop:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                    break
+                batch.append(record)
+
+            if stop:
+                # Take everything that was queued before close()
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is not _STOP:
+                        batch.append(record)
+
+            if batch:
+                self._flush(conn, batch)
+
+        conn.close()
+
+    def _flush(self, conn: sqlite3.Connection, batch: list[tuple]) -> None:
+        try:
+            with conn:
+                for table in AGENT_DATA_TABLES:
+                    rows = [record[1:] for record in batch if record[0] == table]
+                    if rows:
+                        conn.executemany(
+                            f"INSERT INTO {table} (DATE,USER_QUERY,FUNC_ARGUMENTS) VALUES (?, ?, ?)",
+                            rows
+                        )
+        except sqlite3.Error as e:
+            logger.error(f"[AgentDataWriter] Failed to save {len(batch)} records: {e}")
+            with self._lock:
+                self._failed += len(batch)
+            return
+
+        with self._lock:
+            self._flushed += len(batch)
+            self._batches += 1
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Flush all queued records and stop the worker thread
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self._queued,
+                "pending": self._queue.qsize(),
+                "flushed": self._flushed,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "batches": self._batches,
+            }
@@ -0,0 +1,808 @@
+import sqlite3
+import os
+import hashlib
+import json
+import zlib
+import base64
+import binascii
+import random
+import threading
+import time
+import functools
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+from db_agent.summaries import summarize
+
+BOOKS_DB_PATH = "db/books.db"
+
+# Pragmas for read-only connections to the BOOKS database
+BOOKS_DB_MMAP_SIZE = 256 * 1024 * 1024
+BOOKS_DB_CACHE_SIZE_KB = 64 * 1024
+
+# Full-text index over TITLE and DESCRIPTION built by scripts/create_books_db
+# The trigram tokenizer matches substrings case-insensitively, so MATCH keeps the meaning of LIKE '%kw%'
+BOOKS_FTS_TABLE = "BOOKS_FTS"
+FTS_MIN_KEYWORD_LENGTH = 3
+
+# Number of SQL statements kept prepared by every connection and number of cached WHERE clause templates
+STATEMENT_CACHE_SIZE = 256
+FILTER_TEMPLATE_CACHE_SIZE = 1024
+
+# Rounds of the Feistel network that orders the pages of a random search (see SeededPermutation)
+PERMUTATION_ROUNDS = 4
+
+# Cache of matching rowids for repeated filter sets. Rowids take 8 bytes each, so the total limit keeps
+# the cache of every db_agent worker under about 32 MiB (one entry can't hold more than 4 MiB)
+RESULT_CACHE_MAX_ENTRIES = 256
+RESULT_CACHE_TTL_SECONDS = 15 * 60
+RESULT_CACHE_MAX_ROWIDS = 500000
+RESULT_CACHE_MAX_TOTAL_ROWIDS = 4000000
+
+# Fields of a book that search functions can return. SUMMARY is stored by scripts/create_books_db
+# (and computed from DESCRIPTION for databases built before summaries were stored).
+BOOK_FIELDS = ("index", "TITLE", "AUTHORS", "DESCRIPTION", "CATEGORY", "PUBLISHER", "PRICE", "PUBLISH_YEAR", "SUMMARY")
+
+FILTER_ARGUMENTS = (
+    "included_authors",
+    "excluded_authors",
+    "included_categories",
+    "excluded_categories",
+    "included_keywords",
+    "excluded_keywords",
+)
+
+# Price and publication year ranges (inclusive bounds, None means unbounded) and the condition of each
+RANGE_ARGUMENTS = (
+    "min_price",
+    "max_price",
+    "min_publish_year",
+    "max_publish_year",
+)
+_RANGE_FILTER_CONDITIONS = (
+    "PRICE >= ?",
+    "PRICE <= ?",
+    "PUBLISH_YEAR >= ?",
+    "PUBLISH_YEAR <= ?",
+)
+
+# B-tree indexes for range filters built by scripts/create_books_db. Both hold PRICE, PUBLISH_YEAR, CATEGORY and AUTHORS,
+# so a range search with category and author filters is answered from the index alone, without reading the (wide)
+# book rows. This matters because SQLite can't estimate how many rows a range matches and always prefers the index.
+# Category and author filters match substrings (LIKE '%x%'), so they can't lead an index, they are only checked in it.
+BOOKS_RANGE_INDEXES = {
+    "IX_BOOKS_PUBLISH_YEAR": ("PUBLISH_YEAR", "PRICE", "CATEGORY", "AUTHORS"),
+    "IX_BOOKS_PRICE": ("PRICE", "PUBLISH_YEAR", "CATEGORY", "AUTHORS"),
+}
+
+# Keys of the search state stored in a continuation cursor (see encode_cursor)
+CURSOR_KEYS = ("filters", "ranked", "seed", "offset")
+
+
+def books_db_generation(db_path: str = BOOKS_DB_PATH) -> Optional[tuple]:
+    """
+    Identify the current version of the database file.
+    The value changes whenever scripts/create_books_db rebuilds the database, None means the file doesn't exist.
+    """
+
+    try:
+        stat = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class BooksConnectionPool:
+    """
+    Pool of read-only connections to the BOOKS database (one connection per worker thread).
+    Connections are opened lazily, reused by every query made in the same thread
+    and closed once their thread finishes. A connection is reopened when the database file is rebuilt.
+    """
+
+    def __init__(
+            self,
+            db_path: str = BOOKS_DB_PATH,
+            mmap_size: int = BOOKS_DB_MMAP_SIZE,
+            cache_size_kb: int = BOOKS_DB_CACHE_SIZE_KB,
+        ) -> None:
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: dict[threading.Thread, sqlite3.Connection] = {}
+
+        self._opened = 0
+        self._closed = 0
+        self._borrows = 0
+        self._in_use = 0
+        self._reopened = 0
+
+    def _open(self) -> sqlite3.Connection:
+        # Each connection is used only by its own thread, but it's closed by another one after that thread finishes
+        conn = sqlite3.connect(
+            f"file:{self.db_path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)};")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kb)};")
+        conn.execute("PRAGMA query_only=ON;")
+        return conn
+
+    def _close_dead_connections(self) -> None:
+        # Must be called with self._lock held
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            self._connections.pop(thread).close()
+            self._closed += 1
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow the connection of the current thread
+        """
+
+        generation = books_db_generation(self.db_path)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.generation != generation:
+            # The database was rebuilt since this connection was opened
+            with self._lock:
+                self._connections.pop(threading.current_thread(), None)
+                self._closed += 1
+                self._reopened += 1
+            conn.close()
+            conn = None
+
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.generation = generation
+            with self._lock:
+                self._close_dead_connections()
+                self._connections[threading.current_thread()] = conn
+                self._opened += 1
+
+        with self._lock:
+            self._borrows += 1
+            self._in_use += 1
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self._in_use -= 1
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return len(self._connections)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._connections),
+                "in_use": self._in_use,
+                "opened": self._opened,
+                "closed": self._closed,
+                "borrows": self._borrows,
+                "reopened": self._reopened,
+            }
+
+    def close(self) -> None:
+        """
+        Close all connections (call it when no queries are running).
+        Threads that borrow again will open a new connection.
+        """
+
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._closed += len(self._connections)
+            self._connections.clear()
+            self._local = threading.local()
+
+
+_books_pool: Optional[BooksConnectionPool] = None
+_singletons_lock = threading.Lock()
+
+
+def get_books_pool() -> BooksConnectionPool:
+    """
+    Return the process-wide connection pool for BOOKS_DB_PATH
+    """
+
+    global _books_pool
+    if _books_pool is None:
+        with _singletons_lock:
+            if _books_pool is None:
+                _books_pool = BooksConnectionPool()
+    return _books_pool
+
+
+def normalize_filters(**filters) -> dict[str, Optional[tuple[str, ...]]]:
+    """
+    Normalize filter arguments of search_books: values are stripped, case-folded,
+    de-duplicated and sorted. Empty lists become None.
+    Range bounds become floats (prices) and integers (years), or None.
+    Raises ValueError if a range bound is not a number.
+    """
+
+    normalized = {}
+    for name in FILTER_ARGUMENTS:
+        values = filters.get(name)
+        if values:
+            values = tuple(sorted({str(v).strip().casefold() for v in values} - {""}))
+        normalized[name] = values or None
+    for name in RANGE_ARGUMENTS:
+        value = filters.get(name)
+        if value is not None:
+            try:
+                value = float(value) if name.endswith("_price") else int(value)
+            except (TypeError, ValueError):
+                kind = "a number" if name.endswith("_price") else "a whole number"
+                raise ValueError(f"{name} must be {kind}, got {value!r}") from None
+        normalized[name] = value
+    return normalized
+
+
+def filter_arguments(filters: dict[str, Optional[tuple[str, ...]]]) -> dict:
+    """
+    Keyword arguments of build_filter and match_rowids for normalized filters
+    """
+
+    arguments = {name: list(filters[name]) if filters.get(name) else None for name in FILTER_ARGUMENTS}
+    arguments.update({name: filters.get(name) for name in RANGE_ARGUMENTS})
+    return arguments
+
+
+class BooksResultCache:
+    """
+    In-process LRU cache with TTL that maps normalized filters to all matching rowids,
+    so repeated searches can pick new random books without querying SQLite.
+    The least recently used entries are dropped when there are more than max_entries of them
+    or they hold more than max_total_rowids rowids together.
+    All entries are dropped when the database file is rebuilt.
+    """
+
+    def __init__(
+            self,
+            db_path: str = BOOKS_DB_PATH,
+            max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+            ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+            max_rowids: int = RESULT_CACHE_MAX_ROWIDS,
+            max_total_rowids: int = RESULT_CACHE_MAX_TOTAL_ROWIDS,
+        ) -> None:
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_rowids = max_rowids
+        self.max_total_rowids = max_total_rowids
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[float, array]] = OrderedDict()
+        self._total_rowids = 0
+        self._generation = books_db_generation(db_path)
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def make_key(filters: dict[str, Optional[tuple[str, ...]]]) -> tuple:
+        return tuple(filters.get(name) for name in FILTER_ARGUMENTS + RANGE_ARGUMENTS)
+
+    def _check_generation(self) -> None:
+        # Must be called with self._lock held
+        generation = books_db_generation(self.db_path)
+        if generation != self._generation:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._total_rowids = 0
+            self._generation = generation
+
+    def get(self, key: tuple) -> Optional[array]:
+        with self._lock:
+            self._check_generation()
+
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self._total_rowids -= len(entry[1])
+                self._expirations += 1
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, rowids: list[int]) -> None:
+        if len(rowids) > min(self.max_rowids, self.max_total_rowids):
+            return
+
+        with self._lock:
+            self._check_generation()
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_rowids -= len(previous[1])
+            self._entries[key] = (time.monotonic(), array("q", rowids))
+            self._total_rowids += len(rowids)
+            while len(self._entries) > self.max_entries or self._total_rowids > self.max_total_rowids:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._total_rowids -= len(evicted)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_rowids = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "rowids": self._total_rowids,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+
+_books_cache: Optional[BooksResultCache] = None
+
+
+def get_books_cache() -> BooksResultCache:
+    """
+    Return the process-wide result cache for BOOKS_DB_PATH
+    """
+
+    global _books_cache
+    if _books_cache is None:
+        with _singletons_lock:
+            if _books_cache is None:
+                _books_cache = BooksResultCache()
+    return _books_cache
+
+
+def create_fts_index(conn: sqlite3.Connection) -> None:
+    """
+    Create (or recreate) the FTS5 index over TITLE and DESCRIPTION of the BOOKS table
+    """
+
+    conn.execute(f"DROP TABLE IF EXISTS {BOOKS_FTS_TABLE};")
+    conn.execute(
+        f"""
+            CREATE VIRTUAL TABLE {BOOKS_FTS_TABLE} USING fts5(
+                TITLE,
+                DESCRIPTION,
+                content='BOOKS',
+                content_rowid='rowid',
+                tokenize='trigram'
+            );
+        """
+    )
+    conn.execute(f"INSERT INTO {BOOKS_FTS_TABLE}({BOOKS_FTS_TABLE}) VALUES('rebuild');")
+    conn.commit()
+
+
+def create_range_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Create the missing BOOKS_RANGE_INDEXES and update the statistics the query planner
+    uses to choose between them and a full scan
+    """
+
+    for name, columns in BOOKS_RANGE_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON BOOKS ({', '.join(columns)});")
+    conn.execute("ANALYZE BOOKS;")
+    conn.commit()
+
+
+def has_fts_index(conn: sqlite3.Connection) -> bool:
+    cursor = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;",
+        (BOOKS_FTS_TABLE,)
+    )
+    return cursor.fetchone() is not None
+
+
+def _fts_phrase(keyword: str) -> str:
+    # Quote every keyword so that FTS5 operators inside it are treated as plain text
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def _fts_can_match(keywords: Optional[list[str]]) -> bool:
+    if keywords is None:
+        return True
+    return all(len(kw) >= FTS_MIN_KEYWORD_LENGTH for kw in keywords)
+
+
+def should_use_fts(
+        conn: sqlite3.Connection,
+        included_keywords: Optional[list[str]],
+        excluded_keywords: Optional[list[str]],
+    ) -> bool:
+    return (
+        (included_keywords is not None or excluded_keywords is not None)
+        and _fts_can_match(included_keywords)
+        and _fts_can_match(excluded_keywords)
+        and has_fts_index(conn)
+    )
+
+
+# Columns matched by every (included, excluded) pair of FILTER_ARGUMENTS
+_LIKE_FILTER_COLUMNS = (
+    ("AUTHORS",),
+    ("CATEGORY",),
+    ("TITLE", "DESCRIPTION"),
+)
+
+
+@functools.lru_cache(maxsize=FILTER_TEMPLATE_CACHE_SIZE)
+def filter_template(shape: tuple[int, ...], use_fts: bool) -> str:
+    """
+    Build the WHERE clause for a filter shape (number of values of every argument in FILTER_ARGUMENTS
+    followed by whether every bound of RANGE_ARGUMENTS is set). All values are bound as parameters, so every call with the same shape produces the same SQL
+    and SQLite can reuse the prepared statement.
+    """
+
+    # Range conditions come first, in the order build_filter binds their parameters
+    clauses = [
+        condition for bound, condition in zip(shape[len(FILTER_ARGUMENTS):], _RANGE_FILTER_CONDITIONS) if bound
+    ]
+    like_shape = shape[:len(FILTER_ARGUMENTS)]
+    for (included, excluded), columns in zip(zip(like_shape[::2], like_shape[1::2]), _LIKE_FILTER_COLUMNS):
+        if use_fts and columns == ("TITLE", "DESCRIPTION"):
+            # Included keywords become one MATCH expression, excluded keywords are attached with NOT
+            # Without included keywords FTS5 can't start from NOT, so the excluded rows are removed with NOT IN
+            if included:
+                clauses.append(f"rowid IN (SELECT rowid FROM {BOOKS_FTS_TABLE} WHERE {BOOKS_FTS_TABLE} MATCH ?)")
+            elif excluded:
+                clauses.append(f"rowid NOT IN (SELECT rowid FROM {BOOKS_FTS_TABLE} WHERE {BOOKS_FTS_TABLE} MATCH ?)")
+            continue
+
+        if included:
+            likes = [f"UPPER({column}) LIKE UPPER(?)" for _ in range(included) for column in columns]
+            clauses.append("(" + " OR ".join(likes) + ")")
+        if excluded:
+            likes = [f"UPPER({column}) NOT LIKE UPPER(?)" for _ in range(excluded) for column in columns]
+            clauses.append("(" + " AND ".join(likes) + ")")
+
+    if not clauses:
+        return ""
+    return "WHERE " + " AND ".join(clauses)
+
+
+def build_filter(
+        included_authors: Optional[list[str]] = None,
+        excluded_authors: Optional[list[str]] = None,
+        included_categories: Optional[list[str]] = None,
+        excluded_categories: Optional[list[str]] = None,
+        included_keywords: Optional[list[str]] = None,
+        excluded_keywords: Optional[list[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_publish_year: Optional[int] = None,
+        max_publish_year: Optional[int] = None,
+        use_fts: bool = False,
+    ) -> tuple[str, list]:
+    """
+    Build the WHERE clause for the BOOKS table and the parameters it binds.
+    When use_fts is True keywords are matched with the FTS5 index instead of LIKE.
+    """
+
+    bounds = [min_price, max_price, min_publish_year, max_publish_year]
+    params = [bound for bound in bounds if bound is not None]
+
+    values = [
+        included_authors or [],
+        excluded_authors or [],
+        included_categories or [],
+        excluded_categories or [],
+        included_keywords or [],
+        excluded_keywords or [],
+    ]
+
+    for kws in values[:4]:
+        params.extend(f"%{kw}%" for kw in kws)
+
+    if use_fts:
+        included = " OR ".join(_fts_phrase(kw) for kw in values[4])
+        excluded = " OR ".join(_fts_phrase(kw) for kw in values[5])
+        if included:
+            match = f"({included})"
+            if excluded:
+                match += f" NOT ({excluded})"
+            params.append(match)
+        elif excluded:
+            params.append(f"({excluded})")
+    else:
+        # Keywords are bound twice, once for TITLE and once for DESCRIPTION
+        for kws in values[4:]:
+            for kw in kws:
+                params.extend((f"%{kw}%", f"%{kw}%"))
+
+    shape = tuple(len(kws) for kws in values) + tuple(int(bound is not None) for bound in bounds)
+    return filter_template(shape, use_fts), params
+
+
+def has_summary_column(conn: sqlite3.Connection) -> bool:
+    return any(row[1] == "SUMMARY" for row in conn.execute("PRAGMA table_info(BOOKS);"))
+
+
+def select_fields(conn: sqlite3.Connection, fields: Optional[Sequence[str]]) -> tuple[str, bool]:
+    """
+    SQL select list for the requested book fields (all columns if fields is None)
+    and whether SUMMARY has to be computed from DESCRIPTION
+    """
+
+    if fields is None:
+        return "*", False
+
+    unknown = [f for f in fields if f not in BOOK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown book fields: {unknown}. Use any of {list(BOOK_FIELDS)}")
+
+    compute_summary = "SUMMARY" in fields and not has_summary_column(conn)
+    columns = [f'"{f}"' for f in fields if not (compute_summary and f == "SUMMARY")]
+    if compute_summary:
+        columns.append("DESCRIPTION AS _DESCRIPTION")
+    return ", ".join(columns), compute_summary
+
+
+def _book(colname: list[str], row: tuple, fields: Optional[Sequence[str]], compute_summary: bool) -> dict:
+    book = dict(zip(colname, row))
+    if compute_summary:
+        book["SUMMARY"] = summarize(book.pop("_DESCRIPTION"))
+        book = {f: book[f] for f in fields}
+    return book
+
+
+def search_books(
+        conn: sqlite3.Connection,
+        included_authors: Optional[list[str]] = None,
+        excluded_authors: Optional[list[str]] = None,
+        included_categories: Optional[list[str]] = None,
+        excluded_categories: Optional[list[str]] = None,
+        included_keywords: Optional[list[str]] = None,
+        excluded_keywords: Optional[list[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_publish_year: Optional[int] = None,
+        max_publish_year: Optional[int] = None,
+        use_fts: Optional[bool] = None,
+        limit: int = 10,
+        cache: Optional[BooksResultCache] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[dict]:
+    """
+    Return up to `limit` random books from the BOOKS table that match given filters.
+    If use_fts is None the FTS5 index is used whenever it exists and can match all keywords.
+    All matching rowids are read and sampled, like the pages of query_books_db (see search_books_page).
+    With a cache they are stored on a miss and later calls with the same
+    (normalized) filters sample from them without running the filter again.
+    Only the given BOOK_FIELDS are returned if fields is not None.
+    """
+
+    filters = normalize_filters(
+        included_authors=included_authors,
+        excluded_authors=excluded_authors,
+        included_categories=included_categories,
+        excluded_categories=excluded_categories,
+        included_keywords=included_keywords,
+        excluded_keywords=excluded_keywords,
+        min_price=min_price,
+        max_price=max_price,
+        min_publish_year=min_publish_year,
+        max_publish_year=max_publish_year,
+    )
+    if cache is not None:
+        rowids = candidate_rowids(conn, filters, cache, use_fts=use_fts)
+    else:
+        rowids = match_rowids(conn, use_fts=use_fts, **filter_arguments(filters))
+    return fetch_books(conn, random.sample(rowids, min(limit, len(rowids))), fields)
+
+
+def candidate_rowids(
+        conn: sqlite3.Connection,
+        filters: dict[str, Optional[tuple[str, ...]]],
+        cache: BooksResultCache,
+        use_fts: Optional[bool] = None,
+    ) -> Sequence[int]:
+    """
+    Return rowids of all books matching normalized filters, from the cache if possible
+    """
+
+    key = cache.make_key(filters)
+    rowids = cache.get(key)
+    if rowids is None:
+        rowids = match_rowids(conn, use_fts=use_fts, **filter_arguments(filters))
+        cache.put(key, rowids)
+    return rowids
+
+
+class SeededPermutation:
+    """
+    Pseudo-random permutation of range(n) fixed by seed: a Feistel network over the smallest
+    even number of bits that holds n, with cycle walking for values outside range(n).
+    Any position is computed in a few hashes, without shuffling all n values.
+    """
+
+    def __init__(self, n: int, seed: int) -> None:
+        self.n = n
+        self.half_bits = (max((n - 1).bit_length(), 2) + 1) // 2
+        self.mask = (1 << self.half_bits) - 1
+        rng = random.Random(seed)
+        self.round_keys = [rng.getrandbits(64).to_bytes(8, "little") for _ in range(PERMUTATION_ROUNDS)]
+
+    def __getitem__(self, index: int) -> int:
+        value = index
+        while True:
+            left, right = value >> self.half_bits, value & self.mask
+            for key in self.round_keys:
+                digest = hashlib.blake2b(right.to_bytes(8, "little"), digest_size=8, key=key).digest()
+                left, right = right, left ^ (int.from_bytes(digest, "little") & self.mask)
+            value = (left << self.half_bits) | right
+            # The domain is less than 4 * n, so this takes at most a few rounds on average
+            if value < self.n:
+                return value
+
+
+def page_rowids(
+        rowids: Sequence[int],
+        seed: int,
+        offset: int,
+        limit: int,
+        excluded_rowids: frozenset[int] = frozenset(),
+    ) -> tuple[list[int], Optional[int]]:
+    """
+    Return the next `limit` rowids of a pseudo-random order of rowids (fixed by seed), starting at offset
+    and skipping excluded_rowids, and the offset of the following page (None if no rowids are left).
+    Pages of one seed never repeat a rowid and only cost `limit` lookups, not a shuffle of all rowids.
+    """
+
+    n = len(rowids)
+    if n == 0:
+        return [], None
+
+    permutation = SeededPermutation(n, seed)
+    page = []
+    while offset < n and len(page) < limit:
+        rowid = rowids[permutation[offset]]
+        offset += 1
+        if rowid not in excluded_rowids:
+            page.append(rowid)
+    return page, offset if offset < n else None
+
+
+def search_books_page(
+        conn: sqlite3.Connection,
+        filters: dict[str, Optional[tuple[str, ...]]],
+        cache: BooksResultCache,
+        seed: int,
+        offset: int = 0,
+        limit: int = 10,
+        excluded_rowids: frozenset[int] = frozenset(),
+    ) -> tuple[list[int], Optional[int]]:
+    """
+    Return rowids of one page of random books matching normalized filters and the offset of the next page.
+    Matching rowids are kept in the cache, so the next pages of a search don't run the filter again.
+    """
+
+    rowids = candidate_rowids(conn, filters, cache)
+    return page_rowids(rowids, seed, offset, limit, excluded_rowids)
+
+
+def encode_cursor(filters: dict[str, Optional[tuple[str, ...]]], ranked: bool, seed: int, offset: int) -> str:
+    """
+    Opaque continuation cursor of a search. It holds the whole search state,
+    so any server process can continue the search without shared storage.
+    """
+
+    state = {
+        "filters": [list(filters[name]) if filters[name] else None for name in FILTER_ARGUMENTS]
+                   + [filters.get(name) for name in RANGE_ARGUMENTS],
+        "ranked": ranked,
+        "seed": seed,
+        "offset": offset,
+    }
+    payload = zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[dict[str, Optional[tuple[str, ...]]], bool, int, int]:
+    """
+    Return (normalized filters, ranked, seed, offset) stored in a cursor made by encode_cursor
+    """
+
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(zlib.decompress(payload))
+        # Cursors made before range filters existed hold only FILTER_ARGUMENTS
+        if (
+            not isinstance(state, dict) or set(state) != set(CURSOR_KEYS)
+            or len(state["filters"]) not in (len(FILTER_ARGUMENTS), len(FILTER_ARGUMENTS) + len(RANGE_ARGUMENTS))
+        ):
+            raise ValueError("unexpected cursor content")
+        filters = {
+            name: tuple(str(v) for v in values) if values else None
+            for name, values in zip(FILTER_ARGUMENTS, state["filters"])
+        }
+        ranges = normalize_filters(**dict(zip(RANGE_ARGUMENTS, state["filters"][len(FILTER_ARGUMENTS):])))
+        filters.update({name: ranges[name] for name in RANGE_ARGUMENTS})
+        return filters, bool(state["ranked"]), int(state["seed"]), int(state["offset"])
+    except (ValueError, TypeError, zlib.error, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def match_rowids(
+        conn: sqlite3.Connection,
+        included_authors: Optional[list[str]] = None,
+        excluded_authors: Optional[list[str]] = None,
+        included_categories: Optional[list[str]] = None,
+        excluded_categories: Optional[list[str]] = None,
+        included_keywords: Optional[list[str]] = None,
+        excluded_keywords: Optional[list[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_publish_year: Optional[int] = None,
+        max_publish_year: Optional[int] = None,
+        use_fts: Optional[bool] = None,
+    ) -> list[int]:
+    """
+    Return rowids of all BOOKS rows that match given filters
+    """
+
+    if use_fts is None:
+        use_fts = should_use_fts(conn, included_keywords, excluded_keywords)
+
+    filter_part, params = build_filter(
+        included_authors=included_authors,
+        excluded_authors=excluded_authors,
+        included_categories=included_categories,
+        excluded_categories=excluded_categories,
+        included_keywords=included_keywords,
+        excluded_keywords=excluded_keywords,
+        min_price=min_price,
+        max_price=max_price,
+        min_publish_year=min_publish_year,
+        max_publish_year=max_publish_year,
+        use_fts=use_fts,
+    )
+    query = conn.execute(f"SELECT rowid FROM BOOKS {filter_part};", params)
+    return [r[0] for r in query.fetchall()]
+
+
+def fetch_books(
+        conn: sqlite3.Connection,
+        rowids: list[int],
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[dict]:
+    """
+    Fetch BOOKS rows (full, or only the given BOOK_FIELDS) for given rowids, keeping the order of rowids
+    """
+
+    if not rowids:
+        return []
+
+    select_list, compute_summary = select_fields(conn, fields)
+    placeholders = ",".join("?" * len(rowids))
+    query = conn.execute(
+        f"SELECT rowid AS _rowid, {select_list} FROM BOOKS WHERE rowid IN ({placeholders});",
+        rowids
+    )
+    colname = [d[0] for d in query.description]
+    rows = {r[0]: _book(colname[1:], r[1:], fields, compute_summary) for r in query.fetchall()}
+    return [rows[rowid] for rowid in rowids if rowid in rows]
@@ -1,19 +1,95 @@
-from google.adk.agents import Agent
+from google.adk.agents import Agent, BaseAgent
+from google.adk.events import Event
+from google.adk.models.base_llm import BaseLlm
 from google.adk.models.google_llm import Gemini
 from google.genai import types
 from google.adk.plugins.base_plugin import BasePlugin
 from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.function_tool import FunctionTool
 from google.adk.tools.tool_context import ToolContext
 from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents.callback_context import CallbackContext
+
+from db_agent.books_db import (
+    BOOK_FIELDS,
+    decode_cursor,
+    encode_cursor,
+    fetch_books,
+    get_books_cache,
+    get_books_pool,
+    normalize_filters,
+    search_books_page,
+)
+from db_agent.agent_data import AGENT_DATA_DB_PATH, AgentDataWriter, create_agent_data_tables
+from db_agent.facets import FACETS_TOP, count_facets, get_facet_index
+from db_agent.fast_path import extract_cursor, extract_query_arguments, get_books_vocabulary
+from db_agent.ranking import get_bm25_index, search_ranked_page
+from db_agent.relaxation import relaxation_ladder
+from db_agent.summaries import SUMMARY_MAX_WORDS, truncate_words
 
 import sqlite3
-from typing import Optional, Any
+from typing import Optional, Any, AsyncGenerator, Union
 import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 import json
 import random
 
+# Fields returned by query_books_db by default: everything the agents show, with the stored
+# summary instead of the full description, which is most of the tokens of a book
+QUERY_BOOKS_DB_FIELDS = ["TITLE", "AUTHORS", "CATEGORY", "SUMMARY", "PUBLISHER", "PRICE", "PUBLISH_YEAR"]
+
+# Books returned by one query_books_db call
+QUERY_BOOKS_DB_LIMIT = 10
+
+# Session state key with rowids of the books already shown in the session, and how many of them are kept
+SHOWN_BOOKS_STATE_KEY = "shown_books"
+SHOWN_BOOKS_MAX = 500
+
+# Session state key of the user's dislike profile (the bookshop sends it as A2A request metadata under the same key).
+# Its exclusions are added to every new search, except values the search explicitly includes.
+DISLIKES_STATE_KEY = "dislikes"
+DISLIKE_FIELDS = ("excluded_authors", "excluded_categories", "excluded_keywords")
+
+# Key of RunConfig.custom_metadata under which the ADK A2A server passes the request metadata
+A2A_METADATA_KEY = "a2a_metadata"
+
+
+def request_dislikes(tool_context: Optional[ToolContext]) -> dict[str, list[str]]:
+    """
+    Dislike profile of the request from the session state: DBAgentPlugin stores the A2A request metadata
+    of a remote call there, and an in-process call (AgentTool) copies it from the bookshop session
+    """
+
+    if tool_context is None:
+        return {}
+
+    dislikes = tool_context.state.get(DISLIKES_STATE_KEY)
+    if not isinstance(dislikes, dict):
+        return {}
+    return {name: list(dislikes[name]) for name in DISLIKE_FIELDS if isinstance(dislikes.get(name), list)}
+
+
+def apply_dislikes(
+        filters: dict[str, Optional[tuple[str, ...]]],
+        dislikes: dict[str, list[str]],
+    ) -> dict[str, Optional[tuple[str, ...]]]:
+    """
+    Add the exclusions of a dislike profile to normalized filters
+    """
+
+    disliked = normalize_filters(**dislikes)
+    filters = dict(filters)
+    for name in DISLIKE_FIELDS:
+        # An explicit request (e.g. books by a disliked author) wins over the profile
+        included = set(filters[name.replace("excluded_", "included_")] or ())
+        values = set(filters[name] or ()) | (set(disliked[name] or ()) - included)
+        filters[name] = tuple(sorted(values)) or None
+    return filters
+
 def query_books_db(
         included_authors: Optional[list[str]] = None,
         excluded_authors: Optional[list[str]] = None,
@@ -21,6 +97,16 @@ def query_books_db(
         excluded_categories: Optional[list[str]] = None,
         included_keywords: Optional[list[str]] = None,
         excluded_keywords: Optional[list[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_publish_year: Optional[int] = None,
+        max_publish_year: Optional[int] = None,
+        rank_by_relevance: Optional[bool] = None,
+        fields: Optional[list[str]] = None,
+        summary_words: Optional[int] = None,
+        cursor: Optional[str] = None,
+        relax: Optional[bool] = None,
+        tool_context: Optional[ToolContext] = None,
     ) -> dict:
     """
     Query the BOOKS database using optional author-based filters.
@@ -56,6 +142,40 @@ def query_books_db(
             If None, no keywords are excluded.  
             The list should contain up to 10 keywords (e.g., ["company", "nation"])
 
+        min_price, max_price (float | None):
+            The lowest and the highest price of the books (both inclusive, e.g., max_price=10.0 for cheap books).
+            If None, the price is not limited from that side.
+
+        min_publish_year, max_publish_year (int | None):
+            The first and the last publication year of the books (both inclusive, e.g., min_publish_year=2011
+            for books published after 2010). If None, the publication year is not limited from that side.
+
+        rank_by_relevance (bool | None):
+            If True, the books most relevant to included_keywords are returned (the most relevant first).
+            If None or False, random books matching the criteria are returned.
+            Has no effect without included_keywords.
+
+        fields (list[str] | None):
+            A list of book fields to return, any of "index", "TITLE", "AUTHORS", "DESCRIPTION",
+            "CATEGORY", "PUBLISHER", "PRICE", "PUBLISH_YEAR" and "SUMMARY" (a short summary of DESCRIPTION).
+            If None, TITLE, AUTHORS, CATEGORY, SUMMARY, PUBLISHER, PRICE and PUBLISH_YEAR are returned.
+
+        summary_words (int | None):
+            Maximum number of words of SUMMARY.
+            If None, summaries of up to 30 words are returned.
+
+        cursor (str | None):
+            The "cursor" returned by an earlier call, to get more books of that search.
+            All the filter arguments are taken from the cursor, pass None for them.
+            If None, a new search is started.
+
+        relax (bool | None):
+            If True and no books match, the search is relaxed step by step until books are found:
+            included_keywords are dropped, included_categories are widened to the catalog categories
+            they contain, and included_authors also match similar author names.
+            The result then lists the applied relaxations. Exclusions and price and year ranges are never relaxed.
+            If None or False, only the exact search is made.
+
     Returns:
         dict:
             A result dictionary in one of the following formats:
@@ -63,7 +183,9 @@ def query_books_db(
             Success:
                 {
                     "status": "success",
-                    "books": LIST_OF_BOOKS
+                    "books": LIST_OF_BOOKS,
+                    "cursor": CURSOR_FOR_MORE_BOOKS (only if more books match),
+                    "relaxations": LIST_OF_APPLIED_RELAXATIONS (only if the search was relaxed)
                 }
 
             Error:
@@ -73,94 +195,260 @@ def query_books_db(
                 }
     """
 
-    # Adding filters to the query
-    filter_part = ""
-
-    # Included authors
-    if included_authors is not None:
-        filter_part += "("
-        for kw in included_authors:
-            filter_part += f"UPPER(AUTHORS) LIKE UPPER('%{kw}%') OR "
-        filter_part = filter_part[:-4]
-        filter_part = filter_part + ") AND "
-
-    # Excluded authors
-    if excluded_authors is not None:
-        filter_part += "("
-        for kw in excluded_authors:
-            filter_part += f"UPPER(AUTHORS) NOT LIKE UPPER('%{kw}%') AND "
-        filter_part = filter_part[:-5]
-        filter_part = filter_part + ") AND "
-
-    # Included Categories
-    if included_categories is not None:
-        filter_part += "("
-        for kw in included_categories:
-            filter_part += f"UPPER(CATEGORY) LIKE UPPER('%{kw}%') OR "
-        filter_part = filter_part[:-4]
-        filter_part = filter_part + ") AND "
-
-    # Excluded Categories
-    if excluded_categories is not None:
-        filter_part += "("
-        for kw in excluded_categories:
-            filter_part += f"UPPER(CATEGORY) NOT LIKE UPPER('%{kw}%') AND "
-        filter_part = filter_part[:-5]
-        filter_part = filter_part + ") AND "
-
-    # Included Keywords
-    # Applies to TITLE AND DESCRIPTION
-    if included_keywords is not None:
-        filter_part += "("
-        for kw in included_keywords:
-            filter_part += f"UPPER(TITLE) LIKE UPPER('%{kw}%') OR "
-            filter_part += f"UPPER(DESCRIPTION) LIKE UPPER('%{kw}%') OR "
-        filter_part = filter_part[:-4]
-        filter_part = filter_part + ") AND "
-
-    # Excluded Keywords
-    # Applies to TITLE, DESCRIPTION
-    if excluded_keywords is not None:
-        filter_part += "("
-        for kw in excluded_keywords:
-            filter_part += f"UPPER(TITLE) NOT LIKE UPPER('%{kw}%') AND "
-            filter_part += f"UPPER(DESCRIPTION) NOT LIKE UPPER('%{kw}%') AND "
-        filter_part = filter_part[:-5]
-        filter_part = filter_part + ") AND "
-    
-    # Add clause and remove last AND
-    if filter_part != "":
-        filter_part = "WHERE " + filter_part
-        filter_part = filter_part[:-4]
-
-    conn = sqlite3.connect('db/books.db')
-    # RANDOM() is added so that random 20 books are chosen when more than 20 books meet the criteria
-    query = conn.execute(
-        f"""
-            SELECT
-            *
-            FROM BOOKS
-            {filter_part}
-            ORDER BY RANDOM()
-            LIMIT 10;
-        """
-    )
-    colname = [d[0] for d in query.description]
-    books = [dict(zip(colname, r)) for r in query.fetchall()]
+    fields = fields or QUERY_BOOKS_DB_FIELDS
+    unknown = [f for f in fields if f not in BOOK_FIELDS]
+    if unknown:
+        return {
+            "status": "error",
+            "error_message": f"Unknown fields {unknown}, use any of {list(BOOK_FIELDS)}"
+        }
+
+    if cursor is not None:
+        try:
+            filters, ranked, seed, offset = decode_cursor(cursor)
+        except ValueError:
+            return {
+                "status": "error",
+                "error_message": "Invalid cursor, start a new search without it"
+            }
+    else:
+        try:
+            filters = normalize_filters(
+                included_authors=included_authors,
+                excluded_authors=excluded_authors,
+                included_categories=included_categories,
+                excluded_categories=excluded_categories,
+                included_keywords=included_keywords,
+                excluded_keywords=excluded_keywords,
+                min_price=min_price,
+                max_price=max_price,
+                min_publish_year=min_publish_year,
+                max_publish_year=max_publish_year,
+            )
+        except ValueError as e:
+            return {
+                "status": "error",
+                "error_message": f"{e}, pass price and publication year bounds as plain numbers (e.g. 10, 2010)"
+            }
+        filters = apply_dislikes(filters, request_dislikes(tool_context))
+        ranked = bool(rank_by_relevance and filters["included_keywords"])
+        seed = random.getrandbits(32)
+        offset = 0
+
+    shown = list(tool_context.state.get(SHOWN_BOOKS_STATE_KEY, [])) if tool_context is not None else []
+    index = get_bm25_index() if ranked else None
+
+    if relax and cursor is None:
+        levels = relaxation_ladder(filters, get_books_vocabulary())
+    else:
+        levels = iter([([], filters)])
+
+    def search_page(
+            conn: sqlite3.Connection,
+            filters: dict[str, Optional[tuple[str, ...]]],
+            excluded_rowids: frozenset[int],
+        ) -> tuple[list[int], Optional[int]]:
+        if index is not None and filters["included_keywords"]:
+            return search_ranked_page(conn, index, filters, offset, QUERY_BOOKS_DB_LIMIT, excluded_rowids)
+        return search_books_page(conn, filters, get_books_cache(), seed, offset, QUERY_BOOKS_DB_LIMIT, excluded_rowids)
+
+    with get_books_pool().connection() as conn:
+        # All relaxation levels run on one connection, the first one that finds books is used
+        for relaxations, filters in levels:
+            # Books already shown in this session are skipped, so repeated and "more" searches bring new books
+            rowids, next_offset = search_page(conn, filters, frozenset(shown))
+            if not rowids and shown and cursor is None:
+                # For a new search, books shown before are better than no books (or a relaxed search)
+                rowids, next_offset = search_page(conn, filters, frozenset())
+            if rowids:
+                break
+        books = fetch_books(conn, rowids, fields)
+
+    if tool_context is not None and rowids:
+        tool_context.state[SHOWN_BOOKS_STATE_KEY] = (shown + rowids)[-SHOWN_BOOKS_MAX:]
+
+    if summary_words is not None and summary_words < SUMMARY_MAX_WORDS and "SUMMARY" in fields:
+        for book in books:
+            book["SUMMARY"] = truncate_words(book["SUMMARY"], max(summary_words, 0))
 
     if len(books) > 0:
-        return {
+        result = {
             "status": "success",
             "books": books
         }
+        if next_offset is not None:
+            result["cursor"] = encode_cursor(filters, bool(ranked and filters["included_keywords"]), seed, next_offset)
+        if relaxations:
+            result["relaxations"] = relaxations
+        return result
+    elif cursor is not None:
+        return {
+            "status": "error",
+            "error_message": "No more books found for this search"
+        }
     else:
         return {
             "status": "error",
             "error_message": "No books found that match given criteria"
         }
 
+def count_books_facets(
+        included_authors: Optional[list[str]] = None,
+        excluded_authors: Optional[list[str]] = None,
+        included_categories: Optional[list[str]] = None,
+        excluded_categories: Optional[list[str]] = None,
+        included_keywords: Optional[list[str]] = None,
+        excluded_keywords: Optional[list[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_publish_year: Optional[int] = None,
+        max_publish_year: Optional[int] = None,
+        top: Optional[int] = None,
+        tool_context: Optional[ToolContext] = None,
+    ) -> dict:
+    """
+    Count the books in the BOOKS database that match the filters, without returning books.
+    Use it to check whether a search is too narrow (few or no books) or too broad (many books)
+    and which values would refine it.
+
+    Args:
+        included_authors, excluded_authors, included_categories, excluded_categories,
+        included_keywords, excluded_keywords (list[str] | None),
+        min_price, max_price (float | None), min_publish_year, max_publish_year (int | None):
+            The same filters as in `query_books_db`.
+
+        top (int | None):
+            Number of the most common values returned per facet.
+            If None, the top 5 are returned.
+
+    Returns:
+        dict:
+            {
+                "status": "success",
+                "total": NUMBER_OF_MATCHING_BOOKS,
+                "categories": [{"value": CATEGORY, "books": NUMBER_OF_BOOKS}, ...],
+                "authors": [{"value": AUTHOR, "books": NUMBER_OF_BOOKS}, ...],
+                "publishers": [{"value": PUBLISHER, "books": NUMBER_OF_BOOKS}, ...],
+                "publish_years": [{"value": "2000-2009", "books": NUMBER_OF_BOOKS}, ...]
+            }
+            or {"status": "error", "error_message": ERROR} if a filter is invalid.
+    """
+
+    try:
+        filters = normalize_filters(
+            included_authors=included_authors,
+            excluded_authors=excluded_authors,
+            included_categories=included_categories,
+            excluded_categories=excluded_categories,
+            included_keywords=included_keywords,
+            excluded_keywords=excluded_keywords,
+            min_price=min_price,
+            max_price=max_price,
+            min_publish_year=min_publish_year,
+            max_publish_year=max_publish_year,
+        )
+    except ValueError as e:
+        return {
+            "status": "error",
+            "error_message": f"{e}, pass price and publication year bounds as plain numbers (e.g. 10, 2010)"
+        }
+    filters = apply_dislikes(filters, request_dislikes(tool_context))
+
+    index = get_facet_index()
+    with get_books_pool().connection() as conn:
+        facets = count_facets(conn, index, filters, get_books_cache(), max(top or FACETS_TOP, 1))
+    return {"status": "success", **facets}
+
+# SQLite queries of the async tool run on this bounded thread pool so they don't block the event loop
+# Every worker thread keeps its own connection from the books connection pool
+QUERY_BOOKS_DB_MAX_WORKERS = 8
+_query_books_db_executor = ThreadPoolExecutor(
+    max_workers=QUERY_BOOKS_DB_MAX_WORKERS,
+    thread_name_prefix="query_books_db",
+)
+
+@functools.wraps(query_books_db)
+async def query_books_db_async(
+        included_authors: Optional[list[str]] = None,
+        excluded_authors: Optional[list[str]] = None,
+        included_categories: Optional[list[str]] = None,
+        excluded_categories: Optional[list[str]] = None,
+        included_keywords: Optional[list[str]] = None,
+        excluded_keywords: Optional[list[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_publish_year: Optional[int] = None,
+        max_publish_year: Optional[int] = None,
+        rank_by_relevance: Optional[bool] = None,
+        fields: Optional[list[str]] = None,
+        summary_words: Optional[int] = None,
+        cursor: Optional[str] = None,
+        relax: Optional[bool] = None,
+        tool_context: Optional[ToolContext] = None,
+    ) -> dict:
+    # Async variant of query_books_db (same name, arguments and docstring, so the agent sees the same tool)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _query_books_db_executor,
+        functools.partial(
+            query_books_db,
+            included_authors=included_authors,
+            excluded_authors=excluded_authors,
+            included_categories=included_categories,
+            excluded_categories=excluded_categories,
+            included_keywords=included_keywords,
+            excluded_keywords=excluded_keywords,
+            min_price=min_price,
+            max_price=max_price,
+            min_publish_year=min_publish_year,
+            max_publish_year=max_publish_year,
+            rank_by_relevance=rank_by_relevance,
+            fields=fields,
+            summary_words=summary_words,
+            cursor=cursor,
+            relax=relax,
+            tool_context=tool_context,
+        )
+    )
+
+@functools.wraps(count_books_facets)
+async def count_books_facets_async(
+        included_authors: Optional[list[str]] = None,
+        excluded_authors: Optional[list[str]] = None,
+        included_categories: Optional[list[str]] = None,
+        excluded_categories: Optional[list[str]] = None,
+        included_keywords: Optional[list[str]] = None,
+        excluded_keywords: Optional[list[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_publish_year: Optional[int] = None,
+        max_publish_year: Optional[int] = None,
+        top: Optional[int] = None,
+        tool_context: Optional[ToolContext] = None,
+    ) -> dict:
+    # Async variant of count_books_facets, run on the query_books_db thread pool
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _query_books_db_executor,
+        functools.partial(
+            count_books_facets,
+            included_authors=included_authors,
+            excluded_authors=excluded_authors,
+            included_categories=included_categories,
+            excluded_categories=excluded_categories,
+            included_keywords=included_keywords,
+            excluded_keywords=excluded_keywords,
+            min_price=min_price,
+            max_price=max_price,
+            min_publish_year=min_publish_year,
+            max_publish_year=max_publish_year,
+            top=top,
+            tool_context=tool_context,
+        )
+    )
+
 class DBAgentPlugin(BasePlugin):
-    def __init__(self, log_level=logging.INFO, log_console=True) -> None:
+    def __init__(self, log_level=logging.INFO, log_console=True, data_db_path=AGENT_DATA_DB_PATH) -> None:
         super().__init__(name="db_agent_plugin")
         os.makedirs("logs", exist_ok=True)
 
@@ -183,7 +471,13 @@ class DBAgentPlugin(BasePlugin):
                 handler.setFormatter(formatter)
                 self.logger.addHandler(handler)
 
-        self.user_text = None
+        # The plugin is shared by all sessions of a Runner, so the user message
+        # and the dislike profile sent with the request are kept per invocation
+        self.user_texts: dict[str, str] = {}
+        self.request_dislikes: dict[str, dict] = {}
+        self.data_db_path = data_db_path
+        # Agent data is saved in batches by a background thread, so tool calls don't wait for SQLite commits
+        self.data_writer = AgentDataWriter(data_db_path)
 
     async def before_run_callback(
         self, 
@@ -194,33 +488,33 @@ class DBAgentPlugin(BasePlugin):
         Initialize all databases required for the plugin to run correctly
         """
 
-        os.makedirs("db", exist_ok=True)
-        if not os.path.exists("db/db_agent_data.db"):
+        os.makedirs(os.path.dirname(self.data_db_path) or ".", exist_ok=True)
+        if not os.path.exists(self.data_db_path):
             self.logger.info("[DBAgentPlugin] Creating database for agent data")
-            conn = sqlite3.connect('db/db_agent_data.db')
-            conn.execute('''
-                CREATE TABLE SUCCESSES
-                (
-                    ID INTEGER PRIMARY KEY NOT NULL,
-                    DATE TEXT NOT NULL,
-                    USER_QUERY TEXT NOT NULL,
-                    FUNC_ARGUMENTS TEXT NOT NULL
-                );
-            ''')
-            conn.execute('''
-                CREATE TABLE FAILURES
-                (
-                    ID INTEGER PRIMARY KEY NOT NULL,
-                    DATE TEXT NOT NULL,
-                    USER_QUERY TEXT NOT NULL,
-                    FUNC_ARGUMENTS TEXT NOT NULL
-                );
-            ''')
+            conn = sqlite3.connect(self.data_db_path)
+            create_agent_data_tables(conn)
             conn.close()
 
         else:
             self.logger.info("[DBAgentPlugin] Database for agent data exists")
 
+        run_config = invocation_context.run_config
+        metadata = (run_config.custom_metadata or {}).get(A2A_METADATA_KEY) if run_config is not None else None
+        dislikes = metadata.get(DISLIKES_STATE_KEY) if isinstance(metadata, dict) else None
+        if isinstance(dislikes, dict):
+            self.request_dislikes[invocation_context.invocation_id] = dislikes
+
+    async def before_agent_callback(
+        self,
+        *,
+        agent: BaseAgent,
+        callback_context: CallbackContext
+    ) -> Optional[types.Content]:
+        # The first agent of the invocation saves the dislike profile of a remote request in the session state,
+        # where query_books_db reads it (ADK saves the state delta of before_agent callbacks in an event)
+        dislikes = self.request_dislikes.pop(callback_context.invocation_id, None)
+        if dislikes is not None:
+            callback_context.state[DISLIKES_STATE_KEY] = dislikes
 
     async def on_user_message_callback(
         self,
@@ -228,7 +522,17 @@ class DBAgentPlugin(BasePlugin):
         invocation_context: InvocationContext,
         user_message: types.Content,
     ) -> Optional[types.Content]:
-        self.user_text = str(user_message.parts[0].text).replace("'", "")
+        # Telemetry rows are written with query parameters, so the prompt is kept as the user typed it
+        user_text = " ".join(part.text for part in user_message.parts or [] if part.text)
+        self.user_texts[invocation_context.invocation_id] = user_text
+
+    async def after_run_callback(
+        self,
+        *,
+        invocation_context: InvocationContext
+    ) -> None:
+        self.user_texts.pop(invocation_context.invocation_id, None)
+        self.request_dislikes.pop(invocation_context.invocation_id, None)
 
     async def after_tool_callback(
         self,
@@ -239,6 +543,10 @@ class DBAgentPlugin(BasePlugin):
         result: dict,
     ) -> Optional[dict]:
         if tool.name == "query_books_db":
+            user_text = self.user_texts.get(tool_context.invocation_id)
+            self.logger.debug(f"[DBAgentPlugin] Books connection pool stats: {get_books_pool().stats()}")
+            self.logger.debug(f"[DBAgentPlugin] Books result cache stats: {get_books_cache().stats()}")
+
             if result['status'] == "success":
                 self.logger.info("[DBAgentPlugin] Query successful")
 
@@ -246,34 +554,138 @@ class DBAgentPlugin(BasePlugin):
                     self.logger.info("[DBAgentPlugin] Saving data from successful query for futher analysis")
                     date = str(datetime.now())
                     func_arguments = json.dumps(tool_args)
-
-                    conn = sqlite3.connect('db/db_agent_data.db')
-                    conn.execute(f"INSERT INTO SUCCESSES (DATE,USER_QUERY,FUNC_ARGUMENTS) VALUES ('{date}', '{self.user_text}', '{func_arguments}')")
-                    conn.commit()
-                    conn.close()
+                    self.data_writer.write("SUCCESSES", date, str(user_text), func_arguments)
             else:
                 self.logger.warning("[DBAgentPlugin] Query failed. Saving data for futher analysis")
 
                 date = str(datetime.now())
                 func_arguments = json.dumps(tool_args)
+                self.data_writer.write("FAILURES", date, str(user_text), func_arguments)
+
+            self.logger.debug(f"[DBAgentPlugin] Agent data writer stats: {self.data_writer.stats()}")
+
+    async def close(self) -> None:
+        """
+        Flush agent data that is still queued
+        """
 
-                conn = sqlite3.connect('db/db_agent_data.db')
-                conn.execute(f"INSERT INTO FAILURES (DATE,USER_QUERY,FUNC_ARGUMENTS) VALUES ('{date}', '{self.user_text}', '{func_arguments}')")
-                conn.commit()
-                conn.close()
+        self.data_writer.close()
+        self.logger.info(f"[DBAgentPlugin] Agent data writer closed: {self.data_writer.stats()}")
     
-def get_db_agent():
-    db_agent = Agent(
-        name="db_agent",
-        model=Gemini(
-            model="gemini-2.5-flash-lite", 
-            retry_options=types.HttpRetryOptions(
-                attempts=5, 
-                exp_base=7,  
-                initial_delay=1,
-                http_status_codes=[429, 500, 503, 504]
+def format_books(books: list[dict], cursor: Optional[str] = None, relaxations: Optional[list[str]] = None) -> str:
+    """
+    Format books (the relaxations of the search and the cursor for more books)
+    the same way the db_agent LLM is instructed to
+    """
+
+    lines = []
+    if relaxations:
+        lines.append(f"Relaxed search: {', '.join(relaxations)}")
+    for i, book in enumerate(books, 1):
+        if "SUMMARY" in book:
+            summary = book["SUMMARY"]
+        else:
+            summary = truncate_words(str(book["DESCRIPTION"]), SUMMARY_MAX_WORDS)
+        lines.append(
+            f"Book number: {i}\n"
+            f"Title: {book['TITLE']}\n"
+            f"Authors: {book['AUTHORS']}\n"
+            f"Category: {book['CATEGORY']}\n"
+            f"Summary: {summary}\n"
+            f"Publisher: {book['PUBLISHER']}\n"
+            f"Price: {book['PRICE']}\n"
+            f"Publication Year: {book['PUBLISH_YEAR']}"
+        )
+    if cursor is not None:
+        lines.append(f"More results cursor: {cursor}")
+    return "\n\n".join(lines)
+
+# The tool as the LLM agent sees it, passed to plugin callbacks of fast path queries
+_query_books_db_tool = FunctionTool(query_books_db_async)
+
+class FastPathDBAgent(BaseAgent):
+    """
+    Answers simple prompts (e.g. "biographies by Stanley") and requests for more books
+    with a results cursor by calling query_books_db directly.
+    Searches are relaxed by query_books_db when nothing matches. Prompts the extractor isn't confident about,
+    or searches that return no books even relaxed, are passed to the LLM agent.
+    """
+
+    llm_agent: BaseAgent
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        logger = logging.getLogger("db_agent_logger")
+        user_text = ""
+        if ctx.user_content and ctx.user_content.parts:
+            user_text = " ".join(part.text for part in ctx.user_content.parts if part.text)
+
+        cursor = extract_cursor(user_text)
+        if cursor is not None:
+            arguments = {"cursor": cursor}
+        else:
+            loop = asyncio.get_running_loop()
+            vocabulary = await loop.run_in_executor(_query_books_db_executor, get_books_vocabulary)
+            arguments = extract_query_arguments(user_text, vocabulary)
+            if arguments is not None:
+                arguments["relax"] = True
+
+        if arguments is not None:
+            # Books shown by the query are recorded in the session state through the event actions
+            tool_context = ToolContext(ctx)
+            # Plugins see the query like a tool call of the LLM agent (DBAgentPlugin logs and records it)
+            result = await ctx.plugin_manager.run_before_tool_callback(
+                tool=_query_books_db_tool, tool_args=arguments, tool_context=tool_context
             )
-        ),
+            if result is None:
+                result = await query_books_db_async(**arguments, tool_context=tool_context)
+            altered = await ctx.plugin_manager.run_after_tool_callback(
+                tool=_query_books_db_tool, tool_args=arguments, tool_context=tool_context, result=result
+            )
+            if altered is not None:
+                result = altered
+            if result["status"] == "success" or cursor is not None:
+                logger.info(f"[FastPathDBAgent] Answered without LLM using arguments {json.dumps(arguments)}")
+                if result["status"] == "success":
+                    text = format_books(result["books"], result.get("cursor"), result.get("relaxations"))
+                else:
+                    text = result["error_message"]
+                yield Event(
+                    invocation_id=ctx.invocation_id,
+                    author=self.name,
+                    branch=ctx.branch,
+                    content=types.Content(
+                        role="model",
+                        parts=[types.Part(text=text)]
+                    ),
+                    actions=tool_context.actions,
+                )
+                return
+
+        logger.info("[FastPathDBAgent] Passing the request to the LLM agent")
+        async for event in self.llm_agent.run_async(ctx):
+            yield event
+
+def get_default_model() -> Gemini:
+    # Gemini model of all agents (db_agent and the bookshop agents), retried on rate limits and server errors
+    return Gemini(
+        model="gemini-2.5-flash-lite", 
+        retry_options=types.HttpRetryOptions(
+            attempts=5, 
+            exp_base=7,  
+            initial_delay=1,
+            http_status_codes=[429, 500, 503, 504]
+        )
+    )
+
+def get_db_agent(fast_path=True, model: Optional[Union[str, BaseLlm]] = None):
+    """
+    Create the db_agent. By default it uses Gemini, pass another model
+    (e.g. stand_in_llm.StandInLlm for offline load tests) to replace it.
+    """
+
+    db_agent = Agent(
+        name="db_llm_agent" if fast_path else "db_agent",
+        model=model if model is not None else get_default_model(),
         description="Agent that queries the BOOKS database for titles matching the user's request.",
         instruction="""
         You are the BOOKS database querying agent. The BOOKS table has fields:
@@ -285,6 +697,7 @@ def get_db_agent():
             PUBLISHER: string
             PRICE: real
             PUBLISH_YEAR: integer
+            SUMMARY: string (short summary of DESCRIPTION)
 
         Your job:
         1. Analyze the user request and extract:
@@ -294,6 +707,8 @@ def get_db_agent():
             - Categories the user explicitly excludes
             - Keywords the user wants (matched against title & description)
             - Keywords the user explicitly excludes (matched against title & description)
+            - Price range the user wants (e.g., "cheap", "under $20")
+            - Publication years the user wants (e.g., "after 2010", "from the 90s")
         Only extract information you are very confident about.
 
         2. Call `query_books_db` with:
@@ -303,23 +718,42 @@ def get_db_agent():
             excluded_categories
             included_keywords
             excluded_keywords
+            min_price
+            max_price
+            min_publish_year
+            max_publish_year
+            rank_by_relevance
+            relax
         Use None for any argument you are uncertain about.
+        Bounds are inclusive: "after 2010" is min_publish_year=2011, "under $20" is max_price=20.
+        For "cheap" books use max_price=10.
+        Always set relax to True, so `query_books_db` relaxes the search itself when nothing matches.
+        Set rank_by_relevance to True when the user is looking for a specific topic given by included_keywords.
+        Leave fields and summary_words as None, the default fields contain everything needed below.
+        If the request contains a results cursor, call `query_books_db` with only cursor set to it.
+        If you are unsure whether the filters are too narrow or too broad, first call `count_books_facets`
+        with the same filters. It returns the number of matching books and their most common categories,
+        authors, publishers and publication years, so you can refine the filters in one step.
 
         3. Check the returned `status` field:
             - If success → return the list of books immediately in a specified format
+            If the result contains `relaxations`, start with the line
+            Relaxed search: <relaxations separated with commas>
+
             Book number: <number starting from 1>
             Title: <title>
             Authors: <authors>
             Category: <category>
-            Summary: <30-word summary of description>
+            Summary: <summary>
             Publisher: <publisher>
             Price: <price>
             Publication Year: <year>
 
-            - If error → retry with slightly relaxed arguments.
-            - Retry up to 3 times total.
+            If the result contains a `cursor`, end with the line
+            More results cursor: <cursor>
 
-        4. If all retries fail, return the final error message.
+            - If error → return the error message, do not retry.
+              The search was already relaxed by `query_books_db`.
 
         Guidelines:
         - Be generous when interpreting categories (e.g., “autobiography about Obama”
@@ -329,7 +763,15 @@ def get_db_agent():
         - Start the search immediately after receiving a request. Do not ask the user questions or request clarification.
         - If no books are found after a query, say that the search returned no results.
         """,
-        tools=[query_books_db],
+        tools=[query_books_db_async, count_books_facets_async],
     )
 
+    if fast_path:
+        return FastPathDBAgent(
+            name="db_agent",
+            description=db_agent.description,
+            llm_agent=db_agent,
+            sub_agents=[db_agent],
+        )
+
     return db_agent
@@ -0,0 +1,212 @@
+import os
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from db_agent.books_db import BOOKS_DB_PATH, BooksResultCache, books_db_generation, candidate_rowids, get_books_pool
+
+# Facets counted for a search and the BOOKS column each one is taken from
+FACET_COLUMNS = {
+    "categories": "CATEGORY",
+    "authors": "AUTHORS",
+    "publishers": "PUBLISHER",
+    "publish_years": "PUBLISH_YEAR",
+}
+
+# Precomputed by scripts/create_books_db and stored next to books.db as memory-mapped NumPy arrays
+# (shared by all db_agent workers): the values of every facet with their number of books,
+# and the values of every book (a book has one value per facet, except for several authors)
+BOOKS_FACETS_DIR = "db/books_facets"
+
+# Publication years are counted in buckets of this many years (e.g. "2000-2009")
+PUBLISH_YEAR_BUCKET = 10
+
+# Values returned per facet by default
+FACETS_TOP = 5
+
+FACETS_BUILD_BATCH_SIZE = 50000
+
+
+def book_facet_values(facet: str, value) -> list[str]:
+    """
+    Facet values of one book from its BOOKS column value
+    """
+
+    if value is None:
+        return []
+    if facet == "authors":
+        return [author.strip() for author in str(value).split(",") if author.strip()]
+    if facet == "publish_years":
+        try:
+            start = int(value) // PUBLISH_YEAR_BUCKET * PUBLISH_YEAR_BUCKET
+        except (TypeError, ValueError):
+            return []
+        return [f"{start}-{start + PUBLISH_YEAR_BUCKET - 1}"]
+    value = str(value).strip()
+    return [value] if value else []
+
+
+@dataclass
+class FacetIndex:
+    """
+    Facet values of every book as NumPy arrays: for every facet, the book rowids (sorted), the value id of each
+    and the names and total counts of the values
+    """
+
+    values: dict[str, list[str]]
+    totals: dict[str, np.ndarray]
+    book_rowids: dict[str, np.ndarray]
+    value_ids: dict[str, np.ndarray]
+    max_rowid: int
+    total_books: int
+
+    def counts(self, facet: str, rowids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        Number of books with every value of facet among rowids (all books if rowids is None)
+        """
+
+        if rowids is None:
+            return self.totals[facet]
+
+        # A boolean mask over rowids is one vectorized pass over the facet, however many books match
+        rowids = np.asarray(rowids, dtype=np.int64)
+        selected = np.zeros(max(self.max_rowid, int(rowids.max(initial=0))) + 1, dtype=bool)
+        selected[rowids] = True
+        return np.bincount(self.value_ids[facet][selected[self.book_rowids[facet]]], minlength=len(self.values[facet]))
+
+
+def facet_index_from_rows(rows) -> FacetIndex:
+    """
+    Build a FacetIndex from (rowid, CATEGORY, AUTHORS, PUBLISHER, PUBLISH_YEAR) rows of BOOKS
+    """
+
+    ids: dict[str, dict[str, int]] = {facet: {} for facet in FACET_COLUMNS}
+    pairs: dict[str, tuple[list[int], list[int]]] = {facet: ([], []) for facet in FACET_COLUMNS}
+    max_rowid = 0
+    total_books = 0
+    for rowid, *columns in rows:
+        max_rowid = max(max_rowid, rowid)
+        total_books += 1
+        for facet, value in zip(FACET_COLUMNS, columns):
+            facet_ids = ids[facet]
+            book_rowids, value_ids = pairs[facet]
+            for name in set(book_facet_values(facet, value)):
+                book_rowids.append(rowid)
+                value_ids.append(facet_ids.setdefault(name, len(facet_ids)))
+
+    index = FacetIndex(values={}, totals={}, book_rowids={}, value_ids={}, max_rowid=max_rowid, total_books=total_books)
+    for facet in FACET_COLUMNS:
+        book_rowids = np.array(pairs[facet][0], dtype=np.int64)
+        value_ids = np.array(pairs[facet][1], dtype=np.int32)
+        order = np.argsort(book_rowids, kind="stable")
+        index.values[facet] = list(ids[facet])
+        index.book_rowids[facet] = book_rowids[order]
+        index.value_ids[facet] = value_ids[order]
+        index.totals[facet] = np.bincount(value_ids, minlength=len(ids[facet]))
+    return index
+
+
+def build_facet_index(conn: sqlite3.Connection, index_dir: str = BOOKS_FACETS_DIR) -> None:
+    """
+    Compute the facet index from the BOOKS table and save it in index_dir
+    """
+
+    columns = ", ".join(FACET_COLUMNS.values())
+    cursor = conn.execute(f"SELECT rowid, {columns} FROM BOOKS ORDER BY rowid;")
+
+    def rows():
+        while batch := cursor.fetchmany(FACETS_BUILD_BATCH_SIZE):
+            yield from batch
+
+    index = facet_index_from_rows(rows())
+
+    os.makedirs(index_dir, exist_ok=True)
+    for facet in FACET_COLUMNS:
+        np.save(os.path.join(index_dir, f"{facet}_book_rowids.npy"), index.book_rowids[facet])
+        np.save(os.path.join(index_dir, f"{facet}_value_ids.npy"), index.value_ids[facet])
+        np.save(os.path.join(index_dir, f"{facet}_totals.npy"), index.totals[facet].astype(np.int64))
+    with open(os.path.join(index_dir, "values.json"), "w") as f:
+        json.dump({"values": index.values, "max_rowid": index.max_rowid, "total_books": index.total_books}, f)
+
+
+def load_facet_index(index_dir: str = BOOKS_FACETS_DIR) -> Optional[FacetIndex]:
+    """
+    Memory-map a saved facet index. Returns None if the index doesn't exist.
+    """
+
+    if not os.path.exists(os.path.join(index_dir, "values.json")):
+        return None
+
+    with open(os.path.join(index_dir, "values.json")) as f:
+        saved = json.load(f)
+
+    index = FacetIndex(
+        values=saved["values"], totals={}, book_rowids={}, value_ids={},
+        max_rowid=saved["max_rowid"], total_books=saved["total_books"],
+    )
+    for facet in FACET_COLUMNS:
+        index.book_rowids[facet] = np.load(os.path.join(index_dir, f"{facet}_book_rowids.npy"), mmap_mode="r")
+        index.value_ids[facet] = np.load(os.path.join(index_dir, f"{facet}_value_ids.npy"), mmap_mode="r")
+        index.totals[facet] = np.load(os.path.join(index_dir, f"{facet}_totals.npy"), mmap_mode="r")
+    return index
+
+
+_facet_index: Optional[FacetIndex] = None
+_facet_index_generation: Optional[tuple] = None
+_facet_index_lock = threading.Lock()
+
+
+def get_facet_index() -> FacetIndex:
+    """
+    Return the facet index of the current BOOKS database (reloaded when the database file changes)
+    """
+
+    global _facet_index, _facet_index_generation
+    generation = books_db_generation(BOOKS_DB_PATH)
+    with _facet_index_lock:
+        if _facet_index is None or _facet_index_generation != generation:
+            _facet_index = load_facet_index(BOOKS_FACETS_DIR)
+            if _facet_index is None:
+                # Databases built before the facet index: compute it in this process
+                columns = ", ".join(FACET_COLUMNS.values())
+                with get_books_pool().connection() as conn:
+                    _facet_index = facet_index_from_rows(conn.execute(f"SELECT rowid, {columns} FROM BOOKS;"))
+            _facet_index_generation = generation
+        return _facet_index
+
+
+def count_facets(
+        conn: sqlite3.Connection,
+        index: FacetIndex,
+        filters: dict[str, Optional[tuple[str, ...]]],
+        cache: BooksResultCache,
+        top: int = FACETS_TOP,
+    ) -> dict:
+    """
+    Number of books matching normalized filters and the `top` most common values of every facet among them
+    """
+
+    if any(value is not None for value in filters.values()):
+        rowids = candidate_rowids(conn, filters, cache)
+        total = len(rowids)
+    else:
+        # The whole catalog, counted when the facet index was built
+        rowids = None
+        total = index.total_books
+
+    result = {"total": total}
+    for facet in FACET_COLUMNS:
+        counts = index.counts(facet, rowids)
+        best = np.flatnonzero(counts)
+        if len(best) > top:
+            best = best[np.argpartition(-counts[best], top - 1)[:top]]
+        best = best[np.argsort(-counts[best], kind="stable")]
+        result[facet] = [
+            {"value": index.values[facet][value_id], "books": int(counts[value_id])}
+            for value_id in best
+        ]
+    return result
@@ -0,0 +1,365 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from db_agent.books_db import BOOKS_DB_PATH, books_db_generation, get_books_pool
+
+# Words of a book request that don't carry search information
+REQUEST_STOP_WORDS = {
+    "a", "an", "the", "i", "i'm", "im", "me", "my", "you", "your", "we", "is", "are", "be", "it",
+    "want", "wants", "need", "searching", "search", "looking", "look", "find", "get", "show", "give",
+    "for", "of", "and", "or", "to", "in", "with", "some", "any", "anything", "something", "please",
+    "do", "does", "have", "has", "can", "could", "would", "like", "love", "recommend", "recommendations",
+    "book", "books", "title", "titles", "read", "reading", "written", "by", "that", "this", "these",
+    "but", "also", "about", "related", "on", "only", "really", "good", "great", "interesting",
+}
+
+# Words that turn the rest of a clause into exclusions
+NEGATION_WORDS = {
+    "no", "not", "nothing", "without", "hate", "dislike", "don't", "dont", "never", "except",
+    "avoid", "none", "excluding", "exclude",
+}
+
+# Words that carry a negation over to the word right after them ("no fiction or history")
+NEGATION_CONJUNCTIONS = {"or", "nor", "and"}
+
+# Words after which the user takes a dislike back ("actually I like fiction", "I don't mind fiction")
+LIKE_WORDS = {"like", "likes", "love", "loves", "enjoy", "enjoys"}
+
+# Words allowed between a dislike or like word and the category or author it is about
+PREFERENCE_FILLER_WORDS = {
+    "like", "want", "enjoy", "into", "read", "really", "much", "any", "more", "the", "a", "an", "some",
+    "book", "books", "novels", "of", "by", "about", "on", "written", "so", "too", "please", "to",
+}
+
+# Words after which a book topic (keyword) follows
+TOPIC_WORDS = {"about", "related", "on", "regarding"}
+
+# Words after which an author follows
+AUTHOR_WORDS = {"by", "author", "authors", "writer"}
+
+# Generic parts of category names that don't describe the category
+GENERIC_CATEGORY_WORDS = {"general", "&", "and", "the", "of", "other", "special", "topics"}
+
+# Saved by scripts/create_books_db, so all db_agent workers use the same vocabulary instead of mining their own
+BOOKS_VOCABULARY_PATH = "db/books_vocabulary.json"
+
+# Description words present in more than this share of sampled books are treated as stop words
+STOP_WORD_MIN_SHARE = 0.2
+STOP_WORD_SAMPLE_SIZE = 5000
+
+_WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'\-]*")
+# Clauses end with punctuation and contrasting conjunctions ("no politics but I love history")
+_CLAUSE_PATTERN = re.compile(r"[.,;!?]+|\b(?:but|however|although|though|whereas)\b", re.IGNORECASE)
+# Continuation cursor of query_books_db quoted in a request for more books (e.g. "More results cursor: eJyr...")
+_CURSOR_PATTERN = re.compile(r"\bcursor\W{0,3}([A-Za-z0-9_\-]{16,})", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class BooksVocabulary:
+    categories: frozenset[str]
+    author_last_names: frozenset[str]
+    stop_words: frozenset[str]
+
+
+def build_vocabulary(conn: sqlite3.Connection) -> BooksVocabulary:
+    """
+    Mine categories, author last names and stop words from the BOOKS table
+    """
+
+    categories = set()
+    for (category,) in conn.execute("SELECT DISTINCT CATEGORY FROM BOOKS;"):
+        for word in _WORD_PATTERN.findall(str(category).lower()):
+            if word not in GENERIC_CATEGORY_WORDS:
+                categories.add(word)
+
+    author_last_names = set()
+    for (authors,) in conn.execute("SELECT DISTINCT AUTHORS FROM BOOKS;"):
+        for author in str(authors).split(","):
+            words = _WORD_PATTERN.findall(author.lower())
+            if words:
+                author_last_names.add(words[-1])
+
+    document_frequency = Counter()
+    rows = conn.execute(
+        "SELECT DESCRIPTION FROM BOOKS ORDER BY RANDOM() LIMIT ?;", (STOP_WORD_SAMPLE_SIZE,)
+    ).fetchall()
+    for (description,) in rows:
+        document_frequency.update(set(_WORD_PATTERN.findall(str(description).lower())))
+    stop_words = {
+        word for word, count in document_frequency.items()
+        if rows and count / len(rows) > STOP_WORD_MIN_SHARE
+    }
+
+    return BooksVocabulary(
+        categories=frozenset(categories),
+        author_last_names=frozenset(author_last_names),
+        stop_words=frozenset((stop_words | REQUEST_STOP_WORDS) - categories),
+    )
+
+
+def save_vocabulary(vocabulary: BooksVocabulary, path: str = BOOKS_VOCABULARY_PATH) -> None:
+    with open(path, "w") as f:
+        json.dump({
+            "categories": sorted(vocabulary.categories),
+            "author_last_names": sorted(vocabulary.author_last_names),
+            "stop_words": sorted(vocabulary.stop_words),
+        }, f)
+
+
+def load_vocabulary(path: str = BOOKS_VOCABULARY_PATH) -> Optional[BooksVocabulary]:
+    """
+    Load a saved vocabulary. Returns None if it doesn't exist.
+    """
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        saved = json.load(f)
+    return BooksVocabulary(
+        categories=frozenset(saved["categories"]),
+        author_last_names=frozenset(saved["author_last_names"]),
+        stop_words=frozenset(saved["stop_words"]),
+    )
+
+
+_vocabulary: Optional[BooksVocabulary] = None
+_vocabulary_generation: Optional[tuple] = None
+_vocabulary_lock = threading.Lock()
+
+
+def get_books_vocabulary() -> BooksVocabulary:
+    """
+    Return the vocabulary of the current BOOKS database (reloaded when the database file changes)
+    """
+
+    global _vocabulary, _vocabulary_generation
+    generation = books_db_generation(BOOKS_DB_PATH)
+    with _vocabulary_lock:
+        if _vocabulary is None or _vocabulary_generation != generation:
+            _vocabulary = load_vocabulary(BOOKS_VOCABULARY_PATH)
+            if _vocabulary is None:
+                # Databases built before the saved vocabulary: mine it in this process
+                with get_books_pool().connection() as conn:
+                    _vocabulary = build_vocabulary(conn)
+            _vocabulary_generation = generation
+        return _vocabulary
+
+
+def category_term(word: str, vocabulary: BooksVocabulary) -> Optional[str]:
+    # Plural forms like "biographies" or "novels" are matched to the singular category word
+    candidates = [word]
+    if word.endswith("ies"):
+        candidates.append(word[:-3] + "y")
+    if word.endswith("es"):
+        candidates.append(word[:-2])
+    if word.endswith("s"):
+        candidates.append(word[:-1])
+
+    for candidate in candidates:
+        if candidate in vocabulary.categories:
+            return candidate
+    return None
+
+
+def extract_cursor(prompt: str) -> Optional[str]:
+    """
+    Return the query_books_db cursor quoted in a request for more books of an earlier search
+    """
+
+    match = _CURSOR_PATTERN.search(prompt)
+    return match.group(1) if match else None
+
+
+def _is_name_word(word: str, vocabulary: BooksVocabulary) -> bool:
+    lower = word.lower()
+    return (
+        word[0].isupper()
+        and lower not in REQUEST_STOP_WORDS
+        and lower not in vocabulary.stop_words
+        and lower not in NEGATION_WORDS | AUTHOR_WORDS | TOPIC_WORDS
+        and category_term(lower, vocabulary) is None
+    )
+
+
+def extract_query_arguments(prompt: str, vocabulary: BooksVocabulary) -> Optional[dict]:
+    """
+    Map a simple book request to query_books_db arguments without an LLM.
+    Returns None when the prompt contains anything the extractor can't interpret with confidence.
+    """
+
+    arguments = {}
+    prompt = prompt.replace("\u2019", "'")
+
+    def add(name: str, value: str) -> None:
+        values = arguments.setdefault(name, [])
+        if value not in values:
+            values.append(value)
+
+    for clause in _CLAUSE_PATTERN.split(prompt):
+        words = _WORD_PATTERN.findall(clause)
+        # A negation covers the next content word only ("I don't mind fiction" doesn't exclude fiction)
+        negated = False
+        expect = None
+        author: list[str] = []
+        author_field = None
+        previous_excluded = False
+        previous_category = False
+        carried_negation = False
+
+        for word in words:
+            lower = word.lower()
+
+            if author:
+                # Capitalized words right after the first one are the same name ("by Mary Smith")
+                if _is_name_word(word, vocabulary):
+                    author.append(word)
+                    continue
+                add(author_field, " ".join(author))
+                author = []
+
+            follows_excluded, previous_excluded = previous_excluded, False
+            follows_category, previous_category = previous_category, False
+            follows_conjunction, carried_negation = carried_negation, False
+
+            if lower in NEGATION_WORDS:
+                negated = True
+                continue
+            if follows_excluded and lower in NEGATION_CONJUNCTIONS:
+                # "no fiction or history" excludes both
+                negated = True
+                carried_negation = True
+                continue
+            if follows_conjunction and (lower in REQUEST_STOP_WORDS or lower in vocabulary.stop_words):
+                # ... but "no fiction and I love history" doesn't exclude history
+                negated = False
+            if lower in AUTHOR_WORDS:
+                expect = "authors"
+                continue
+            if lower in TOPIC_WORDS:
+                expect = "keywords"
+                continue
+
+            prefix = "excluded_" if negated else "included_"
+            category = None
+
+            if expect == "authors" and lower not in vocabulary.stop_words:
+                # Authors are taken after "by" even if they are not in the catalog (the search should just fail)
+                author = [word[0].upper() + word[1:]]
+                author_field = prefix + "authors"
+                expect = None
+            elif expect == "keywords" and lower not in REQUEST_STOP_WORDS:
+                # The topic is kept even if it's common in descriptions, the user asked about it explicitly
+                add(prefix + "keywords", lower)
+                expect = None
+            elif lower in REQUEST_STOP_WORDS or (lower in vocabulary.stop_words and not negated):
+                continue
+            elif (category := category_term(lower, vocabulary)) is not None:
+                if follows_category:
+                    # Several words of one category name ("science fiction", "political science") would be
+                    # searched as separate categories, and any of them matches
+                    return None
+                add(prefix + "categories", category)
+            elif lower in vocabulary.author_last_names and word[0].isupper():
+                add(prefix + "authors", word)
+            elif negated and lower in vocabulary.stop_words:
+                # What the user doesn't want is excluded even if it's common in descriptions (e.g. "no politics")
+                add("excluded_keywords", lower)
+            else:
+                # Unknown content word, leave the prompt to the LLM
+                return None
+
+            previous_category = category is not None
+            previous_excluded = negated
+            negated = False
+
+        if author:
+            add(author_field, " ".join(author))
+
+    if not arguments:
+        return None
+    return arguments
+
+
+def extract_preference_changes(
+        prompt: str,
+        vocabulary: BooksVocabulary,
+    ) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+    """
+    Catalog categories and authors the user says they dislike ("no fiction", "I'm not into fiction", "I hate Kubick")
+    and dislikes they take back ("actually I like fiction"), both keyed by the excluded_* argument they belong to.
+    Only what directly follows such a cue is taken, so "I don't want long books about history" changes nothing.
+    Taken back dislikes may also name keywords, since removing an exclusion can't hide any books.
+    """
+
+    disliked: dict[str, list[str]] = {}
+    liked: dict[str, list[str]] = {}
+    prompt = prompt.replace("\u2019", "'")
+
+    def add(changes: dict[str, list[str]], name: str, value: str) -> None:
+        values = changes.setdefault(name, [])
+        if value not in values:
+            values.append(value)
+
+    for clause in _CLAUSE_PATTERN.split(prompt):
+        words = _WORD_PATTERN.findall(clause)
+        changes = None
+        expect = False
+        after_item = False
+        by_author = False
+
+        i = 0
+        while i < len(words):
+            word = words[i]
+            lower = word.lower()
+            i += 1
+
+            if lower in NEGATION_WORDS:
+                changes, expect, after_item = disliked, True, False
+                continue
+            if changes is disliked and expect and lower == "mind":
+                changes = liked
+                continue
+            if lower in LIKE_WORDS and not (changes is disliked and expect):
+                changes, expect, after_item = liked, True, False
+                continue
+            if changes is None:
+                continue
+            if after_item and lower in NEGATION_CONJUNCTIONS:
+                expect, after_item = True, False
+                continue
+            if expect and lower in PREFERENCE_FILLER_WORDS:
+                by_author = by_author or lower == "by"
+                continue
+
+            if expect and (category := category_term(lower, vocabulary)) is not None:
+                if i < len(words) and category_term(words[i].lower(), vocabulary) is not None:
+                    # Part of a longer category name ("science fiction"), which doesn't say which category is meant
+                    changes = None
+                    continue
+                add(changes, "excluded_categories", category)
+            elif expect and (word[0].isupper() or by_author):
+                name = [word[0].upper() + word[1:]]
+                while i < len(words) and _is_name_word(words[i], vocabulary):
+                    name.append(words[i])
+                    i += 1
+                if name[-1].lower() not in vocabulary.author_last_names:
+                    changes = None
+                    continue
+                add(changes, "excluded_authors", " ".join(name))
+            elif expect and changes is liked and lower not in REQUEST_STOP_WORDS and lower not in vocabulary.stop_words:
+                add(changes, "excluded_keywords", lower)
+            else:
+                # Anything else ends what the cue is about
+                changes = None
+                continue
+
+            expect, after_item, by_author = False, True, False
+
+    return disliked, liked
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from db_agent.books_db import BOOKS_DB_PATH, books_db_generation, build_filter, filter_arguments, should_use_fts
+
+# BM25 index over TITLE and DESCRIPTION, stored next to books.db as memory-mapped NumPy arrays
+BOOKS_BM25_DIR = "db/books_bm25"
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_BUILD_BATCH_SIZE = 50000
+
+# Ranked candidates are checked against the remaining filters in pages of this size (times limit)
+RANKED_CANDIDATE_FACTOR = 5
+RANKED_MAX_PAGE_SIZE = 5000
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+@dataclass
+class BM25Index:
+    """
+    Term-major CSR matrix of BM25 weights (row = term, column = book) and the BOOKS rowid of every column
+    """
+
+    vocabulary: dict[str, int]
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    rowids: np.ndarray
+
+    def scores(self, keywords: list[str]) -> np.ndarray:
+        """
+        BM25 score of every book for the query made of all keywords
+        """
+
+        scores = np.zeros(len(self.rowids), dtype=np.float32)
+        term_ids = {self.vocabulary[t] for kw in keywords for t in tokenize(kw) if t in self.vocabulary}
+        for term_id in term_ids:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            scores[self.indices[start:end]] += self.data[start:end]
+        return scores
+
+
+def build_bm25_index(
+        conn: sqlite3.Connection,
+        index_dir: str = BOOKS_BM25_DIR,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+    ) -> None:
+    """
+    Precompute BM25 weights of TITLE + DESCRIPTION for every book and save them in index_dir
+    """
+
+    # SciPy is only needed to build the index, queries use the saved NumPy arrays
+    from scipy import sparse
+
+    vocabulary: dict[str, int] = {}
+    blocks = []
+    doc_lengths = []
+    rowids = []
+
+    cursor = conn.execute("SELECT rowid, TITLE, DESCRIPTION FROM BOOKS ORDER BY rowid;")
+    while True:
+        rows = cursor.fetchmany(BM25_BUILD_BATCH_SIZE)
+        if not rows:
+            break
+
+        term_ids, doc_ids, term_counts = [], [], []
+        for doc_no, (rowid, title, description) in enumerate(rows):
+            counts = Counter(tokenize(f"{title} {description}"))
+            rowids.append(rowid)
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_no)
+                term_counts.append(count)
+
+        blocks.append(sparse.csc_matrix(
+            (np.array(term_counts, dtype=np.float32), (np.array(term_ids), np.array(doc_ids))),
+            shape=(len(vocabulary), len(rows)),
+        ))
+
+    for block in blocks:
+        block.resize((len(vocabulary), block.shape[1]))
+    tf = sparse.hstack(blocks, format="csr") if blocks else sparse.csr_matrix((0, 0), dtype=np.float32)
+    tf.sort_indices()
+
+    # BM25 weight = idf(term) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_length / avg_doc_length))
+    n_docs = len(rowids)
+    doc_lengths = np.array(doc_lengths, dtype=np.float32)
+    avg_doc_length = float(doc_lengths.mean()) if n_docs else 0.0
+    doc_frequency = np.diff(tf.indptr).astype(np.float32)
+    idf = np.log(1 + (n_docs - doc_frequency + 0.5) / (doc_frequency + 0.5)).astype(np.float32)
+    norm = k1 * (1 - b + b * doc_lengths / max(avg_doc_length, 1e-9))
+
+    counts = tf.data
+    weights = np.repeat(idf, np.diff(tf.indptr)) * counts * (k1 + 1) / (counts + norm[tf.indices])
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "indptr.npy"), tf.indptr.astype(np.int64))
+    np.save(os.path.join(index_dir, "indices.npy"), tf.indices.astype(np.int32))
+    np.save(os.path.join(index_dir, "data.npy"), weights.astype(np.float32))
+    np.save(os.path.join(index_dir, "rowids.npy"), np.array(rowids, dtype=np.int64))
+    with open(os.path.join(index_dir, "vocabulary.json"), "w") as f:
+        json.dump(vocabulary, f)
+
+
+def load_bm25_index(index_dir: str = BOOKS_BM25_DIR) -> Optional[BM25Index]:
+    """
+    Memory-map a saved BM25 index. Returns None if the index doesn't exist.
+    """
+
+    if not os.path.exists(os.path.join(index_dir, "vocabulary.json")):
+        return None
+
+    with open(os.path.join(index_dir, "vocabulary.json")) as f:
+        vocabulary = json.load(f)
+
+    return BM25Index(
+        vocabulary=vocabulary,
+        indptr=np.load(os.path.join(index_dir, "indptr.npy"), mmap_mode="r"),
+        indices=np.load(os.path.join(index_dir, "indices.npy"), mmap_mode="r"),
+        data=np.load(os.path.join(index_dir, "data.npy"), mmap_mode="r"),
+        rowids=np.load(os.path.join(index_dir, "rowids.npy"), mmap_mode="r"),
+    )
+
+
+_bm25_index: Optional[BM25Index] = None
+_bm25_index_generation: Optional[tuple] = None
+_bm25_index_lock = threading.Lock()
+
+
+def get_bm25_index() -> Optional[BM25Index]:
+    """
+    Return the BM25 index of the current BOOKS database (reloaded when the database file changes)
+    """
+
+    global _bm25_index, _bm25_index_generation
+    generation = books_db_generation(BOOKS_DB_PATH)
+    with _bm25_index_lock:
+        if _bm25_index is None or _bm25_index_generation != generation:
+            _bm25_index = load_bm25_index(BOOKS_BM25_DIR)
+            _bm25_index_generation = generation
+        return _bm25_index
+
+
+def ranked_rowids(
+        conn: sqlite3.Connection,
+        index: BM25Index,
+        keywords: list[str],
+        filter_part: str,
+        params: list,
+        k: int,
+    ) -> list[int]:
+    """
+    Return rowids of the k books most relevant to keywords that also match filter_part
+    """
+
+    scores = index.scores(keywords)
+    candidates = np.flatnonzero(scores)
+    and_filter = "AND " + filter_part[len("WHERE "):] if filter_part else ""
+
+    result = []
+    checked = 0
+    page_size = k * RANKED_CANDIDATE_FACTOR
+    while len(result) < k and checked < len(candidates):
+        # Order only the next page of best candidates instead of sorting all of them
+        end = min(checked + page_size, len(candidates))
+        if end < len(candidates):
+            top = np.argpartition(-scores[candidates], end - 1)[:end]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[candidates[top]], kind="stable")]
+        page = [int(index.rowids[doc]) for doc in candidates[top[checked:end]]]
+
+        placeholders = ",".join("?" * len(page))
+        query = conn.execute(
+            f"SELECT rowid FROM BOOKS WHERE rowid IN ({placeholders}) {and_filter};",
+            page + params
+        )
+        matched = {r[0] for r in query.fetchall()}
+        result.extend(rowid for rowid in page if rowid in matched)
+
+        checked = end
+        page_size = min(page_size * 4, RANKED_MAX_PAGE_SIZE)
+
+    return result[:k]
+
+
+def search_ranked_page(
+        conn: sqlite3.Connection,
+        index: BM25Index,
+        filters: dict[str, Optional[tuple[str, ...]]],
+        offset: int = 0,
+        limit: int = 10,
+        excluded_rowids: frozenset[int] = frozenset(),
+    ) -> tuple[list[int], Optional[int]]:
+    """
+    Return rowids of the books at positions offset.. of the BM25 ranking of normalized filters
+    (skipping excluded_rowids) and the offset of the next page (None if no books are left)
+    """
+
+    filters = filter_arguments(filters)
+    keywords = filters.pop("included_keywords")
+    filter_part, params = build_filter(**filters, use_fts=should_use_fts(conn, None, filters["excluded_keywords"]))
+
+    k = offset + limit + len(excluded_rowids)
+    ranked = ranked_rowids(conn, index, keywords, filter_part, params, k)
+
+    page = []
+    while offset < len(ranked) and len(page) < limit:
+        if ranked[offset] not in excluded_rowids:
+            page.append(ranked[offset])
+        offset += 1
+    more = offset < len(ranked) or len(ranked) == k
+    return page, offset if more else None
@@ -0,0 +1,72 @@
+import re
+import difflib
+from typing import Iterator, Optional
+
+from db_agent.fast_path import BooksVocabulary, category_term
+
+# Relaxations of a search that found no books, applied one after another (each level keeps the earlier ones).
+# Exclusions and price and publication year ranges are never relaxed.
+RELAXATIONS = ("dropped_keywords", "widened_categories", "fuzzy_authors")
+
+# Author last names of the catalog at least this similar to a requested author are searched instead of it
+FUZZY_AUTHOR_CUTOFF = 0.75
+FUZZY_AUTHOR_MATCHES = 3
+
+_WORD_PATTERN = re.compile(r"[a-z][a-z'\-]*")
+
+Filters = dict[str, Optional[tuple[str, ...]]]
+
+
+def widen_categories(categories: tuple[str, ...], vocabulary: BooksVocabulary) -> Optional[tuple[str, ...]]:
+    """
+    Replace every category with the catalog category words it contains (e.g. "political memoirs" -> "political"),
+    a category without any is dropped
+    """
+
+    widened = set()
+    for category in categories:
+        for word in _WORD_PATTERN.findall(category):
+            term = category_term(word, vocabulary)
+            if term is not None:
+                widened.add(term)
+    return tuple(sorted(widened)) or None
+
+
+def fuzzy_authors(authors: tuple[str, ...], vocabulary: BooksVocabulary) -> tuple[str, ...]:
+    """
+    Add catalog author last names close to the last name of every author (e.g. misspelled "Aksionov" -> "aksyonov")
+    """
+
+    matched = set(authors)
+    for author in authors:
+        words = _WORD_PATTERN.findall(author)
+        if words:
+            matched.update(difflib.get_close_matches(
+                words[-1], vocabulary.author_last_names, n=FUZZY_AUTHOR_MATCHES, cutoff=FUZZY_AUTHOR_CUTOFF
+            ))
+    return tuple(sorted(matched))
+
+
+def relaxation_ladder(filters: Filters, vocabulary: BooksVocabulary) -> Iterator[tuple[list[str], Filters]]:
+    """
+    Yield the normalized filters of a search followed by its relaxed versions, each with the relaxations applied.
+    Relaxations that don't change the filters are skipped. Levels are computed lazily,
+    so a search that finds books doesn't pay for the fuzzy author matching.
+    """
+
+    applied = []
+    yield list(applied), filters
+
+    for relaxation in RELAXATIONS:
+        relaxed = dict(filters)
+        if relaxation == "dropped_keywords":
+            relaxed["included_keywords"] = None
+        elif relaxation == "widened_categories" and filters["included_categories"]:
+            relaxed["included_categories"] = widen_categories(filters["included_categories"], vocabulary)
+        elif relaxation == "fuzzy_authors" and filters["included_authors"]:
+            relaxed["included_authors"] = fuzzy_authors(filters["included_authors"], vocabulary)
+
+        if relaxed != filters:
+            applied.append(relaxation)
+            filters = relaxed
+            yield list(applied), filters
@@ -0,0 +1,44 @@
+from google.adk.sessions.database_session_service import DatabaseSessionService
+
+import os
+import time
+import sqlite3
+import logging
+from sqlalchemy.exc import OperationalError
+
+# Session database shared by all db_agent A2A server workers
+DB_AGENT_SESSION_DB_PATH = "db/db_agent_session.db"
+
+# How long a worker waits for another worker's write transaction before failing
+SESSION_DB_BUSY_TIMEOUT_SECONDS = 30
+
+# Workers starting at the same time may race to create the session tables
+SESSION_DB_CREATE_ATTEMPTS = 5
+
+logger = logging.getLogger("db_agent_logger")
+
+
+def create_shared_session_service(db_path: str = DB_AGENT_SESSION_DB_PATH) -> DatabaseSessionService:
+    """
+    Create a session service backed by an SQLite database in WAL mode,
+    so several server processes can read and write the same sessions concurrently
+    """
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    # WAL mode is stored in the database file, so it's enough to set it once for all connections
+    conn = sqlite3.connect(db_path, timeout=SESSION_DB_BUSY_TIMEOUT_SECONDS)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.close()
+
+    for attempt in range(1, SESSION_DB_CREATE_ATTEMPTS + 1):
+        try:
+            return DatabaseSessionService(
+                db_url=f"sqlite:///{db_path}",
+                connect_args={"timeout": SESSION_DB_BUSY_TIMEOUT_SECONDS},
+            )
+        except (OperationalError, ValueError) as e:
+            if attempt == SESSION_DB_CREATE_ATTEMPTS:
+                raise
+            logger.warning(f"Creating session tables failed ({e}), retrying")
+            time.sleep(0.2 * attempt)
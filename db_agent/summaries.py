@@ -0,0 +1,59 @@
+import re
+from collections import Counter
+
+# Length of the summaries stored in the BOOKS table by scripts/create_books_db
+SUMMARY_MAX_WORDS = 30
+
+# Words that don't tell what a sentence is about
+SUMMARY_STOP_WORDS = {
+    "a", "an", "the", "and", "or", "but", "of", "to", "in", "on", "at", "by", "for", "with", "from", "as",
+    "is", "are", "was", "were", "be", "been", "being", "it", "its", "this", "that", "these", "those",
+    "he", "she", "they", "his", "her", "their", "him", "them", "we", "you", "your", "i", "my", "who",
+    "which", "what", "when", "where", "how", "all", "more", "most", "has", "have", "had", "will", "can",
+    "not", "no", "into", "about", "than", "so", "if", "one", "new", "book", "author",
+}
+
+# The first sentence of a description usually introduces the book, so it gets a higher score
+FIRST_SENTENCE_BONUS = 1.5
+
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def truncate_words(text: str, max_words: int) -> str:
+    words = text.split()
+    if len(words) <= max_words:
+        return " ".join(words)
+    return " ".join(words[:max_words]) + "..."
+
+
+def summarize(description: str, max_words: int = SUMMARY_MAX_WORDS) -> str:
+    """
+    Extractive summary of a book description: the sentences whose content words are the most frequent
+    in the whole description, kept in their original order and cut to max_words words
+    """
+
+    sentences = [s for s in _SENTENCE_PATTERN.split(str(description).strip()) if s]
+    if len(sentences) <= 1:
+        return truncate_words(sentences[0] if sentences else "", max_words)
+
+    sentence_words = [
+        [w for w in _WORD_PATTERN.findall(s.lower()) if w not in SUMMARY_STOP_WORDS]
+        for s in sentences
+    ]
+    frequency = Counter(w for words in sentence_words for w in words)
+
+    scores = []
+    for i, words in enumerate(sentence_words):
+        score = sum(frequency[w] for w in words) / (len(words) + 1)
+        scores.append(score * FIRST_SENTENCE_BONUS if i == 0 else score)
+
+    chosen = []
+    n_words = 0
+    for i in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        chosen.append(i)
+        n_words += len(sentences[i].split())
+        if n_words >= max_words:
+            break
+
+    return truncate_words(" ".join(sentences[i] for i in sorted(chosen)), max_words)
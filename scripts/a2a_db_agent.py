@@ -4,17 +4,26 @@ from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 
 from db_agent.db_agent import get_db_agent, DBAgentPlugin
+from db_agent.facets import get_facet_index
+from db_agent.fast_path import get_books_vocabulary
+from db_agent.ranking import get_bm25_index
+from db_agent.session_store import create_shared_session_service
+from stand_in_llm.stand_in_llm import stand_in_model_from_env
 
 import warnings
 import os
+import asyncio
+import logging
+import sqlite3
 from dotenv import load_dotenv
 import sys
 
 # You should run it using uvicorn (see README for more details)
 
-# Check if Gemini API key is in .env
+# Check if Gemini API key is in .env (not needed with STAND_IN_MODEL=1)
 load_dotenv()
-if not os.getenv("GOOGLE_API_KEY"):
+model = stand_in_model_from_env()
+if model is None and not os.getenv("GOOGLE_API_KEY"):
     print(
         f"🔑 Authentication Error: Please make sure you have added 'GOOGLE_API_KEY' to .env file"
     )
@@ -23,14 +32,43 @@ if not os.getenv("GOOGLE_API_KEY"):
 warnings.filterwarnings("ignore")
 
 # Configure a2a connection
-db_agent = get_db_agent()
-session_service = InMemorySessionService()
+db_agent = get_db_agent(model=model)
+
+# Set DB_AGENT_SHARED_SESSIONS=1 when running several uvicorn workers (--workers N),
+# so that all of them read and write sessions in one SQLite database
+if os.getenv("DB_AGENT_SHARED_SESSIONS"):
+    session_service = create_shared_session_service()
+else:
+    session_service = InMemorySessionService()
+
+db_plugin = DBAgentPlugin(log_console=False)
 db_runner = Runner(
     agent=db_agent,
     app_name="agents",
     session_service=session_service,
     plugins=[
-        DBAgentPlugin(log_console=False)
+        db_plugin
     ]
 )
-a2a_app = to_a2a(db_agent, port=8001, runner=db_runner)
\ No newline at end of file
+a2a_app = to_a2a(db_agent, port=8001, runner=db_runner)
+
+
+async def warm_up():
+    # Load the catalog vocabulary and the BM25 and facet indexes before the first request reaches this worker.
+    # books.db and the index arrays are memory-mapped, so all workers share their pages in the OS page cache.
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, get_books_vocabulary)
+        await loop.run_in_executor(None, get_bm25_index)
+        await loop.run_in_executor(None, get_facet_index)
+    except sqlite3.Error as e:
+        logging.getLogger("db_agent_logger").warning(f"Catalog warm-up failed: {e}")
+
+
+async def shut_down():
+    # Called when uvicorn stops or replaces this worker (e.g. kill -HUP of the uvicorn parent process)
+    await db_plugin.close()
+
+
+a2a_app.add_event_handler("startup", warm_up)
+a2a_app.add_event_handler("shutdown", shut_down)
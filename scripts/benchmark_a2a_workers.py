@@ -0,0 +1,140 @@
+from google.adk.agents.remote_a2a_agent import AGENT_CARD_WELL_KNOWN_PATH
+
+from scripts.test_db_agent import TEST_PROMPTS
+
+import os
+import sys
+import time
+import uuid
+import signal
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+import numpy as np
+
+# Load generator for the db_agent A2A server: for 1..N uvicorn workers it starts the server with
+# the stand-in model and shared SQLite sessions, sends concurrent A2A requests and reports requests/s and latency.
+# Every simulated user sends several messages in one A2A context, so its session is read by different workers.
+
+PORT = 8011
+SERVER_START_TIMEOUT_SECONDS = 60
+
+
+def start_server(workers: int, port: int, latency_ms: float, shared_sessions: bool = True) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "STAND_IN_MODEL": "1",
+        "STAND_IN_LATENCY_MS": str(latency_ms),
+    }
+    if shared_sessions:
+        env["DB_AGENT_SHARED_SESSIONS"] = "1"
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "scripts.a2a_db_agent:a2a_app",
+            "--host", "localhost", "--port", str(port), "--workers", str(workers),
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_for_server(client: httpx.AsyncClient, url: str) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{url}{AGENT_CARD_WELL_KNOWN_PATH}")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"db_agent server at {url} didn't start in {SERVER_START_TIMEOUT_SECONDS} s")
+
+
+async def send_message(client: httpx.AsyncClient, url: str, context_id: str, text: str) -> bool:
+    payload = {
+        "jsonrpc": "2.0",
+        "id": str(uuid.uuid4()),
+        "method": "message/send",
+        "params": {
+            "message": {
+                "kind": "message",
+                "role": "user",
+                "messageId": str(uuid.uuid4()),
+                "contextId": context_id,
+                "parts": [{"kind": "text", "text": text}],
+            }
+        },
+    }
+    response = await client.post(url, json=payload)
+    body = response.json()
+    if response.status_code != 200 or "error" in body:
+        return False
+    return body["result"].get("status", {}).get("state") != "failed"
+
+
+async def run_load(url: str, users: int, turns: int, concurrency: int) -> tuple[list[float], int, float]:
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await wait_for_server(client, url)
+
+        async def user(i: int) -> None:
+            nonlocal failures
+            context_id = str(uuid.uuid4())
+            async with semaphore:
+                for turn in range(turns):
+                    start = time.perf_counter()
+                    ok = await send_message(client, url, context_id, TEST_PROMPTS[(i + turn) % len(TEST_PROMPTS)])
+                    latencies.append(time.perf_counter() - start)
+                    failures += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(users)))
+        elapsed = time.perf_counter() - start
+
+    return latencies, failures, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure db_agent A2A server throughput for 1..N uvicorn workers")
+    parser.add_argument("--max-workers", type=int, default=min(os.cpu_count() or 1, 4))
+    parser.add_argument("--users", type=int, default=100, help="simulated users, each with its own A2A context")
+    parser.add_argument("--turns", type=int, default=3, help="messages sent by every user")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="simulated latency of every model call")
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    url = f"http://localhost:{args.port}"
+    print(
+        f"{args.users} users x {args.turns} messages, concurrency {args.concurrency}, "
+        f"stand-in model latency {args.latency_ms:.0f} ms\n"
+    )
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+
+    for workers in range(1, args.max_workers + 1):
+        server = start_server(workers, args.port, args.latency_ms)
+        try:
+            latencies, failures, elapsed = await run_load(url, args.users, args.turns, args.concurrency)
+        finally:
+            # SIGINT lets uvicorn finish in-flight requests and run shutdown handlers of every worker
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+        print(
+            f"{workers:>7} {len(latencies) / elapsed:>8.1f} "
+            f"{np.percentile(latencies, 50) * 1000:>8.1f} "
+            f"{np.percentile(latencies, 95) * 1000:>8.1f} "
+            f"{np.percentile(latencies, 99) * 1000:>8.1f} "
+            f"{failures:>7}"
+        )
+
+
+if __name__=="__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+import os
+import time
+import sqlite3
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from db_agent.books_db import fetch_books, normalize_filters
+from db_agent.ranking import build_bm25_index, load_bm25_index, search_ranked_page
+from scripts.benchmark_query_books_db import SYNTHETIC_BOOKS_DIR
+from scripts.synthetic_books import get_synthetic_books
+
+# Ranked keyword searches of db_agent (rank_by_relevance) on synthetic catalogs: the first page of
+# search_ranked_page and the books it returns, as query_books_db runs them
+CATALOG_SIZES = [100_000, 1_000_000]
+REPEATS = 20
+PAGE_SIZE = 10
+
+QUERIES = [
+    {"included_keywords": ["history"]},
+    {"included_keywords": ["murder", "detective"]},
+    {"included_keywords": ["company"], "excluded_authors": ["Kubick"]},
+    {"included_keywords": ["cooking", "recipes"], "excluded_categories": ["fiction"], "excluded_keywords": ["politics"]},
+    {"included_keywords": ["revolution", "army"], "included_categories": ["history"], "max_price": 15.0},
+]
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def run(db_path, index_dir, repeats):
+    conn = sqlite3.connect(db_path)
+
+    start = time.perf_counter()
+    build_bm25_index(conn, index_dir)
+    print(f"BM25 index built in {time.perf_counter() - start:.1f} s")
+    print(f"Index size on disk (memory-mapped): {directory_size(index_dir) / 2**20:.1f} MiB")
+
+    tracemalloc.start()
+    index = load_bm25_index(index_dir)
+    loaded, _ = tracemalloc.get_traced_memory()
+    print(f"Heap memory after loading (vocabulary): {loaded / 2**20:.1f} MiB")
+
+    for query in QUERIES:
+        filters = normalize_filters(**query)
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            rowids, _ = search_ranked_page(conn, index, filters, 0, PAGE_SIZE)
+            books = fetch_books(conn, rowids)
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(
+            f"{query}: p50 {np.percentile(latencies, 50):.1f} ms, "
+            f"p95 {np.percentile(latencies, 95):.1f} ms ({len(books)} books)"
+        )
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Peak heap memory while querying: {peak / 2**20:.1f} MiB\n")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 ranked search of db_agent on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=CATALOG_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--work-dir", default=SYNTHETIC_BOOKS_DIR, help="where synthetic catalogs are kept between runs")
+    args = parser.parse_args()
+
+    for n_rows in args.sizes:
+        db_path = get_synthetic_books(args.work_dir, n_rows, args.seed)
+        print(f"Catalog with {n_rows} books")
+        with tempfile.TemporaryDirectory() as index_dir:
+            run(db_path, index_dir, args.repeats)
+
+
+if __name__=="__main__":
+    main()
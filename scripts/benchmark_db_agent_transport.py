@@ -0,0 +1,114 @@
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+
+from booskshop_agent.a2a_client import A2AHttpClient, get_a2a_http_client
+from booskshop_agent.bookshop_agent import DB_AGENT_URL, DB_AGENT_TRANSPORTS, get_bookshop_agent, BookshopAgentPlugin
+from db_agent.db_agent import DBAgentPlugin
+from stand_in_llm.stand_in_llm import StandInLlm
+from scripts.benchmark_a2a_workers import start_server, wait_for_server
+from scripts.benchmark_pipeline import run_load, run_request
+from scripts.test_db_agent import TEST_PROMPTS
+
+import os
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import warnings
+from urllib.parse import urlparse
+
+import httpx
+import numpy as np
+
+# Latency of the whole bookshop system with the db_agent reached over A2A (remote) and run in-process.
+# Both use the stand-in model with the same simulated latency, so the difference is the cost of the A2A hop.
+# The remote mode starts its own db_agent server (one worker, in-memory sessions) on the DB_AGENT_URL port.
+# "remote, new client" gives every session its own HTTP client, which connects and fetches the agent card again,
+# "remote" shares the pooled keep-alive client and the cached agent card.
+
+
+async def run_transport(transport: str, model: StandInLlm, requests: int, concurrency: int) -> tuple[list[float], int, float]:
+    db_plugin = DBAgentPlugin(log_console=False, data_db_path=os.path.join(tempfile.mkdtemp(), "db_agent_data.db"))
+    plugins = [BookshopAgentPlugin(log_console=False)]
+    if transport == "in_process":
+        plugins.append(db_plugin)
+
+    session_service = InMemorySessionService()
+    runner = Runner(
+        agent=get_bookshop_agent(model=model, db_agent_transport=transport),
+        app_name="agents",
+        session_service=session_service,
+        plugins=plugins,
+    )
+
+    # The first request resolves the agent card and loads the catalog vocabulary, so it isn't measured
+    await run_load(runner, session_service, 1, 1)
+    start = time.perf_counter()
+    latencies, failures = await run_load(runner, session_service, requests, concurrency)
+    elapsed = time.perf_counter() - start
+    await db_plugin.close()
+    return latencies, failures, elapsed
+
+
+async def run_unpooled(model: StandInLlm, requests: int, concurrency: int) -> tuple[list[float], int, float]:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def session(i: int) -> None:
+        async with semaphore:
+            http_client = A2AHttpClient()
+            session_service = InMemorySessionService()
+            runner = Runner(
+                agent=get_bookshop_agent(model=model, a2a_http_client=http_client),
+                app_name="agents",
+                session_service=session_service,
+                plugins=[BookshopAgentPlugin(log_console=False)],
+            )
+            # The agent card is fetched inside the measured request, like in a new conversation
+            latencies.append(await run_request(runner, session_service, f"user-{i}", TEST_PROMPTS[i % len(TEST_PROMPTS)]))
+            await http_client.aclose()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(requests)))
+    return latencies, 0, time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare remote (A2A) and in-process db_agent transports")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency of every model call")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    port = urlparse(DB_AGENT_URL).port
+    server = start_server(1, port, args.latency_ms, shared_sessions=False)
+    try:
+        async with httpx.AsyncClient() as client:
+            await wait_for_server(client, DB_AGENT_URL)
+
+        print(f"{args.requests} bookshop requests, stand-in model latency {args.latency_ms:.0f} ms\n")
+        print(f"{'transport':>18} {'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+        for concurrency in args.concurrency:
+            for transport in ("remote, new client",) + DB_AGENT_TRANSPORTS:
+                model = StandInLlm(latency_seconds=args.latency_ms / 1000, seed=0)
+                if transport == "remote, new client":
+                    latencies, failures, elapsed = await run_unpooled(model, args.requests, concurrency)
+                else:
+                    latencies, failures, elapsed = await run_transport(transport, model, args.requests, concurrency)
+                print(
+                    f"{transport:>18} {concurrency:>11} {len(latencies) / elapsed:>8.1f} "
+                    f"{np.percentile(latencies, 50) * 1000:>8.1f} "
+                    f"{np.percentile(latencies, 95) * 1000:>8.1f} "
+                    f"{np.percentile(latencies, 99) * 1000:>8.1f} "
+                    f"{failures:>7}"
+                )
+        print(f"\nShared A2A client: {get_a2a_http_client().stats()}")
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+
+
+if __name__=="__main__":
+    asyncio.run(main())
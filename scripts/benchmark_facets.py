@@ -0,0 +1,98 @@
+import time
+import sqlite3
+import argparse
+import tempfile
+
+import numpy as np
+
+from db_agent.books_db import BooksConnectionPool, BooksResultCache, build_filter, normalize_filters, should_use_fts
+from db_agent.facets import FACET_COLUMNS, FACETS_TOP, PUBLISH_YEAR_BUCKET, build_facet_index, count_facets, load_facet_index
+from scripts.benchmark_query_books_db import SYNTHETIC_BOOKS_DIR, WORKLOAD
+from scripts.synthetic_books import get_synthetic_books
+
+# Faceted counts (total and top values of every facet) of db_agent filter shapes on synthetic catalogs:
+# count_facets over the precomputed facet index against GROUP BY queries over the matching rows.
+# The GROUP BY baseline counts AUTHORS strings as they are stored (it doesn't split several authors),
+# so it does a little less work than count_facets.
+CATALOG_SIZES = [100_000, 1_000_000]
+REPEATS = 20
+
+SHAPES = {"no_filter": {}, **WORKLOAD}
+
+# Expression grouped by for every facet in the GROUP BY baseline
+GROUP_BY = {
+    **FACET_COLUMNS,
+    "publish_years": f"PUBLISH_YEAR / {PUBLISH_YEAR_BUCKET}",
+}
+
+
+def group_by_facets(conn: sqlite3.Connection, filters: dict, top: int) -> dict:
+    filter_part, params = build_filter(
+        **filters, use_fts=should_use_fts(conn, filters.get("included_keywords"), filters.get("excluded_keywords"))
+    )
+    result = {"total": conn.execute(f"SELECT COUNT(*) FROM BOOKS {filter_part};", params).fetchone()[0]}
+    for facet, expression in GROUP_BY.items():
+        result[facet] = conn.execute(
+            f"SELECT {expression}, COUNT(*) AS N FROM BOOKS {filter_part} "
+            f"GROUP BY {expression} ORDER BY N DESC LIMIT ?;",
+            params + [top]
+        ).fetchall()
+    return result
+
+
+def median_ms(run, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def benchmark_catalog(db_path: str, index_dir: str, repeats: int) -> None:
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    start = time.perf_counter()
+    build_facet_index(conn, index_dir)
+    print(f"Facet index built in {time.perf_counter() - start:.1f} s")
+    conn.close()
+
+    pool = BooksConnectionPool(db_path=db_path)
+    cache = BooksResultCache(db_path=db_path)
+    with pool.connection() as conn:
+        start = time.perf_counter()
+        index = load_facet_index(index_dir)
+        print(f"Facet index loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        print(f"{'shape':<36} {'matches':>8} {'GROUP BY ms':>12} {'facets ms':>10} {'cached facets ms':>17}")
+        for name, shape in SHAPES.items():
+            filters = normalize_filters(**shape)
+
+            def uncached():
+                cache.clear()
+                return count_facets(conn, index, filters, cache)
+
+            total = uncached()["total"]
+            group_by_ms = median_ms(lambda: group_by_facets(conn, shape, FACETS_TOP), repeats)
+            facets_ms = median_ms(uncached, repeats)
+            cached_ms = median_ms(lambda: count_facets(conn, index, filters, cache), repeats)
+            print(f"{name:<36} {total:>8} {group_by_ms:>12.2f} {facets_ms:>10.2f} {cached_ms:>17.2f}")
+    pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark faceted counts of db_agent filters on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=CATALOG_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--work-dir", default=SYNTHETIC_BOOKS_DIR, help="where synthetic catalogs are kept between runs")
+    args = parser.parse_args()
+
+    for n_rows in args.sizes:
+        db_path = get_synthetic_books(args.work_dir, n_rows, args.seed)
+        print(f"\nCatalog with {n_rows} books")
+        with tempfile.TemporaryDirectory() as index_dir:
+            benchmark_catalog(db_path, index_dir, args.repeats)
+
+
+if __name__=="__main__":
+    main()
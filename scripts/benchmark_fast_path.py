@@ -0,0 +1,99 @@
+import time
+
+from db_agent.books_db import get_books_pool, get_books_cache, search_books
+from db_agent.fast_path import extract_query_arguments, get_books_vocabulary
+from scripts.test_db_agent import TEST_PROMPTS
+
+# Arguments expected for every prompt of scripts/test_db_agent (None = the prompt should go to the LLM)
+EXPECTED_ARGUMENTS = {
+    "I want biographies written by Stanley": {
+        "included_categories": ["biography"],
+        "included_authors": ["Stanley"],
+    },
+    "I hate fiction. Do you have anything to recommend? Please no books by Kubick": {
+        "excluded_categories": ["fiction"],
+        "excluded_authors": ["Kubick"],
+    },
+    "I'm searching for a biography about a man that runs a company. Can you find anything for me?": None,
+    "I'm searching for a history book but please nothing about politics.": {
+        "included_categories": ["history"],
+        "excluded_keywords": ["politics"],
+    },
+    "I'm searching for books written by Marinkiewicz": {
+        "included_authors": ["Marinkiewicz"],
+    },
+    "I'm searching for biographies written by Marinkiewicz not related to politics": {
+        "included_categories": ["biography"],
+        "included_authors": ["Marinkiewicz"],
+        "excluded_keywords": ["politics"],
+    },
+}
+
+# Prompts the fast path used to answer with confidently wrong arguments (None = the prompt should go to the LLM)
+EXTRACTION_CASES = [
+    # An author's first and last name are one author, not any Mary or any Smith
+    ("books by Mary Smith", {"included_authors": ["Mary Smith"]}),
+    ("history books by John Stanley", {"included_categories": ["history"], "included_authors": ["John Stanley"]}),
+    # Words of one category name would be searched as separate categories
+    ("science fiction books", None),
+    ("I want political science books", None),
+    # A negation covers the word it governs, not the rest of the clause
+    ("I don't mind fiction", None),
+    ("I hate fiction and I love history", {"excluded_categories": ["fiction"], "included_categories": ["history"]}),
+    ("no fiction or history", {"excluded_categories": ["fiction", "history"]}),
+    ("biographies not by Kubick", {"included_categories": ["biography"], "excluded_authors": ["Kubick"]}),
+]
+
+REPEATS = 1000
+
+
+def main():
+    start = time.perf_counter()
+    vocabulary = get_books_vocabulary()
+    print(f"Vocabulary built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(
+        f"{len(vocabulary.categories)} category words, "
+        f"{len(vocabulary.author_last_names)} author last names, "
+        f"{len(vocabulary.stop_words)} stop words\n"
+    )
+
+    correct = 0
+    answered = 0
+    for prompt in TEST_PROMPTS:
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            arguments = extract_query_arguments(prompt, vocabulary)
+        extract_us = (time.perf_counter() - start) / REPEATS * 1e6
+
+        expected = EXPECTED_ARGUMENTS[prompt]
+        correct += arguments == expected
+
+        print(prompt)
+        print(f"Extracted: {arguments}")
+        print(f"Expected:  {expected}")
+        print(f"Extraction: {extract_us:.1f} us", end="")
+
+        if arguments is not None:
+            answered += 1
+            get_books_cache().clear()
+            start = time.perf_counter()
+            with get_books_pool().connection() as conn:
+                books = search_books(conn, cache=get_books_cache(), **arguments)
+            print(f", query_books_db: {(time.perf_counter() - start) * 1000:.1f} ms ({len(books)} books)")
+        else:
+            print(", passed to the LLM")
+        print()
+
+    print(f"Accuracy: {correct}/{len(TEST_PROMPTS)}")
+    print(f"Answered without LLM: {answered}/{len(TEST_PROMPTS)}\n")
+
+    failed = 0
+    for prompt, expected in EXTRACTION_CASES:
+        arguments = extract_query_arguments(prompt, vocabulary)
+        failed += arguments != expected
+        print(f"{prompt:<40} {arguments} " + ("OK" if arguments == expected else f"FAILED: expected {expected}"))
+    print(f"Extraction checks passed: {len(EXTRACTION_CASES) - failed}/{len(EXTRACTION_CASES)}")
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,59 @@
+import sqlite3
+import time
+import random
+
+from db_agent.books_db import BOOKS_DB_PATH, STATEMENT_CACHE_SIZE, build_filter, filter_template
+
+# Values are different on every call, but the filter shape (number of values per argument) repeats
+AUTHORS = ["Stanley", "Smith", "Kubick", "Stepanek", "Aksyonov", "O'Brien"]
+CATEGORIES = ["biography", "fiction", "history", "politics", "science", "business"]
+KEYWORDS = ["company", "nation", "war", "love", "river", "empire"]
+
+REPEATS = 2000
+
+
+def random_filters(rng):
+    return {
+        "included_authors": rng.sample(AUTHORS, 2),
+        "excluded_categories": rng.sample(CATEGORIES, 1),
+        "included_categories": rng.sample(CATEGORIES, 2),
+        "excluded_keywords": rng.sample(KEYWORDS, 2),
+    }
+
+
+def inline_filter(filter_part, params):
+    # The previous approach: values pasted into the SQL, so every call produces a new statement
+    for param in params:
+        filter_part = filter_part.replace("?", "'" + str(param).replace("'", "''") + "'", 1)
+    return filter_part
+
+
+def run(conn, bind_params):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        filter_part, params = build_filter(**random_filters(rng))
+        if bind_params:
+            conn.execute(f"SELECT rowid FROM BOOKS {filter_part} LIMIT 0;", params).fetchall()
+        else:
+            conn.execute(f"SELECT rowid FROM BOOKS {inline_filter(filter_part, params)} LIMIT 0;").fetchall()
+    return (time.perf_counter() - start) / REPEATS * 1e6
+
+
+def main():
+    conn = sqlite3.connect(f"file:{BOOKS_DB_PATH}?mode=ro", uri=True, cached_statements=STATEMENT_CACHE_SIZE)
+
+    print(f"Prepare + execute time of {REPEATS} queries with the same filter shape")
+    print("LIMIT 0 is used so that the time is spent on statement overhead and not on scanning\n")
+    inline_us = run(conn, bind_params=False)
+    bound_us = run(conn, bind_params=True)
+    print(f"Values inlined in SQL:  {inline_us:8.1f} us per query")
+    print(f"Bound parameters:       {bound_us:8.1f} us per query")
+    print(f"Speedup: {inline_us / bound_us:.1f}x\n")
+    print(f"Filter templates: {filter_template.cache_info()}")
+
+    conn.close()
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,52 @@
+import sqlite3
+import time
+
+from db_agent.books_db import BOOKS_DB_PATH, build_filter, has_fts_index
+
+# Keyword filters similar to the ones db_agent sends
+KEYWORD_QUERIES = [
+    {"included_keywords": ["company"]},
+    {"included_keywords": ["company", "nation"]},
+    {"included_keywords": ["war"], "excluded_keywords": ["politics"]},
+    {"excluded_keywords": ["politics"]},
+    {"included_categories": ["history"], "excluded_keywords": ["politics", "election"]},
+]
+
+REPEATS = 20
+
+
+def count_matches(conn, use_fts, filters):
+    filter_part, params = build_filter(use_fts=use_fts, **filters)
+    return conn.execute(f"SELECT COUNT(*) FROM BOOKS {filter_part};", params).fetchone()[0]
+
+
+def time_query(conn, use_fts, filters):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        count_matches(conn, use_fts, filters)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+    conn = sqlite3.connect(BOOKS_DB_PATH)
+    if not has_fts_index(conn):
+        print("Full-text index not found. Run scripts.create_books_db first")
+        return
+
+    print(f"Comparing LIKE and FTS5 keyword search (average of {REPEATS} runs)\n")
+    for filters in KEYWORD_QUERIES:
+        like_count = count_matches(conn, False, filters)
+        fts_count = count_matches(conn, True, filters)
+        like_ms = time_query(conn, False, filters)
+        fts_ms = time_query(conn, True, filters)
+
+        print(filters)
+        print(f"LIKE: {like_ms:8.2f} ms ({like_count} matches)")
+        print(f"FTS5: {fts_ms:8.2f} ms ({fts_count} matches)")
+        print(f"Speedup: {like_ms / fts_ms:.1f}x\n")
+
+    conn.close()
+
+
+if __name__=="__main__":
+    main()
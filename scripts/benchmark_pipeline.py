@@ -0,0 +1,111 @@
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types, errors
+
+from db_agent.db_agent import get_db_agent, DBAgentPlugin
+from booskshop_agent.bookshop_agent import DB_AGENT_TRANSPORTS, get_bookshop_agent, BookshopAgentPlugin
+from booskshop_agent.dislike_profile import DislikeProfilePlugin
+from stand_in_llm.stand_in_llm import StandInLlm
+from scripts.test_db_agent import TEST_PROMPTS
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import warnings
+
+import numpy as np
+
+# Offline load test of the agents with StandInLlm instead of Gemini.
+# "db_agent" runs the db_agent in-process, "bookshop" runs the whole system. With --db-agent-transport remote
+# (the default) it needs the db_agent A2A server started with STAND_IN_MODEL=1 (see README).
+
+
+async def run_request(runner: Runner, session_service: InMemorySessionService, user_id: str, prompt: str) -> float:
+    session = await session_service.create_session(app_name="agents", user_id=user_id)
+    query = types.Content(role="user", parts=[types.Part(text=prompt)])
+    start = time.perf_counter()
+    async for _ in runner.run_async(user_id=user_id, session_id=session.id, new_message=query):
+        pass
+    return time.perf_counter() - start
+
+
+async def run_load(runner: Runner, session_service: InMemorySessionService, requests: int, concurrency: int) -> tuple[list[float], int]:
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(i: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            try:
+                latencies.append(await run_request(runner, session_service, f"user-{i}", TEST_PROMPTS[i % len(TEST_PROMPTS)]))
+            except errors.APIError:
+                failures += 1
+
+    await asyncio.gather(*(worker(i) for i in range(requests)))
+    return latencies, failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent orchestration with a local stand-in model")
+    parser.add_argument("--agent", choices=["db_agent", "bookshop"], default="db_agent")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency of every model call")
+    parser.add_argument("--latency-per-token-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of model calls failing with 429/503")
+    parser.add_argument("--fast-path", action="store_true", help="let the db_agent answer simple prompts without the model")
+    parser.add_argument("--db-agent-transport", choices=DB_AGENT_TRANSPORTS, default="remote", help="how the bookshop reaches the db_agent")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    model = StandInLlm(
+        latency_seconds=args.latency_ms / 1000,
+        latency_per_token_seconds=args.latency_per_token_ms / 1000,
+        error_rate=args.error_rate,
+        seed=0,
+    )
+
+    session_service = InMemorySessionService()
+    db_plugin = DBAgentPlugin(log_console=False, data_db_path=os.path.join(tempfile.mkdtemp(), "db_agent_data.db"))
+    if args.agent == "db_agent":
+        plugins = [db_plugin]
+        agent = get_db_agent(fast_path=args.fast_path, model=model)
+    else:
+        plugins = [DislikeProfilePlugin(), BookshopAgentPlugin(log_console=False)]
+        if args.db_agent_transport == "in_process":
+            plugins.append(db_plugin)
+        agent = get_bookshop_agent(model=model, db_agent_transport=args.db_agent_transport)
+    runner = Runner(agent=agent, app_name="agents", session_service=session_service, plugins=plugins)
+
+    print(f"Running {args.requests} requests to {args.agent} with concurrency {args.concurrency}")
+    start = time.perf_counter()
+    latencies, failures = await run_load(runner, session_service, args.requests, args.concurrency)
+    elapsed = time.perf_counter() - start
+    await db_plugin.close()
+
+    stats = model.stats()
+    completed = len(latencies)
+    print(f"Completed: {completed}, failed with model errors: {failures}")
+    print(f"Throughput: {completed / elapsed:.1f} requests/s")
+    if completed:
+        print(
+            f"Latency: p50 {np.percentile(latencies, 50) * 1000:.1f} ms, "
+            f"p95 {np.percentile(latencies, 95) * 1000:.1f} ms, "
+            f"p99 {np.percentile(latencies, 99) * 1000:.1f} ms"
+        )
+    print(
+        f"Model: {stats['calls']} calls, {stats['errors']} injected errors, "
+        f"{stats['input_tokens']} input tokens, {stats['output_tokens']} output tokens"
+    )
+
+    # Everything that isn't simulated model time is spent by the agents framework, plugins, tools and sessions
+    if completed:
+        model_ms = stats["simulated_seconds"] / (completed + failures) * 1000
+        overhead_ms = np.mean(latencies) * 1000 - model_ms
+        print(f"Model time per request: {model_ms:.1f} ms, orchestration overhead per request: {overhead_ms:.1f} ms")
+
+if __name__=="__main__":
+    asyncio.run(main())
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import sqlite3
+import platform
+import argparse
+import resource
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+from db_agent.books_db import (
+    BooksConnectionPool,
+    BooksResultCache,
+    build_filter,
+    fetch_books,
+    match_rowids,
+    normalize_filters,
+    search_books_page,
+    should_use_fts,
+)
+from db_agent.db_agent import QUERY_BOOKS_DB_FIELDS, QUERY_BOOKS_DB_LIMIT
+from scripts.synthetic_books import get_synthetic_books
+
+# Catalog sizes benchmarked by default (up to 10M rows can be given with --sizes)
+CATALOG_SIZES = [10_000, 100_000, 1_000_000]
+SYNTHETIC_BOOKS_DIR = "db/synthetic"
+RESULTS_DIR = "benchmark_results"
+REPEATS = 50
+
+# Filter shapes the db_agent sends (see scripts/test_db_agent), with values that exist in the synthetic catalogs
+WORKLOAD = {
+    "category+author": {"included_categories": ["biography"], "included_authors": ["Stanley"]},
+    "excluded_category+excluded_author": {"excluded_categories": ["fiction"], "excluded_authors": ["Kubick"]},
+    "category+excluded_keyword": {"included_categories": ["history"], "excluded_keywords": ["politics"]},
+    "author": {"included_authors": ["Marinkiewicz"]},
+    "category+author+excluded_keyword": {
+        "included_categories": ["biography"],
+        "included_authors": ["Marinkiewicz"],
+        "excluded_keywords": ["politics"],
+    },
+    "keyword": {"included_keywords": ["company"]},
+    "keywords+excluded_category": {"included_keywords": ["election", "president"], "excluded_categories": ["fiction"]},
+    "broad_category": {"included_categories": ["fiction"]},
+    "no_match": {"included_keywords": ["nonexistentword"], "included_authors": ["Nobody"]},
+}
+
+# Modes of running every shape
+# "query" - the first page of a new search the way query_books_db makes it (search_books_page and fetch_books),
+#           with an empty result cache every time, so all matching rowids are read from SQLite
+# "cached" - the same with a warm result cache (repeated prompts and "more" pages)
+MODES = ("query", "cached")
+
+
+def percentile(values: list[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 3)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def query_plan(conn: sqlite3.Connection, filters: dict) -> list[str]:
+    """
+    EXPLAIN QUERY PLAN of the statement that finds matching rows for filters
+    """
+
+    filter_part, params = build_filter(
+        **filters, use_fts=should_use_fts(conn, filters.get("included_keywords"), filters.get("excluded_keywords"))
+    )
+    return [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN SELECT rowid FROM BOOKS {filter_part};", params)]
+
+
+def vm_steps(conn: sqlite3.Connection, run) -> int:
+    """
+    Number of SQLite virtual machine instructions executed by run().
+    The sqlite3 module doesn't expose per-statement scan counters, so this is the measure of rows scanned.
+    """
+
+    steps = 0
+
+    def count():
+        nonlocal steps
+        steps += 100
+
+    conn.set_progress_handler(count, 100)
+    try:
+        run()
+    finally:
+        conn.set_progress_handler(None, 0)
+    return steps
+
+
+def benchmark_shape(conn: sqlite3.Connection, cache: BooksResultCache, filters: dict, mode: str, repeats: int) -> dict:
+    normalized = normalize_filters(**filters)
+    rng = np.random.default_rng(0)
+
+    def run():
+        if mode == "query":
+            cache.clear()
+        rowids, _ = search_books_page(conn, normalized, cache, int(rng.integers(2**32)), 0, QUERY_BOOKS_DB_LIMIT)
+        return fetch_books(conn, rowids, QUERY_BOOKS_DB_FIELDS)
+
+    run()  # Warm up (and fill the cache in "cached" mode)
+
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        books = run()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "books": len(books),
+        "vm_steps": vm_steps(conn, run),
+        "peak_heap_kib": round(peak / 1024, 1),
+    }
+
+
+def benchmark_catalog(db_path: str, n_rows: int, repeats: int) -> dict:
+    pool = BooksConnectionPool(db_path=db_path)
+    cache = BooksResultCache(db_path=db_path)
+    shapes = {}
+
+    with pool.connection() as conn:
+        for name, filters in WORKLOAD.items():
+            matches = len(match_rowids(conn, **filters))
+            shapes[name] = {
+                "filters": filters,
+                "matching_rows": matches,
+                "plan": query_plan(conn, filters),
+                **{mode: benchmark_shape(conn, cache, filters, mode, repeats) for mode in MODES},
+            }
+            print(
+                f"{name:36} {matches:>8} matches | "
+                + " | ".join(
+                    f"{mode}: p50 {shapes[name][mode]['p50_ms']:7.2f} ms, p99 {shapes[name][mode]['p99_ms']:7.2f} ms"
+                    for mode in MODES
+                )
+            )
+    pool.close()
+
+    return {
+        "rows": n_rows,
+        "db_size_mib": round(os.path.getsize(db_path) / 2**20, 1),
+        "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "shapes": shapes,
+    }
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    """
+    Print p50 latency changes against the results of an earlier run
+    """
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nChange of p50 latency against {baseline_path} (commit {baseline['commit']})")
+
+    for size, catalog in results["catalogs"].items():
+        old_catalog = baseline["catalogs"].get(size)
+        if old_catalog is None:
+            continue
+        for name, shape in catalog["shapes"].items():
+            old_shape = old_catalog["shapes"].get(name)
+            if old_shape is None:
+                continue
+            changes = ", ".join(
+                f"{mode} {shape[mode]['p50_ms'] / max(old_shape[mode]['p50_ms'], 1e-6):.2f}x"
+                for mode in MODES if mode in old_shape
+            )
+            print(f"{size:>9} rows {name:36} {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query_books_db searches on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=CATALOG_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--work-dir", default=SYNTHETIC_BOOKS_DIR, help="where synthetic catalogs are kept between runs")
+    parser.add_argument("--output", help="JSON results file (default: benchmark_results/query_books_db_<commit>.json)")
+    parser.add_argument("--compare", help="JSON results file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "seed": args.seed,
+        "repeats": args.repeats,
+        "catalogs": {},
+    }
+
+    for n_rows in args.sizes:
+        db_path = get_synthetic_books(args.work_dir, n_rows, args.seed)
+        print(f"\nCatalog with {n_rows} books")
+        results["catalogs"][str(n_rows)] = benchmark_catalog(db_path, n_rows, args.repeats)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"query_books_db_{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+
+import numpy as np
+
+from db_agent.books_db import BOOKS_RANGE_INDEXES, RANGE_ARGUMENTS, create_range_indexes, match_rowids
+from db_agent.db_agent import count_books_facets, query_books_db
+from scripts.benchmark_query_books_db import SYNTHETIC_BOOKS_DIR, query_plan
+from scripts.synthetic_books import get_synthetic_books
+
+# Price and publication year filters of db_agent requests (e.g. "cheap history books after 2010") on a copy
+# of a synthetic catalog, with the range indexes dropped and after create_range_indexes. Prints the EXPLAIN QUERY PLAN
+# of every shape and fails if a shape with a range still scans the whole BOOKS table, or if its plan didn't change
+# when the indexes were created. A range is answered with one of BOOKS_RANGE_INDEXES,
+# unless the FTS index finds fewer candidate rows (keywords).
+CATALOG_SIZES = [100_000]
+REPEATS = 10
+
+RANGE_WORKLOAD = {
+    "max_price": {"max_price": 10.0},
+    "min_year": {"min_publish_year": 2011},
+    "price_range+year_range": {"min_price": 5.0, "max_price": 15.0, "min_publish_year": 1990, "max_publish_year": 1999},
+    "category+max_price+min_year": {"included_categories": ["history"], "max_price": 10.0, "min_publish_year": 2011},
+    "category+year_range": {"included_categories": ["biography"], "min_publish_year": 1990, "max_publish_year": 1999},
+    "excluded_category+price_range": {"excluded_categories": ["fiction"], "min_price": 5.0, "max_price": 15.0},
+    "author+min_year": {"included_authors": ["Stanley"], "min_publish_year": 2000},
+    "keyword+max_price": {"included_keywords": ["company"], "max_price": 20.0},
+    # Without a range the indexes are only used if they are cheaper to scan than the table
+    "category": {"included_categories": ["history"]},
+}
+
+# Bounds the LLM may send instead of numbers. The tools must answer them with an error result, not raise
+INVALID_RANGES = [
+    {"max_price": "$10"},
+    {"min_price": "cheap"},
+    {"min_publish_year": "2010s"},
+    {"max_publish_year": 2020.5, "max_price": [10]},
+]
+
+
+def median_ms(conn: sqlite3.Connection, filters: dict, repeats: int) -> tuple[float, int]:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rowids = match_rowids(conn, **filters)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000, len(rowids)
+
+
+def benchmark_catalog(db_path: str, repeats: int) -> int:
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    # Synthetic catalogs are built with create_books_indexes, which already creates the range indexes
+    for name in BOOKS_RANGE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name};")
+    before = {name: median_ms(conn, filters, repeats) for name, filters in RANGE_WORKLOAD.items()}
+    plans_before = {name: query_plan(conn, filters) for name, filters in RANGE_WORKLOAD.items()}
+
+    start = time.perf_counter()
+    create_range_indexes(conn)
+    print(f"Range indexes created in {time.perf_counter() - start:.1f} s")
+
+    failed = 0
+    print(f"{'shape':<32} {'matches':>8} {'no index ms':>12} {'index ms':>9}  plan")
+    for name, filters in RANGE_WORKLOAD.items():
+        after_ms, matches = median_ms(conn, filters, repeats)
+        plan = query_plan(conn, filters)
+        scans_table = any(step.startswith("SCAN BOOKS") and "INDEX" not in step for step in plan)
+        uses_index = any(index in step for step in plan for index in BOOKS_RANGE_INDEXES)
+        if any(argument in filters for argument in RANGE_ARGUMENTS):
+            if scans_table:
+                failed += 1
+                plan.append("FAILED: full table scan")
+            elif uses_index and plan == plans_before[name]:
+                failed += 1
+                plan.append("FAILED: same plan without the range indexes")
+        print(f"{name:<32} {matches:>8} {before[name][0]:>12.2f} {after_ms:>9.2f}  {' | '.join(plan)}")
+    conn.close()
+    return failed
+
+
+def check_invalid_ranges() -> int:
+    failed = 0
+    for bounds in INVALID_RANGES:
+        for tool in (query_books_db, count_books_facets):
+            try:
+                result = tool(**bounds)
+            except Exception as e:
+                result = {"status": f"raised {type(e).__name__}: {e}"}
+            ok = result["status"] == "error"
+            failed += not ok
+            print(f"{tool.__name__}({bounds}): {result.get('error_message', result['status'])} " + ("OK" if ok else "FAILED"))
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that range filters use indexes and time them")
+    parser.add_argument("--sizes", type=int, nargs="+", default=CATALOG_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--work-dir", default=SYNTHETIC_BOOKS_DIR, help="where synthetic catalogs are kept between runs")
+    args = parser.parse_args()
+
+    print("Invalid range bounds")
+    failed = check_invalid_ranges()
+    for n_rows in args.sizes:
+        # The range indexes are dropped and created again on a copy, the kept catalog isn't changed
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "books.db")
+            shutil.copyfile(get_synthetic_books(args.work_dir, n_rows, args.seed), db_path)
+            print(f"\nCatalog with {n_rows} books")
+            failed += benchmark_catalog(db_path, args.repeats)
+
+    print(f"\n{'No range shape scans the BOOKS table' if not failed else f'{failed} range checks failed'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,89 @@
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from db_agent.db_agent import get_db_agent, query_books_db
+from stand_in_llm.stand_in_llm import StandInLlm
+from scripts.test_db_agent import TEST_PROMPTS
+
+import time
+import asyncio
+import argparse
+import warnings
+
+import numpy as np
+
+# LLM calls and query_books_db calls db_agent (without the fast path, stand-in model) makes per request
+# now that query_books_db relaxes searches itself. Before, a search that found nothing was retried
+# by the LLM with relaxed arguments up to 3 times, i.e. 3 tool calls and 4 LLM calls.
+# The second table times the tool alone: the exact search and the relaxation ladder on one connection.
+PROMPTS = TEST_PROMPTS + [
+    # Misspelled author (Aksyonov)
+    "Books written by Aksionov",
+]
+
+# Arguments an LLM could pass that find nothing without relaxation
+RELAXED_ARGUMENTS = {
+    "keyword not in the catalog": {"included_categories": ["biography"], "included_keywords": ["zeppelinography"]},
+    "category not in the catalog": {"included_categories": ["political memoirs"]},
+    "misspelled author": {"included_authors": ["Aksionov"]},
+    "unknown author": {"included_authors": ["Marinkiewicz"], "excluded_keywords": ["politics"]},
+}
+
+
+async def run_prompt(runner: Runner, session_service: InMemorySessionService, model: StandInLlm, prompt: str) -> tuple:
+    session = await session_service.create_session(app_name="agents", user_id="default")
+    calls_before = model.stats()["calls"]
+    tool_calls = 0
+    relaxations = None
+    found = False
+
+    start = time.perf_counter()
+    query = types.Content(role="user", parts=[types.Part(text=prompt)])
+    async for event in runner.run_async(user_id="default", session_id=session.id, new_message=query):
+        tool_calls += sum(call.name == "query_books_db" for call in event.get_function_calls())
+        for response in event.get_function_responses():
+            result = response.response or {}
+            found = result.get("status") == "success"
+            relaxations = result.get("relaxations")
+    elapsed = time.perf_counter() - start
+
+    return model.stats()["calls"] - calls_before, tool_calls, found, relaxations, elapsed
+
+
+def time_tool(arguments: dict, relax: bool, repeats: int) -> tuple[float, dict]:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = query_books_db(**arguments, relax=relax)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure the LLM and tool calls of failing searches with server-side relaxation")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    model = StandInLlm(seed=0)
+    session_service = InMemorySessionService()
+    runner = Runner(agent=get_db_agent(fast_path=False, model=model), app_name="agents", session_service=session_service)
+
+    print(f"{'prompt':<80} {'LLM calls':>9} {'tool calls':>10} {'found':>6} {'ms':>8}  relaxations")
+    for prompt in PROMPTS:
+        llm_calls, tool_calls, found, relaxations, elapsed = await run_prompt(runner, session_service, model, prompt)
+        print(f"{prompt[:80]:<80} {llm_calls:>9} {tool_calls:>10} {str(found):>6} {elapsed * 1000:>8.1f}  {relaxations or '-'}")
+
+    print(f"\n{'arguments':<28} {'exact ms':>9} {'exact books':>12} {'relaxed ms':>11} {'relaxed books':>14}  relaxations")
+    for name, arguments in RELAXED_ARGUMENTS.items():
+        exact_ms, exact = time_tool(arguments, False, args.repeats)
+        relaxed_ms, relaxed = time_tool(arguments, True, args.repeats)
+        print(
+            f"{name:<28} {exact_ms * 1000:>9.1f} {len(exact.get('books', [])):>12} "
+            f"{relaxed_ms * 1000:>11.1f} {len(relaxed.get('books', [])):>14}  {relaxed.get('relaxations', '-')}"
+        )
+
+
+if __name__=="__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+from google.adk.events import Event
+from google.adk.sessions.database_session_service import DatabaseSessionService
+from google.genai import types
+
+from booskshop_agent.response_cache import EARLIER_DISLIKES_STATE_KEY
+from booskshop_agent.session_compaction import SessionCompactor, COMPACTED_TURNS_STATE_KEY
+from stand_in_llm.stand_in_llm import count_tokens
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import warnings
+
+# Cost of a long-lived bookshop session stored with DatabaseSessionService (like in run_bookshop_agent),
+# with and without SessionCompactor. Turns are appended directly (a user message, search_agent's books search
+# and recommend_agent's answer), so only the session storage is measured, not the agents.
+# At every checkpoint the session is read like Runner does at the start of a turn, and the read time
+# and the history the agents would get are reported.
+
+PROMPTS = [
+    "Find me some fantasy books about dragons",
+    "Something by Agatha Christie please",
+    "Show me more books like the previous ones",
+    "Books about cooking for beginners",
+    "Any good history books about Rome?",
+]
+# Every DISLIKE_EVERY-th turn the user says what they dislike
+DISLIKE_PROMPTS = [
+    "I don't like romance novels",
+    "No books about politics please",
+    "I hate horror",
+]
+DISLIKE_EVERY = 50
+
+BOOKS_SEARCH = "Books search: " + " ".join(
+    f"Title: Book {i} Authors: Some Author Category: Fiction Summary: A short summary of the book." for i in range(10)
+)
+RECOMMENDATION = "I recommend Book 1 and Book 3, they match what you are looking for. " * 3
+
+
+def turn_events(turn: int) -> list[Event]:
+    if turn % DISLIKE_EVERY == DISLIKE_EVERY - 1:
+        prompt = DISLIKE_PROMPTS[turn // DISLIKE_EVERY % len(DISLIKE_PROMPTS)]
+    else:
+        prompt = PROMPTS[turn % len(PROMPTS)]
+    invocation_id = f"turn-{turn}"
+    return [
+        Event(invocation_id=invocation_id, author="user", content=types.Content(role="user", parts=[types.Part(text=prompt)])),
+        Event(invocation_id=invocation_id, author="search_agent", content=types.Content(role="model", parts=[types.Part(text=BOOKS_SEARCH)])),
+        Event(invocation_id=invocation_id, author="recommend_agent", content=types.Content(role="model", parts=[types.Part(text=RECOMMENDATION)])),
+    ]
+
+
+def history_tokens(session) -> int:
+    return sum(
+        count_tokens(part.text)
+        for event in session.events if event.content
+        for part in event.content.parts or [] if part.text
+    )
+
+
+async def run_session(turns: int, checkpoints: list[int], compact: bool, repeats: int) -> list[tuple]:
+    db_path = os.path.join(tempfile.mkdtemp(), "bookshop_session.db")
+    session_service = DatabaseSessionService(db_url=f"sqlite:///{db_path}")
+    compactor = SessionCompactor(session_service) if compact else None
+    session = await session_service.create_session(app_name="agents", user_id="default", session_id="default")
+
+    rows = []
+    for turn in range(1, turns + 1):
+        for event in turn_events(turn - 1):
+            await session_service.append_event(session, event)
+        if compactor is not None and await compactor.maybe_compact("agents", "default", "default"):
+            # The compaction event updated the stored session
+            session = await session_service.get_session(app_name="agents", user_id="default", session_id="default")
+
+        if turn in checkpoints:
+            start = time.perf_counter()
+            for _ in range(repeats):
+                fetched = await session_service.get_session(app_name="agents", user_id="default", session_id="default")
+            fetch_ms = (time.perf_counter() - start) / repeats * 1000
+            rows.append((
+                turn, len(fetched.events), fetch_ms, history_tokens(fetched),
+                len(fetched.state.get(EARLIER_DISLIKES_STATE_KEY, [])), fetched.state.get(COMPACTED_TURNS_STATE_KEY, 0),
+            ))
+
+    session_service.db_engine.dispose()
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure session fetch time and history size with and without session compaction")
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument("--checkpoints", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=5, help="session fetches timed at every checkpoint")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    print(f"{'compaction':>10} {'turns':>7} {'events':>7} {'get_session ms':>15} {'history tokens':>15} {'earlier dislikes':>17} {'compacted':>10}")
+    for compact in (False, True):
+        start = time.perf_counter()
+        rows = await run_session(args.turns, [c for c in args.checkpoints if c <= args.turns], compact, args.repeats)
+        for turn, events, fetch_ms, tokens, dislikes, compacted in rows:
+            print(f"{'on' if compact else 'off':>10} {turn:>7} {events:>7} {fetch_ms:>15.1f} {tokens:>15} {dislikes:>17} {compacted:>10}")
+        print(f"{'':>10} {args.turns} turns stored in {time.perf_counter() - start:.1f} s\n")
+
+
+if __name__=="__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+import json
+import random
+
+from db_agent.books_db import BOOK_FIELDS
+from db_agent.db_agent import QUERY_BOOKS_DB_FIELDS, query_books_db
+from scripts.benchmark_fast_path import EXPECTED_ARGUMENTS
+from stand_in_llm.stand_in_llm import count_tokens
+
+# Tokens of the query_books_db result the db_agent model reads for the test_db_agent prompts:
+# full books as returned before (with whole descriptions) compared with the default projection and shorter summaries.
+# The same books are sampled for every projection, so only the fields differ.
+
+PROJECTIONS = {
+    "previous (full books)": {"fields": [f for f in BOOK_FIELDS if f != "SUMMARY"]},
+    "default": {},
+    "default, 15-word summary": {"summary_words": 15},
+    "titles and authors": {"fields": ["TITLE", "AUTHORS"]},
+}
+
+
+def result_tokens(arguments: dict, seed: int) -> int:
+    random.seed(seed)
+    return count_tokens(json.dumps(query_books_db(**arguments)))
+
+
+def main():
+    prompts = [(prompt, arguments) for prompt, arguments in EXPECTED_ARGUMENTS.items() if arguments is not None]
+    print(f"Default fields: {QUERY_BOOKS_DB_FIELDS}\n")
+    print(f"{'projection':<26}" + "".join(f"{'prompt ' + str(i):>10}" for i in range(1, len(prompts) + 1)) + f"{'total':>10}")
+
+    baseline = None
+    for name, projection in PROJECTIONS.items():
+        tokens = [result_tokens({**arguments, **projection}, seed) for seed, (_, arguments) in enumerate(prompts)]
+        baseline = baseline or sum(tokens)
+        print(
+            f"{name:<26}" + "".join(f"{t:>10}" for t in tokens)
+            + f"{sum(tokens):>10} ({sum(tokens) / baseline:.0%})"
+        )
+
+    print()
+    for i, (prompt, _) in enumerate(prompts, 1):
+        print(f"prompt {i}: {prompt}")
+
+
+if __name__=="__main__":
+    main()
@@ -1,39 +1,315 @@
 import sqlite3
 import os
+import sys
+import time
+import shutil
+import resource
+import numpy as np
 import pandas as pd
 
+from db_agent.books_db import BOOKS_DB_PATH, BOOKS_FTS_TABLE, create_fts_index, create_range_indexes, has_fts_index, has_summary_column
+from db_agent.summaries import summarize
+from db_agent.ranking import BOOKS_BM25_DIR, build_bm25_index
+from db_agent.facets import BOOKS_FACETS_DIR, build_facet_index
+from db_agent.fast_path import BOOKS_VOCABULARY_PATH, build_vocabulary, save_vocabulary
+
+BOOKS_CSV_PATH = "dataset/BooksDatasetClean.csv"
+BOOKS_COLUMNS = ["TITLE", "AUTHORS", "DESCRIPTION", "CATEGORY", "PUBLISHER", "PRICE", "PUBLISH_YEAR"]
+TEXT_COLUMNS = ["TITLE", "AUTHORS", "DESCRIPTION", "CATEGORY", "PUBLISHER"]
+
+# Content hash of every book, used by incremental rebuilds to find changed rows
+BOOKS_HASH_TABLE = "BOOKS_HASHES"
+
+# The new database, indexes and vocabulary are built next to the live ones and renamed into place when complete
+BOOKS_DB_TMP_PATH = BOOKS_DB_PATH + ".tmp"
+BOOKS_INDEX_DIRS = [BOOKS_BM25_DIR, BOOKS_FACETS_DIR]
+BOOKS_VOCABULARY_TMP_PATH = BOOKS_VOCABULARY_PATH + ".tmp"
+
+# CSV rows read, cleaned and inserted at once, and rows inserted per transaction
+CSV_CHUNK_SIZE = 50000
+INSERT_TRANSACTION_ROWS = 500000
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def create_books_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+            CREATE TABLE BOOKS (
+                "index" INTEGER,
+                TITLE TEXT,
+                AUTHORS TEXT,
+                DESCRIPTION TEXT,
+                CATEGORY TEXT,
+                PUBLISHER TEXT,
+                PRICE REAL,
+                PUBLISH_YEAR INTEGER,
+                SUMMARY TEXT
+            );
+        """
+    )
+    conn.execute(
+        f"""
+            CREATE TABLE {BOOKS_HASH_TABLE} (
+                BOOK_ROWID INTEGER PRIMARY KEY,
+                HASH INTEGER NOT NULL
+            );
+        """
+    )
+
+
+def create_books_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute('CREATE INDEX ix_BOOKS_index ON BOOKS ("index");')
+    conn.execute(f"CREATE INDEX IX_{BOOKS_HASH_TABLE}_HASH ON {BOOKS_HASH_TABLE} (HASH);")
+    conn.commit()
+    create_range_indexes(conn)
+
+
+def has_hash_table(conn: sqlite3.Connection) -> bool:
+    cursor = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;",
+        (BOOKS_HASH_TABLE,)
+    )
+    return cursor.fetchone() is not None
+
+
+def content_hashes(books: pd.DataFrame) -> np.ndarray:
+    # 64-bit hash of all the BOOKS columns of every row, stored as a signed SQLite INTEGER
+    return pd.util.hash_pandas_object(books[BOOKS_COLUMNS], index=False).to_numpy().view(np.int64)
+
+
+def read_books_chunks(csv_path: str = BOOKS_CSV_PATH, chunk_size: int = CSV_CHUNK_SIZE):
+    """
+    Yield cleaned chunks of the books CSV file with the BOOKS column names
+    and a HASH column with the content hash of every book
+    """
+
+    reader = pd.read_csv(csv_path, chunksize=chunk_size)
+    for chunk in reader:
+        chunk = chunk.drop("Publish Date (Month)", axis=1)
+        chunk = chunk.dropna()
+        chunk.columns = BOOKS_COLUMNS
+        # Column types inferred by pandas may differ between chunks, which would change the hashes
+        chunk = chunk.astype({**{c: str for c in TEXT_COLUMNS}, "PRICE": float, "PUBLISH_YEAR": int})
+        chunk["AUTHORS"] = chunk["AUTHORS"].str.replace("By ", "", regex=False)
+        chunk["HASH"] = content_hashes(chunk)
+        yield chunk
+
+
+def insert_books(conn: sqlite3.Connection, chunk: pd.DataFrame, first_rowid: int, first_index: int) -> None:
+    """
+    Insert a cleaned chunk into BOOKS (and its hashes into BOOKS_HASH_TABLE) with consecutive rowids.
+    A short extractive summary of DESCRIPTION is stored with every book.
+    """
+
+    rowids = range(first_rowid, first_rowid + len(chunk))
+    books = chunk[BOOKS_COLUMNS].copy()
+    books["SUMMARY"] = books["DESCRIPTION"].map(summarize)
+    books.insert(0, "index", range(first_index, first_index + len(chunk)))
+    books.insert(0, "rowid", rowids)
+
+    placeholders = ", ".join("?" * len(books.columns))
+    conn.executemany(
+        f'INSERT INTO BOOKS (rowid, "index", {", ".join(BOOKS_COLUMNS)}, SUMMARY) VALUES ({placeholders});',
+        books.itertuples(index=False, name=None)
+    )
+    conn.executemany(
+        f"INSERT INTO {BOOKS_HASH_TABLE} (BOOK_ROWID, HASH) VALUES (?, ?);",
+        zip(rowids, chunk["HASH"].tolist())
+    )
+
+
+def load_books(conn: sqlite3.Connection, csv_path: str = BOOKS_CSV_PATH) -> int:
+    """
+    Stream the CSV file into an empty BOOKS table. Returns the number of inserted rows.
+    """
+
+    n_rows = 0
+    rows_in_transaction = 0
+    conn.execute("BEGIN;")
+    for chunk in read_books_chunks(csv_path):
+        # Continuous "index" values over all the chunks, like reset_index on the whole dataset
+        insert_books(conn, chunk, first_rowid=n_rows + 1, first_index=n_rows)
+        n_rows += len(chunk)
+        rows_in_transaction += len(chunk)
+
+        if rows_in_transaction >= INSERT_TRANSACTION_ROWS:
+            conn.commit()
+            conn.execute("BEGIN;")
+            rows_in_transaction = 0
+    conn.commit()
+    return n_rows
+
+
+def update_books(conn: sqlite3.Connection, csv_path: str = BOOKS_CSV_PATH) -> tuple[int, int, int]:
+    """
+    Apply the CSV file to an existing BOOKS table: insert books whose content hash is new
+    and delete books whose hash is no longer in the file. The FTS index is updated for the changed rows only.
+    Returns the number of (unchanged, inserted, deleted) rows.
+    """
+
+    known = np.fromiter((r[0] for r in conn.execute(f"SELECT HASH FROM {BOOKS_HASH_TABLE};")), dtype=np.int64)
+    known.sort()
+    max_rowid, max_index = conn.execute('SELECT COALESCE(MAX(rowid), 0), COALESCE(MAX("index"), -1) FROM BOOKS;').fetchone()
+
+    seen = []
+    n_unchanged = 0
+    n_inserted = 0
+    conn.execute("BEGIN;")
+    for chunk in read_books_chunks(csv_path):
+        hashes = chunk["HASH"].to_numpy()
+        seen.append(hashes)
+        positions = np.searchsorted(known, hashes).clip(max=max(len(known) - 1, 0))
+        is_new = known[positions] != hashes if len(known) else np.ones(len(hashes), dtype=bool)
+        new_books = chunk[is_new]
+
+        insert_books(
+            conn,
+            new_books,
+            first_rowid=max_rowid + n_inserted + 1,
+            first_index=max_index + n_inserted + 1,
+        )
+        n_inserted += len(new_books)
+        n_unchanged += len(chunk) - len(new_books)
+
+    # Changed books were inserted with their new content above, the old versions are removed here
+    removed = np.setdiff1d(known, np.concatenate(seen) if seen else known[:0])
+    conn.execute("CREATE TEMP TABLE REMOVED_HASHES (HASH INTEGER PRIMARY KEY);")
+    conn.executemany("INSERT INTO REMOVED_HASHES (HASH) VALUES (?);", ((int(h),) for h in removed))
+    removed_rowids = f"SELECT BOOK_ROWID FROM {BOOKS_HASH_TABLE} WHERE HASH IN (SELECT HASH FROM REMOVED_HASHES)"
+    n_deleted = conn.execute(f"SELECT COUNT(*) FROM ({removed_rowids});").fetchone()[0]
+
+    if has_fts_index(conn):
+        # External-content FTS5 rows must be deleted with the values they were indexed with
+        conn.execute(
+            f"""
+                INSERT INTO {BOOKS_FTS_TABLE}({BOOKS_FTS_TABLE}, rowid, TITLE, DESCRIPTION)
+                SELECT 'delete', rowid, TITLE, DESCRIPTION FROM BOOKS WHERE rowid IN ({removed_rowids});
+            """
+        )
+        conn.execute(
+            f"""
+                INSERT INTO {BOOKS_FTS_TABLE}(rowid, TITLE, DESCRIPTION)
+                SELECT rowid, TITLE, DESCRIPTION FROM BOOKS WHERE rowid > ?;
+            """,
+            (max_rowid,)
+        )
+    conn.execute(f"DELETE FROM BOOKS WHERE rowid IN ({removed_rowids});")
+    conn.execute(f"DELETE FROM {BOOKS_HASH_TABLE} WHERE HASH IN (SELECT HASH FROM REMOVED_HASHES);")
+    conn.execute("DROP TABLE REMOVED_HASHES;")
+    conn.commit()
+    return n_unchanged, n_inserted, n_deleted
+
+
+def replace_live_files() -> None:
+    """
+    Move the new BM25 and facet indexes, vocabulary and database into place.
+    Running servers keep using the old files until they see the new books.db generation, so books.db goes last.
+    """
+
+    for index_dir in BOOKS_INDEX_DIRS:
+        shutil.rmtree(index_dir + ".old", ignore_errors=True)
+        if os.path.exists(index_dir):
+            os.rename(index_dir, index_dir + ".old")
+        os.rename(index_dir + ".tmp", index_dir)
+    os.replace(BOOKS_VOCABULARY_TMP_PATH, BOOKS_VOCABULARY_PATH)
+    os.replace(BOOKS_DB_TMP_PATH, BOOKS_DB_PATH)
+    for index_dir in BOOKS_INDEX_DIRS:
+        shutil.rmtree(index_dir + ".old", ignore_errors=True)
+
+
 def main():
+    incremental = "--incremental" in sys.argv[1:]
+
     os.makedirs("db", exist_ok=True)
-    if os.path.exists('db/books.db'):
-        print("Removing old database")
-        os.remove("db/books.db")
-
-    print("Reading csv file")
-    df = pd.read_csv("dataset/BooksDatasetClean.csv")
-    df = df.drop("Publish Date (Month)", axis=1)
-    df = df.dropna()
-    df = df.reset_index(drop=True)
-    df['Authors'] = df['Authors'].apply(lambda x: x.replace("By ", ""))
-    df.columns = ["TITLE", "AUTHORS", "DESCRIPTION", "CATEGORY", "PUBLISHER", "PRICE", "PUBLISH_YEAR"]
-
-    print("Creating BOOKS database")
-    conn = sqlite3.connect('db/books.db')
-    df.to_sql("BOOKS", conn, index=True)
-    print("Database created\n")
+    if os.path.exists(BOOKS_DB_TMP_PATH):
+        print("Removing unfinished database from a previous run")
+        os.remove(BOOKS_DB_TMP_PATH)
+    for index_dir in BOOKS_INDEX_DIRS:
+        shutil.rmtree(index_dir + ".tmp", ignore_errors=True)
+    if os.path.exists(BOOKS_VOCABULARY_TMP_PATH):
+        os.remove(BOOKS_VOCABULARY_TMP_PATH)
+
+    if incremental and os.path.exists(BOOKS_DB_PATH):
+        conn = sqlite3.connect(f"file:{BOOKS_DB_PATH}?mode=ro", uri=True)
+        incremental = has_hash_table(conn) and has_summary_column(conn)
+        conn.close()
+        if not incremental:
+            print("Existing database has no content hashes or summaries, rebuilding it from scratch")
+    elif incremental:
+        print("No existing database, building it from scratch")
+        incremental = False
+
+    start = time.perf_counter()
+    if incremental:
+        print("Updating a copy of BOOKS database from csv file")
+        shutil.copyfile(BOOKS_DB_PATH, BOOKS_DB_TMP_PATH)
+        conn = sqlite3.connect(BOOKS_DB_TMP_PATH, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=OFF;")
+        conn.execute("PRAGMA synchronous=OFF;")
+        n_unchanged, n_inserted, n_deleted = update_books(conn)
+        n_rows = n_unchanged + n_inserted
+        print(f"Unchanged rows: {n_unchanged}, inserted: {n_inserted}, deleted: {n_deleted}")
+        if not has_fts_index(conn):
+            print("Creating full-text index for keyword search")
+            create_fts_index(conn)
+        # Databases built before range filters have no range indexes, and the planner statistics must be refreshed
+        create_range_indexes(conn)
+        # Facet counts of older databases were kept in tables, they are now saved in BOOKS_FACETS_DIR
+        conn.execute("DROP TABLE IF EXISTS FACET_VALUES;")
+        conn.execute("DROP TABLE IF EXISTS BOOK_FACETS;")
+    else:
+        print("Creating BOOKS database from csv file")
+        conn = sqlite3.connect(BOOKS_DB_TMP_PATH, isolation_level=None)
+        # The file is rebuilt from scratch if anything fails, so no journal or fsync is needed while loading
+        conn.execute("PRAGMA journal_mode=OFF;")
+        conn.execute("PRAGMA synchronous=OFF;")
+        create_books_table(conn)
+        n_rows = load_books(conn)
+        create_books_indexes(conn)
+    elapsed = time.perf_counter() - start
+    print(f"Database ready: {n_rows} rows in {elapsed:.1f} s ({n_rows / elapsed:.0f} rows/s)")
+    print(f"Peak RSS: {peak_rss_mib():.1f} MiB\n")
+
+    if not incremental:
+        print("Creating full-text index for keyword search")
+        create_fts_index(conn)
+        print("Full-text index created\n")
+
+    # BM25 weights depend on statistics of the whole catalog, so the index is always rebuilt
+    print("Creating BM25 index for ranked search")
+    build_bm25_index(conn, BOOKS_BM25_DIR + ".tmp")
+    print("BM25 index created\n")
+
+    # Facet counts are aggregates of the whole catalog, so they are always rebuilt too
+    print("Creating facet index for book counts")
+    build_facet_index(conn, BOOKS_FACETS_DIR + ".tmp")
+    print("Facet index created\n")
+
+    # Every db_agent worker loads this vocabulary instead of mining the catalog on its own
+    print("Saving catalog vocabulary for the fast path")
+    save_vocabulary(build_vocabulary(conn), BOOKS_VOCABULARY_TMP_PATH)
+    print("Vocabulary saved\n")
+    print(f"Peak RSS: {peak_rss_mib():.1f} MiB\n")
 
     print("Database columns")
     cursor = conn.execute("PRAGMA table_info(BOOKS);")
     for row in cursor:
         print(row)
-    
+
     print("\nDatabase sample row")
     cursor = conn.execute("SELECT * FROM BOOKS LIMIT 1;")
     for row in cursor:
         print(row)
 
     conn.close()
+    replace_live_files()
+    print(f"\n{BOOKS_DB_PATH} replaced, running servers switch to it on their next query")
     print("\nWhole process completed successfully")
-    
+
 
 if __name__=="__main__":
     main()
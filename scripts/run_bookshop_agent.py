@@ -1,16 +1,20 @@
 from google.adk.runners import Runner
 from google.adk.sessions.database_session_service import DatabaseSessionService
-from google.adk.agents.remote_a2a_agent import AGENT_CARD_WELL_KNOWN_PATH
 from google.genai import types
 
-from booskshop_agent.bookshop_agent import get_bookshop_agent, BookshopAgentPlugin
+from booskshop_agent.a2a_client import get_a2a_http_client
+from booskshop_agent.bookshop_agent import DB_AGENT_CARD_URL, get_bookshop_agent, db_agent_transport_from_env, BookshopAgentPlugin
+from db_agent.db_agent import DBAgentPlugin
+from booskshop_agent.dislike_profile import DislikeProfilePlugin
+from booskshop_agent.response_cache import ResponseCache, ResponseCachePlugin
+from booskshop_agent.session_compaction import SessionCompactor, SessionCompactionPlugin
+from stand_in_llm.stand_in_llm import stand_in_model_from_env
 
 import os
 import sys
 import asyncio
 import warnings
 from dotenv import load_dotenv
-import requests
 from colorama import init, Fore
 
 
@@ -18,42 +22,47 @@ async def main():
     # Init colorama
     init(autoreset=True)
 
-    # Check if Gemini API key is in .env
+    # Check if Gemini API key is in .env (not needed with STAND_IN_MODEL=1)
     load_dotenv()
-    if not os.getenv("GOOGLE_API_KEY"):
+    model = stand_in_model_from_env()
+    if model is None and not os.getenv("GOOGLE_API_KEY"):
         print(
             Fore.RED + f"🔑 Authentication Error: Please make sure you have added 'GOOGLE_API_KEY' to .env file"
         )
         sys.exit()
 
-    # Test if the Remote DB Agent server is running before doing any operations
-    try:
-        response = requests.get(
-            f"http://localhost:8001{AGENT_CARD_WELL_KNOWN_PATH}", 
-            timeout=5
-        )
+    # The in-process db_agent doesn't need the server
+    db_agent_transport = db_agent_transport_from_env()
 
-        if response.status_code != 200:
-            print(Fore.RED + f"❌ Failed to fetch agent card: {response.status_code}")
+    # Test if the Remote DB Agent server is running before doing any operations
+    if db_agent_transport == "remote":
+        error = await get_a2a_http_client().check_agent(DB_AGENT_CARD_URL)
+        if error is not None:
+            print(Fore.RED + f"❌ Error fetching agent card: {error}")
             print(Fore.YELLOW + "Make sure the Remote DB Agent server is running (see README for more info)")
             sys.exit()
 
-    except requests.exceptions.RequestException as e:
-        print(Fore.RED + f"❌ Error fetching agent card: {e}")
-        print(Fore.YELLOW + "Make sure the Remote DB Agent server is running (see README for more info)")
-        sys.exit()
-
     warnings.filterwarnings("ignore")    
 
-    bookshop_agent = get_bookshop_agent()
+    bookshop_agent = get_bookshop_agent(model=model, db_agent_transport=db_agent_transport)
     session_service = DatabaseSessionService(db_url="sqlite:///./db/bookshop_session.db")
+    response_cache = ResponseCache()
+    plugins = [
+        # Updates the dislike profile before the response cache looks up the prompt with it
+        DislikeProfilePlugin(),
+        ResponseCachePlugin(response_cache),
+        BookshopAgentPlugin(log_console=False, response_cache=response_cache),
+        # Keeps the long-lived "default" session short, older turns are moved to an archive table
+        SessionCompactionPlugin(SessionCompactor(session_service))
+    ]
+    if db_agent_transport == "in_process":
+        # Logs queries of the in-process db_agent like the A2A server does
+        plugins.append(DBAgentPlugin(log_console=False))
     booskshop_runner = Runner(
         agent=bookshop_agent,
         app_name="agents",
         session_service=session_service,
-        plugins=[
-            BookshopAgentPlugin(log_console=False)
-        ]
+        plugins=plugins
     )
 
     try:
@@ -82,9 +91,10 @@ async def main():
             session_id=session.id, 
             new_message=query
         ):
+            # Cached responses are returned by book_search_agent_system itself
             if (event.is_final_response() 
                 and event.content 
-                and event.author == "recommend_agent"
+                and event.author in ("recommend_agent", "book_search_agent_system")
             ):
                 for part in event.content.parts:
                     if hasattr(part, "text"):
@@ -0,0 +1,162 @@
+import os
+import time
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from db_agent.books_db import create_fts_index
+from scripts.create_books_db import BOOKS_COLUMNS, content_hashes, create_books_table, create_books_indexes, insert_books
+
+# Seeded generator of BOOKS catalogs that look like the Kaggle dataset:
+# a few very popular authors, categories and publishers followed by a long tail,
+# and descriptions made of frequent English words mixed with topic words and rare words.
+
+FIRST_NAMES = [
+    "John", "Mary", "James", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Peter", "Anna", "Paul", "Nancy", "Mark", "Lisa", "George", "Margaret", "Steven", "Sandra",
+    "Edward", "Ashley", "Brian", "Dorothy", "Ronald", "Kimberly", "Anthony", "Emily", "Kevin", "Donna",
+    "Vasily", "Olga", "Jan", "Ewa", "Pierre", "Marie", "Hans", "Ingrid", "Carlos", "Lucia",
+]
+
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Wilson", "Anderson", "Taylor", "Thomas", "Moore", "Jackson", "Martin", "Lee",
+    "Thompson", "White", "Harris", "Clark", "Lewis", "Robinson", "Walker", "Young", "Allen", "King",
+    "Wright", "Scott", "Green", "Baker", "Adams", "Nelson", "Hill", "Campbell", "Mitchell", "Roberts",
+    "Stanley", "Kubick", "Marinkiewicz", "Aksyonov", "Stepanek", "O'Brien", "Dubois", "Schmidt", "Rossi", "Novak",
+    "Carter", "Phillips", "Evans", "Turner", "Torres", "Parker", "Collins", "Edwards", "Stewart", "Morris",
+]
+
+CATEGORIES = [
+    "Fiction , General", "Biography & Autobiography , General", "History , General", "Religion , General",
+    "Juvenile Fiction , General", "Business & Economics , General", "Fiction , Mystery & Detective , General",
+    "Fiction , Romance , Contemporary", "Cooking , General", "Self-Help , General", "Political Science , General",
+    "History , Military , General", "Health & Fitness , General", "Science , General", "Fiction , Thrillers",
+    "Biography & Autobiography , Political", "Business & Economics , Management", "Travel , General",
+    "Poetry , General", "Art , General", "Music , General", "Philosophy , General", "Psychology , General",
+    "Sports & Recreation , General", "Fiction , Science Fiction , General", "Fiction , Fantasy , General",
+    "History , Europe , General", "History , United States , General", "Social Science , General",
+    "Family & Relationships , General", "Body, Mind & Spirit , General", "Computers , General",
+    "Education , General", "Nature , General", "Humor , General", "Drama , General", "Law , General",
+    "Medical , General", "Gardening , General", "Crafts & Hobbies , General",
+]
+
+PUBLISHERS = [f"{LAST_NAMES[i % len(LAST_NAMES)]} {kind}" for i, kind in enumerate(
+    ["Press", "Books", "Publishing", "House", "& Sons", "Media", "Editions", "University Press"] * 60
+)]
+
+
+# Words every description is mostly made of (the most frequent ones first)
+COMMON_WORDS = (
+    "the of and a to in is his her with that for as on by from an this who their life "
+    "new one world story book author first most years has be at it was when about into "
+    "through more after are all will what how them its but him she he they have best "
+    "time young family own great american two find people must work home war love history"
+).split()
+
+# Words the db_agent is asked about, spread over the catalog with a lower frequency
+TOPIC_WORDS = (
+    "company business politics political election government president nation empire king queen "
+    "science music art murder detective mystery romance science fiction fantasy children school "
+    "religion faith god church cooking recipes garden travel ocean river city village mountain "
+    "doctor health mind spirit leadership management economy market money revolution army soldier"
+).split()
+
+RARE_WORD_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qu", "xi"]
+RARE_WORDS = 20000
+
+CHUNK_SIZE = 50000
+
+
+def make_rare_words(rng: np.random.Generator, n: int) -> list[str]:
+    syllables = rng.integers(len(RARE_WORD_SYLLABLES), size=(n, 4))
+    lengths = rng.integers(2, 5, size=n)
+    return ["".join(RARE_WORD_SYLLABLES[s] for s in row[:length]) for row, length in zip(syllables, lengths)]
+
+
+def zipf_choice(rng: np.random.Generator, n_values: int, size, a: float = 1.3) -> np.ndarray:
+    """
+    Indexes in [0, n_values) with Zipf-like popularity (index 0 is the most popular)
+    """
+
+    return (rng.zipf(a, size=size) - 1) % n_values
+
+
+def generate_books_chunk(rng: np.random.Generator, n_rows: int, authors: list[str], vocabulary: np.ndarray) -> pd.DataFrame:
+    author_ids = zipf_choice(rng, len(authors), n_rows, a=1.2)
+    co_author_ids = zipf_choice(rng, len(authors), n_rows, a=1.2)
+    has_co_author = rng.random(n_rows) < 0.1
+    book_authors = [
+        f"{authors[a]}, {authors[c]}" if co else authors[a]
+        for a, c, co in zip(author_ids, co_author_ids, has_co_author)
+    ]
+
+    description_lengths = np.clip(rng.lognormal(4.0, 0.6, size=n_rows).astype(int), 5, 400)
+    words = vocabulary[zipf_choice(rng, len(vocabulary), description_lengths.sum(), a=1.15)]
+    ends = np.cumsum(description_lengths)
+    descriptions = [" ".join(words[end - length:end]) for end, length in zip(ends, description_lengths)]
+
+    title_lengths = rng.integers(1, 6, size=n_rows)
+    title_words = vocabulary[zipf_choice(rng, len(vocabulary), title_lengths.sum(), a=1.1)]
+    ends = np.cumsum(title_lengths)
+    titles = [" ".join(title_words[end - length:end]).title() for end, length in zip(ends, title_lengths)]
+
+    return pd.DataFrame({
+        "TITLE": titles,
+        "AUTHORS": book_authors,
+        "DESCRIPTION": descriptions,
+        "CATEGORY": np.array(CATEGORIES)[zipf_choice(rng, len(CATEGORIES), n_rows, a=1.4)],
+        "PUBLISHER": np.array(PUBLISHERS)[zipf_choice(rng, len(PUBLISHERS), n_rows, a=1.3)],
+        "PRICE": np.round(rng.lognormal(2.6, 0.5, size=n_rows), 2),
+        "PUBLISH_YEAR": 2023 - np.minimum(rng.exponential(15, size=n_rows).astype(int), 123),
+    }, columns=BOOKS_COLUMNS)
+
+
+def create_synthetic_books(db_path: str, n_rows: int, seed: int = 0) -> None:
+    """
+    Create a BOOKS database with n_rows synthetic books in db_path,
+    with the same tables and indexes as scripts/create_books_db builds
+    """
+
+    rng = np.random.default_rng(seed)
+    n_authors = max(100, n_rows // 20)
+    author_names = rng.integers([len(FIRST_NAMES), 26, len(LAST_NAMES)], size=(n_authors, 3))
+    authors = [f"{FIRST_NAMES[f]} {chr(ord('A') + m)}. {LAST_NAMES[l]}" for f, m, l in author_names]
+
+    # Topic words sit behind the common words in frequency, rare words form the long tail
+    vocabulary = np.array(COMMON_WORDS + TOPIC_WORDS + make_rare_words(rng, RARE_WORDS), dtype=object)
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=OFF;")
+    conn.execute("PRAGMA synchronous=OFF;")
+    create_books_table(conn)
+
+    conn.execute("BEGIN;")
+    for start in range(0, n_rows, CHUNK_SIZE):
+        chunk = generate_books_chunk(rng, min(CHUNK_SIZE, n_rows - start), authors, vocabulary)
+        chunk["HASH"] = content_hashes(chunk)
+        insert_books(conn, chunk, first_rowid=start + 1, first_index=start)
+    conn.commit()
+
+    create_books_indexes(conn)
+    create_fts_index(conn)
+    conn.close()
+
+
+def get_synthetic_books(work_dir: str, n_rows: int, seed: int = 0) -> str:
+    """
+    Return the path of a synthetic database with n_rows books, creating it only if it doesn't exist yet
+    """
+
+    db_path = os.path.join(work_dir, f"books_{n_rows}_{seed}.db")
+    if not os.path.exists(db_path):
+        print(f"Creating synthetic catalog with {n_rows} books")
+        start = time.perf_counter()
+        if os.path.exists(db_path + ".tmp"):
+            os.remove(db_path + ".tmp")
+        create_synthetic_books(db_path + ".tmp", n_rows, seed)
+        os.replace(db_path + ".tmp", db_path)
+        print(f"Synthetic catalog created in {time.perf_counter() - start:.1f} s")
+    return db_path
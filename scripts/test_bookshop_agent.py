@@ -1,53 +1,57 @@
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
-from google.adk.agents.remote_a2a_agent import AGENT_CARD_WELL_KNOWN_PATH
 
-from booskshop_agent.bookshop_agent import get_bookshop_agent, BookshopAgentPlugin
+from booskshop_agent.a2a_client import get_a2a_http_client, close_a2a_http_client
+from booskshop_agent.bookshop_agent import DB_AGENT_CARD_URL, get_bookshop_agent, db_agent_transport_from_env, BookshopAgentPlugin
+from booskshop_agent.dislike_profile import DislikeProfilePlugin
+from db_agent.db_agent import DBAgentPlugin
+from stand_in_llm.stand_in_llm import stand_in_model_from_env
 
 import os
 import sys
 import asyncio
 import warnings
 from dotenv import load_dotenv
-import requests
 
 async def main():
-    # Check if Gemini API key is in .env
+    # Check if Gemini API key is in .env (not needed with STAND_IN_MODEL=1)
     load_dotenv()
-    if not os.getenv("GOOGLE_API_KEY"):
+    model = stand_in_model_from_env()
+    if model is None and not os.getenv("GOOGLE_API_KEY"):
         print(
             f"🔑 Authentication Error: Please make sure you have added 'GOOGLE_API_KEY' to .env file"
         )
         sys.exit()
 
-    # Test if the Remote DB Agent server is running before doing any operations
-    try:
-        response = requests.get(
-            f"http://localhost:8001{AGENT_CARD_WELL_KNOWN_PATH}", timeout=5
-        )
+    # The in-process db_agent doesn't need the server
+    db_agent_transport = db_agent_transport_from_env()
 
-        if response.status_code != 200:
-            print(f"❌ Failed to fetch agent card: {response.status_code}")
+    # Test if the Remote DB Agent server is running before doing any operations
+    if db_agent_transport == "remote":
+        error = await get_a2a_http_client().check_agent(DB_AGENT_CARD_URL)
+        if error is not None:
+            print(f"❌ Error fetching agent card: {error}")
             print("Make sure the Remote DB Agent server is running (see README for more info)")
             sys.exit()
 
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error fetching agent card: {e}")
-        print("Make sure the Remote DB Agent server is running (see README for more info)")
-        sys.exit()
-
     warnings.filterwarnings("ignore")    
 
     # Test bookshop agent with some random queries
-    bookshop_agent = get_bookshop_agent()
+    bookshop_agent = get_bookshop_agent(model=model, db_agent_transport=db_agent_transport)
     session_service = InMemorySessionService()
+    plugins = [
+        DislikeProfilePlugin(),
+        BookshopAgentPlugin()
+    ]
+    if db_agent_transport == "in_process":
+        # Logs queries of the in-process db_agent like the A2A server does
+        db_plugin = DBAgentPlugin(log_console=False)
+        plugins.append(db_plugin)
     bookshop_runner = Runner(
         agent=bookshop_agent,
         app_name="agents",
         session_service=session_service,
-        plugins=[
-            BookshopAgentPlugin()
-        ]
+        plugins=plugins
     )
 
     await bookshop_runner.run_debug(
@@ -79,6 +83,10 @@ async def main():
     #    input("Write your own query! ")
     #)
 
+    if db_agent_transport == "in_process":
+        await db_plugin.close()
+    await close_a2a_http_client()
+
 
 if __name__=="__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -2,23 +2,36 @@ from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 
 from db_agent.db_agent import get_db_agent, DBAgentPlugin
+from stand_in_llm.stand_in_llm import stand_in_model_from_env
 
 import os
 import sys
 import asyncio
 from dotenv import load_dotenv
 
+TEST_PROMPTS = [
+    "I want biographies written by Stanley",
+    "I hate fiction. Do you have anything to recommend? Please no books by Kubick",
+    "I'm searching for a biography about a man that runs a company. Can you find anything for me?",
+    "I'm searching for a history book but please nothing about politics.",
+    # This query should produce nothing
+    "I'm searching for books written by Marinkiewicz",
+    # This query should produce nothing
+    "I'm searching for biographies written by Marinkiewicz not related to politics",
+]
+
 async def main():
-    # Check if Gemini API key is in .env
+    # Check if Gemini API key is in .env (not needed with STAND_IN_MODEL=1)
     load_dotenv()
-    if not os.getenv("GOOGLE_API_KEY"):
+    model = stand_in_model_from_env()
+    if model is None and not os.getenv("GOOGLE_API_KEY"):
         print(
             f"🔑 Authentication Error: Please make sure you have added 'GOOGLE_API_KEY' to .env file"
         )
         sys.exit()
 
     # Test bookshop agent with some random queries
-    db_agent = get_db_agent()
+    db_agent = get_db_agent(model=model)
     session_service = InMemorySessionService()
     db_runner = Runner(
         agent=db_agent,
@@ -29,30 +42,8 @@ async def main():
         ]
     )
 
-    await db_runner.run_debug(
-        "I want biographies written by Stanley"
-    )
-    
-    await db_runner.run_debug(
-        "I hate fiction. Do you have anything to recommend? Please no books by Kubick"
-    )
-    
-    await db_runner.run_debug(
-        "I'm searching for a biography about a man that runs a company. Can you find anything for me?"
-    )
-    await db_runner.run_debug(
-        "I'm searching for a history book but please nothing about politics."
-    )
-
-    # This query should produce nothing
-    await db_runner.run_debug(
-        "I'm searching for books written by Marinkiewicz"
-    )
-    
-    # This query should produce nothing
-    await db_runner.run_debug(
-        "I'm searching for biographies written by Marinkiewicz not related to politics"
-    )
+    for prompt in TEST_PROMPTS:
+        await db_runner.run_debug(prompt)
 
     #await db_runner.run_debug(
     #    input("Write your own query! ")
@@ -0,0 +1,121 @@
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from db_agent.db_agent import get_db_agent, DBAgentPlugin
+
+import os
+import re
+import json
+import random
+import sqlite3
+import asyncio
+import tempfile
+from typing import AsyncGenerator
+
+# Many parallel sessions go through one Runner (and so one DBAgentPlugin instance).
+# The LLM phase logs the failed queries of the model, the fast path phase the invalid cursors
+# FastPathDBAgent answers without the model, which must be logged the same way.
+# Every row must hold the prompt of its own request exactly as it was sent (apostrophes included).
+SESSIONS = 50
+PROMPTS = {
+    "llm": "Find books for request-{i}, I'm not picky",
+    "fast_path": "I'd like more books for results cursor request-{i}-invalid-cursor",
+}
+
+
+class ScriptedQueryLlm(BaseLlm):
+    """
+    Model that calls query_books_db with the request id found in the user message and then answers.
+    Random delays make the sessions interleave.
+    """
+
+    model: str = "scripted-query-llm"
+
+    async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False
+        ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(random.random() * 0.05)
+
+        last_parts = llm_request.contents[-1].parts or []
+        if any(part.function_response for part in last_parts):
+            yield LlmResponse(
+                content=types.Content(role="model", parts=[types.Part(text="The search returned no results")])
+            )
+            return
+
+        user_text = next(
+            part.text for content in llm_request.contents if content.role == "user"
+            for part in content.parts or [] if part.text
+        )
+        request_id = re.search(r"request-\d+", user_text).group(0)
+        yield LlmResponse(
+            content=types.Content(
+                role="model",
+                parts=[types.Part(function_call=types.FunctionCall(
+                    name="query_books_db",
+                    # The keyword never matches, so every call is saved as a failure
+                    args={"included_keywords": [f"{request_id}-missing-keyword"]},
+                ))]
+            )
+        )
+
+
+async def run_session(runner: Runner, session_service: InMemorySessionService, prompt: str, i: int) -> None:
+    session = await session_service.create_session(app_name="agents", user_id=f"user-{i}")
+    query = types.Content(role="user", parts=[types.Part(text=prompt.format(i=i))])
+    async for _ in runner.run_async(user_id=f"user-{i}", session_id=session.id, new_message=query):
+        pass
+
+
+async def run_phase(phase: str) -> None:
+    data_db_path = os.path.join(tempfile.mkdtemp(), "db_agent_data.db")
+
+    db_agent = get_db_agent(fast_path=phase == "fast_path", model=ScriptedQueryLlm())
+    plugin = DBAgentPlugin(log_console=False, data_db_path=data_db_path)
+    session_service = InMemorySessionService()
+    db_runner = Runner(
+        agent=db_agent,
+        app_name="agents",
+        session_service=session_service,
+        plugins=[plugin]
+    )
+
+    print(f"{phase}: running {SESSIONS} parallel sessions through one Runner")
+    await asyncio.gather(*(run_session(db_runner, session_service, PROMPTS[phase], i) for i in range(SESSIONS)))
+    await plugin.close()
+
+    conn = sqlite3.connect(data_db_path)
+    rows = conn.execute("SELECT USER_QUERY, FUNC_ARGUMENTS FROM FAILURES;").fetchall()
+    conn.close()
+
+    mismatched = 0
+    changed = 0
+    for user_query, func_arguments in rows:
+        request_id = re.search(r"request-(\d+)", user_query)
+        arguments = json.loads(func_arguments)
+        logged = arguments["cursor"] if "cursor" in arguments else arguments["included_keywords"][0]
+        if not logged.startswith(f"{request_id.group(0)}-"):
+            mismatched += 1
+        elif user_query != PROMPTS[phase].format(i=request_id.group(1)):
+            changed += 1
+
+    print(f"Logged rows: {len(rows)}, rows with another request's query: {mismatched}, changed queries: {changed}")
+    print(f"Per-invocation entries left in the plugin: {len(plugin.user_texts)}")
+    assert len(rows) == SESSIONS
+    assert mismatched == 0
+    assert changed == 0
+    assert not plugin.user_texts
+    print("Every logged row belongs to its own request\n")
+
+
+async def main():
+    for phase in PROMPTS:
+        await run_phase(phase)
+
+
+if __name__=="__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from booskshop_agent.bookshop_agent import DB_AGENT_URL, DB_AGENT_TRANSPORTS, get_bookshop_agent, BookshopAgentPlugin
+from booskshop_agent.dislike_profile import DislikeProfilePlugin, extract_dislikes, merge_dislikes
+from db_agent.db_agent import DISLIKES_STATE_KEY, DBAgentPlugin
+from db_agent.fast_path import get_books_vocabulary
+from stand_in_llm.stand_in_llm import StandInLlm
+from scripts.benchmark_a2a_workers import start_server, wait_for_server
+
+import os
+import re
+import signal
+import asyncio
+import tempfile
+import warnings
+from urllib.parse import urlparse
+
+import httpx
+
+# One bookshop conversation (stand-in model) with both db_agent transports: dislikes said in earlier turns
+# must be excluded from the books of later turns, while search_agent sends db_agent only the current prompt.
+# The remote transport starts its own db_agent server on the DB_AGENT_URL port.
+# Every turn: the user message, the categories and authors the search must not return (or must return)
+CONVERSATION = [
+    ("I hate fiction", {"category": "fiction"}),
+    ("Please no books by Aksyonov", {"category": "fiction", "author": "aksyonov"}),
+    ("Show me some biographies", {"category": "fiction", "author": "aksyonov"}),
+    ("Books about science", {"category": "fiction", "author": "aksyonov"}),
+    # An explicit request wins over the profile
+    ("Books by Aksyonov", {"category": "fiction", "required_author": "aksyonov"}),
+]
+
+# Common ways of saying a dislike and the profile extracted from them.
+# Only catalog categories and authors right after a dislike cue are kept, they are excluded for the rest of the session.
+EXTRACTION_CASES = [
+    ("I hate fiction", {"excluded_categories": ["fiction"]}),
+    ("Please no books by Aksyonov", {"excluded_authors": ["Aksyonov"]}),
+    ("I'm not into fiction", {"excluded_categories": ["fiction"]}),
+    ("I don't like fiction or Kubick", {"excluded_categories": ["fiction"], "excluded_authors": ["Kubick"]}),
+    ("I love history but not fiction", {"excluded_categories": ["fiction"]}),
+    ("History books. No fiction", {"excluded_categories": ["fiction"]}),
+    ("I don't want fiction, but I love history", {"excluded_categories": ["fiction"]}),
+    ("Show me some biographies", {}),
+    # Words that aren't catalog categories or authors are never kept
+    ("I hate politics", {}),
+    ("I don't like politics but I love history books", {}),
+    # The negation isn't about a category or author
+    ("I don't mind fiction", {}),
+    ("I'm not sure, maybe history", {}),
+    ("I don't want long books about history", {}),
+    ("No science fiction", {}),
+]
+
+# Messages of one conversation and the profile after them: liking something takes its dislike back
+PROFILE_CASES = [
+    (["I hate fiction", "Actually I like fiction"], {}),
+    (["I hate fiction", "I don't mind fiction"], {}),
+    (["No fiction or Kubick", "I love Kubick"], {"excluded_categories": ["fiction"]}),
+    (["I hate fiction", "I'm not sure, maybe history"], {"excluded_categories": ["fiction"]}),
+]
+
+_BOOK_PATTERN = re.compile(r"Authors: (?P<authors>.*)\nCategory: (?P<category>.*)")
+
+
+def check_extraction() -> int:
+    vocabulary = get_books_vocabulary()
+    failed = 0
+    for message, expected in EXTRACTION_CASES:
+        dislikes, _ = extract_dislikes(message, vocabulary)
+        failed += dislikes != expected
+        print(f"{message:<50} {dislikes} " + ("OK" if dislikes == expected else f"FAILED: expected {expected}"))
+
+    for messages, expected in PROFILE_CASES:
+        profile = {}
+        for message in messages:
+            merged = merge_dislikes(profile, *extract_dislikes(message, vocabulary))
+            profile = profile if merged is None else merged
+        failed += profile != expected
+        print(f"{' / '.join(messages):<50} {profile} " + ("OK" if profile == expected else f"FAILED: expected {expected}"))
+    return failed
+
+
+def check_books(book_search: str, expected: dict) -> list[str]:
+    errors = []
+    for match in _BOOK_PATTERN.finditer(book_search):
+        authors, category = match.group("authors").lower(), match.group("category").lower()
+        if expected.get("category") and expected["category"] in category:
+            errors.append(f"disliked category: {category}")
+        if expected.get("author") and expected["author"] in authors:
+            errors.append(f"disliked author: {authors}")
+        if expected.get("required_author") and expected["required_author"] not in authors:
+            errors.append(f"not requested author: {authors}")
+    return errors
+
+
+async def run_conversation(transport: str) -> int:
+    plugins = [DislikeProfilePlugin(), BookshopAgentPlugin(log_console=False)]
+    db_plugin = DBAgentPlugin(log_console=False, data_db_path=os.path.join(tempfile.mkdtemp(), "db_agent_data.db"))
+    if transport == "in_process":
+        plugins.append(db_plugin)
+
+    session_service = InMemorySessionService()
+    runner = Runner(
+        agent=get_bookshop_agent(model=StandInLlm(seed=0), db_agent_transport=transport),
+        app_name="agents",
+        session_service=session_service,
+        plugins=plugins,
+    )
+    session = await session_service.create_session(app_name="agents", user_id="default")
+
+    failed = 0
+    for prompt, expected in CONVERSATION:
+        requests = []
+        query = types.Content(role="user", parts=[types.Part(text=prompt)])
+        async for event in runner.run_async(user_id="default", session_id=session.id, new_message=query):
+            requests.extend(call.args.get("request") for call in event.get_function_calls() if call.name == "db_agent")
+
+        session = await session_service.get_session(app_name="agents", user_id="default", session_id=session.id)
+        book_search = session.state.get("book_search", "")
+        books = len(_BOOK_PATTERN.findall(book_search))
+        errors = check_books(book_search, expected)
+        if not books:
+            errors.append("no books found")
+        failed += bool(errors)
+
+        print(f"User: {prompt}")
+        print(f"  db_agent request: {requests}")
+        print(f"  dislike profile: {session.state.get(DISLIKES_STATE_KEY)}")
+        print(f"  {books} books, " + ("OK" if not errors else f"FAILED: {errors}"))
+
+    await db_plugin.close()
+    return failed
+
+
+async def main():
+    warnings.filterwarnings("ignore")
+    port = urlparse(DB_AGENT_URL).port
+    server = start_server(1, port, 0.0, shared_sessions=False)
+    try:
+        async with httpx.AsyncClient() as client:
+            await wait_for_server(client, DB_AGENT_URL)
+
+        print("Dislikes extracted from single messages")
+        failed = check_extraction()
+        for transport in DB_AGENT_TRANSPORTS:
+            print(f"\n{transport} db_agent")
+            failed += await run_conversation(transport)
+        print(f"\n{'All checks passed' if not failed else f'{failed} checks failed'}")
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+
+
+if __name__=="__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import sys
+import random
+
+import numpy as np
+
+from db_agent.books_db import page_rowids
+
+# Pages of a random search (search_books_page) are read from the matching rowids in the order of the index or scan
+# that found them, so a page must not be a slice of that order. Compared with random.sample over many seeds:
+# - share of first pages whose books all lie within a CLUSTER_WINDOW share of the matches,
+# - how evenly every match shows up on a first page,
+# - that the pages of one seed never repeat a book and together return every match.
+MATCHES = 10_000
+PAGE_SIZE = 10
+SEEDS = 20_000
+CLUSTER_WINDOW = 0.05
+# Largest accepted share of clustered pages and spread of per-match counts over random.sample's
+MAX_CLUSTERED_SHARE = 0.001
+MAX_SPREAD_RATIO = 1.2
+
+EVEN_MATCHES = 200
+EVEN_SEEDS = 50_000
+COVERAGE_SIZES = [1, 2, 3, 10, 97, 1000]
+
+
+def clustered_share(pages: list[list[int]], n: int) -> float:
+    return sum(max(page) - min(page) < CLUSTER_WINDOW * n for page in pages) / len(pages)
+
+
+def spread(pages: list[list[int]], n: int) -> float:
+    # Coefficient of variation of the number of first pages every match appears on
+    counts = np.bincount(np.concatenate(pages), minlength=n)
+    return float(counts.std() / counts.mean())
+
+
+def first_pages(n: int, seeds: int) -> list[list[int]]:
+    rowids = list(range(n))
+    return [page_rowids(rowids, seed, 0, PAGE_SIZE)[0] for seed in range(seeds)]
+
+
+def sampled_pages(n: int, seeds: int) -> list[list[int]]:
+    rng = random.Random(0)
+    return [rng.sample(range(n), PAGE_SIZE) for _ in range(seeds)]
+
+
+def all_pages(n: int, seed: int) -> list[int]:
+    rowids = list(range(n))
+    books, offset = [], 0
+    while offset is not None:
+        page, offset = page_rowids(rowids, seed, offset, PAGE_SIZE)
+        books.extend(page)
+    return books
+
+
+def main():
+    failed = 0
+
+    pages_share = clustered_share(first_pages(MATCHES, SEEDS), MATCHES)
+    sample_share = clustered_share(sampled_pages(MATCHES, SEEDS), MATCHES)
+    ok = pages_share <= MAX_CLUSTERED_SHARE
+    failed += not ok
+    print(
+        f"First pages within {CLUSTER_WINDOW:.0%} of {MATCHES} matches: {pages_share:.2%} "
+        f"(random.sample: {sample_share:.2%}) " + ("OK" if ok else "FAILED")
+    )
+
+    pages_spread = spread(first_pages(EVEN_MATCHES, EVEN_SEEDS), EVEN_MATCHES)
+    sample_spread = spread(sampled_pages(EVEN_MATCHES, EVEN_SEEDS), EVEN_MATCHES)
+    ok = pages_spread <= sample_spread * MAX_SPREAD_RATIO
+    failed += not ok
+    print(
+        f"Spread of first page counts over {EVEN_MATCHES} matches: {pages_spread:.3f} "
+        f"(random.sample: {sample_spread:.3f}) " + ("OK" if ok else "FAILED")
+    )
+
+    for n in COVERAGE_SIZES:
+        books = all_pages(n, seed=n)
+        ok = sorted(books) == list(range(n))
+        failed += not ok
+        print(f"All pages of {n} matches return every match once: " + ("OK" if ok else "FAILED"))
+
+    print(f"\n{'All checks passed' if not failed else f'{failed} checks failed'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,88 @@
+from db_agent.db_agent import query_books_db, query_books_db_async
+from db_agent.books_db import get_books_cache
+
+import asyncio
+import time
+
+# Simulated sessions, each making a few tool calls like db_agent does
+SESSIONS = 8
+CALLS_PER_SESSION = 4
+SESSION_FILTERS = [
+    {"included_categories": ["biography"], "included_authors": ["Stanley"]},
+    {"excluded_categories": ["fiction"], "excluded_authors": ["Kubick"]},
+    {"included_categories": ["biography"], "included_keywords": ["company"]},
+    {"included_categories": ["history"], "excluded_keywords": ["politics"]},
+]
+
+
+async def heartbeat(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """
+    Measure the longest time the event loop was blocked while sessions were running
+    """
+
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - start - interval)
+    return max_lag
+
+
+async def run_session(session_id: int, use_async: bool, events: list) -> None:
+    filters = SESSION_FILTERS[session_id % len(SESSION_FILTERS)]
+    for _ in range(CALLS_PER_SESSION):
+        # Clear the result cache so every call hits SQLite
+        get_books_cache().clear()
+
+        events.append((time.perf_counter(), session_id, "start"))
+        if use_async:
+            result = await query_books_db_async(**filters)
+        else:
+            result = query_books_db(**filters)
+        events.append((time.perf_counter(), session_id, "end"))
+
+        assert result["status"] in ("success", "error")
+        await asyncio.sleep(0)
+
+
+def max_in_flight(events: list) -> int:
+    in_flight = 0
+    peak = 0
+    for _, _, kind in sorted(events):
+        in_flight += 1 if kind == "start" else -1
+        peak = max(peak, in_flight)
+    return peak
+
+
+async def run(use_async: bool) -> int:
+    events = []
+    stop = asyncio.Event()
+    heartbeat_task = asyncio.create_task(heartbeat(stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(i, use_async, events) for i in range(SESSIONS)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    max_lag = await heartbeat_task
+
+    peak = max_in_flight(events)
+    print(f"{'async' if use_async else 'sync'} tool:")
+    print(f"Total time: {elapsed * 1000:.1f} ms")
+    print(f"Longest event loop stall: {max_lag * 1000:.1f} ms")
+    print(f"Sessions with a query in flight at the same time: {peak}\n")
+    return peak
+
+
+async def main():
+    print(f"Running {SESSIONS} sessions with {CALLS_PER_SESSION} tool calls each\n")
+    sync_peak = await run(use_async=False)
+    async_peak = await run(use_async=True)
+
+    assert sync_peak == 1, "The sync tool should serialize all sessions"
+    assert async_peak > 1, "Sessions should make progress at the same time with the async tool"
+    print("Async tool lets several sessions make progress at the same time")
+
+
+if __name__=="__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from booskshop_agent.bookshop_agent import get_bookshop_agent, BookshopAgentPlugin
+from booskshop_agent.dislike_profile import DislikeProfilePlugin
+from booskshop_agent.response_cache import RESPONSE_STATE_KEY, ResponseCache, ResponseCachePlugin, is_continuation
+from db_agent.db_agent import DBAgentPlugin
+from stand_in_llm.stand_in_llm import StandInLlm
+
+import os
+import re
+import asyncio
+import tempfile
+import warnings
+
+# Bookshop conversations (stand-in model, in-process db_agent) sharing one response cache.
+# "More" turns depend on the search of their own session, so they must never be served from the cache:
+# not the previous page of the same session, and not a page of another session with the same prompt.
+# A new search with an already answered prompt is a cache hit, also later in a long-lived session
+# (scripts/run_bookshop_agent keeps one "default" session).
+CONVERSATIONS = [
+    ("A", ["history books", "show me more", "show me more"]),
+    ("B", ["cooking books", "show me more"]),
+    ("C", ["history books"]),
+    ("D", ["biographies", "show me more", "cooking books", "history books"]),
+]
+EXPECTED_HITS = {("C", "history books"), ("D", "cooking books"), ("D", "history books")}
+
+_TITLE_PATTERN = re.compile(r"Title: (.*)")
+
+
+async def main():
+    warnings.filterwarnings("ignore")
+    tmp_dir = tempfile.mkdtemp()
+    cache = ResponseCache(db_path=os.path.join(tmp_dir, "bookshop_response_cache.db"))
+    db_plugin = DBAgentPlugin(log_console=False, data_db_path=os.path.join(tmp_dir, "db_agent_data.db"))
+
+    session_service = InMemorySessionService()
+    runner = Runner(
+        agent=get_bookshop_agent(model=StandInLlm(seed=0), db_agent_transport="in_process"),
+        app_name="agents",
+        session_service=session_service,
+        plugins=[
+            DislikeProfilePlugin(),
+            ResponseCachePlugin(cache),
+            BookshopAgentPlugin(log_console=False, response_cache=cache),
+            db_plugin,
+        ],
+    )
+
+    failed = 0
+    pages = {}
+    for name, prompts in CONVERSATIONS:
+        session = await session_service.create_session(app_name="agents", user_id="default")
+        previous = None
+        for prompt in prompts:
+            hits = cache.stats()["hits"]
+            query = types.Content(role="user", parts=[types.Part(text=prompt)])
+            async for _ in runner.run_async(user_id="default", session_id=session.id, new_message=query):
+                pass
+
+            session = await session_service.get_session(app_name="agents", user_id="default", session_id=session.id)
+            titles = tuple(_TITLE_PATTERN.findall(session.state.get(RESPONSE_STATE_KEY, "")))
+            hit = cache.stats()["hits"] > hits
+
+            errors = []
+            if hit != ((name, prompt) in EXPECTED_HITS):
+                errors.append("served from the cache" if hit else "not served from the cache")
+            if previous is not None and titles == previous:
+                errors.append("same page as the previous turn")
+            if not titles:
+                errors.append("no books")
+            others = [other for other, page in pages.items() if page == titles and other[0] != name]
+            if is_continuation(prompt) and others:
+                errors.append(f"page of session {others[0][0]}")
+            failed += bool(errors)
+
+            pages[(name, prompt, len(pages))] = titles
+            previous = titles
+            print(f"Session {name}, user: {prompt:<16} cache {'hit ' if hit else 'miss'} " + ("OK" if not errors else f"FAILED: {errors}"))
+
+    await db_plugin.close()
+    print(f"\nResponse cache: {cache.stats()}")
+    print(f"{'All turns passed' if not failed else f'{failed} turns failed'}")
+
+
+if __name__=="__main__":
+    asyncio.run(main())
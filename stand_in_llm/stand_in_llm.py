@@ -0,0 +1,301 @@
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types, errors
+
+from db_agent.db_agent import format_books
+from db_agent.fast_path import NEGATION_WORDS, REQUEST_STOP_WORDS, extract_cursor, extract_query_arguments, get_books_vocabulary
+
+import os
+import re
+import math
+import random
+import asyncio
+from pydantic import PrivateAttr
+from typing import AsyncGenerator, Optional
+
+# Set STAND_IN_MODEL=1 to run the agents with StandInLlm instead of Gemini (no API key or network needed)
+STAND_IN_MODEL_ENV = "STAND_IN_MODEL"
+STAND_IN_LATENCY_MS_ENV = "STAND_IN_LATENCY_MS"
+STAND_IN_ERROR_RATE_ENV = "STAND_IN_ERROR_RATE"
+
+# Rough number of characters per token used to simulate token counts
+CHARS_PER_TOKEN = 4
+
+# Requests for more books of the previous search
+MORE_REQUEST_PATTERN = re.compile(r"\b(more|another)\b", re.IGNORECASE)
+
+_ERROR_STATUSES = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED"}
+_WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'\-]*")
+_BOOK_PATTERN = re.compile(
+    r"Title: (?P<title>.*)\n"
+    r"Authors: (?P<authors>.*)\n"
+    r"Category: (?P<category>.*)\n"
+    r"Summary: (?P<summary>.*)\n"
+    r"Publisher: (?P<publisher>.*)\n"
+    r"Price: (?P<price>.*)\n"
+    r"Publication Year: (?P<year>.*)"
+)
+
+
+def count_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _texts(content: types.Content) -> list[str]:
+    return [part.text for part in content.parts or [] if part.text]
+
+
+def _function_responses(content: types.Content) -> list[types.FunctionResponse]:
+    return [part.function_response for part in content.parts or [] if part.function_response]
+
+
+class StandInLlm(BaseLlm):
+    """
+    Local deterministic replacement of Gemini for offline load tests of the agents.
+    Scripted rules decide the response from the tools the agent has:
+    - query_books_db (db_agent): extract the arguments from the request (query_books_db relaxes them
+      when nothing is found) and return the books in the format of the db_agent instruction
+    - db_agent (search_agent): pass the prompt to db_agent and wrap its answer,
+      or ask for more books of the previous search with its cursor
+    - no tools (recommend_agent): pick up to 5 books from the search results in the system instruction
+
+    Latency grows with the number of output tokens, and 429/503 errors are injected with error_rate.
+    Injected errors are retried like google-genai does when retry_options are given.
+    """
+
+    model: str = "stand-in-llm"
+    latency_seconds: float = 0.0
+    latency_per_token_seconds: float = 0.0
+    latency_jitter: float = 0.0
+    error_rate: float = 0.0
+    error_codes: tuple[int, ...] = (429, 503)
+    retry_options: Optional[types.HttpRetryOptions] = None
+    seed: Optional[int] = None
+
+    _rng: random.Random = PrivateAttr(default=None)
+    _stats: dict = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context) -> None:
+        self._rng = random.Random(self.seed)
+        self._stats = {
+            "calls": 0,
+            "responses": 0,
+            "errors": 0,
+            "retries": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "simulated_seconds": 0.0,
+        }
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"stand-in-.*"]
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False
+        ) -> AsyncGenerator[LlmResponse, None]:
+        self._stats["calls"] += 1
+
+        attempts = (self.retry_options.attempts or 1) if self.retry_options else 1
+        for attempt in range(1, attempts + 1):
+            code = self._injected_error()
+            if code is None:
+                break
+
+            self._stats["errors"] += 1
+            retryable = self.retry_options and code in (self.retry_options.http_status_codes or [])
+            if not retryable or attempt == attempts:
+                await self._sleep(self.latency_seconds)
+                raise self._api_error(code)
+
+            # Same exponential backoff as google-genai retries
+            self._stats["retries"] += 1
+            initial_delay = self.retry_options.initial_delay or 1.0
+            exp_base = self.retry_options.exp_base or 2.0
+            delay = initial_delay * exp_base ** (attempt - 1)
+            await self._sleep(min(delay, self.retry_options.max_delay or delay))
+
+        content = await self._respond(llm_request)
+
+        input_tokens = count_tokens(str(llm_request.config.system_instruction or "")) + sum(
+            count_tokens(str(part.to_json_dict())) for c in llm_request.contents for part in c.parts or []
+        )
+        output_tokens = sum(count_tokens(str(part.to_json_dict())) for part in content.parts or [])
+        self._stats["responses"] += 1
+        self._stats["input_tokens"] += input_tokens
+        self._stats["output_tokens"] += output_tokens
+
+        latency = self.latency_seconds + self.latency_per_token_seconds * output_tokens
+        await self._sleep(latency * (1 + self._rng.uniform(-self.latency_jitter, self.latency_jitter)))
+
+        yield LlmResponse(
+            content=content,
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=input_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=input_tokens + output_tokens,
+            ),
+        )
+
+    def _injected_error(self) -> Optional[int]:
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return self._rng.choice(self.error_codes)
+        return None
+
+    @staticmethod
+    def _api_error(code: int) -> errors.APIError:
+        response_json = {
+            "error": {
+                "code": code,
+                "message": "Error injected by StandInLlm",
+                "status": _ERROR_STATUSES.get(code, "UNKNOWN"),
+            }
+        }
+        if code < 500:
+            return errors.ClientError(code, response_json)
+        return errors.ServerError(code, response_json)
+
+    async def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self._stats["simulated_seconds"] += seconds
+            await asyncio.sleep(seconds)
+
+    async def _respond(self, llm_request: LlmRequest) -> types.Content:
+        tools = llm_request.tools_dict
+        if "query_books_db" in tools:
+            return await self._db_agent_response(llm_request)
+        if "db_agent" in tools:
+            return self._search_agent_response(llm_request)
+        return self._recommend_agent_response(llm_request)
+
+    @staticmethod
+    def _user_texts(llm_request: LlmRequest) -> list[str]:
+        # Messages of other agents are passed as user messages starting with "For context:"
+        texts = [" ".join(_texts(content)) for content in llm_request.contents if content.role == "user"]
+        return [text for text in texts if text and not text.startswith("For context:")]
+
+    async def _db_agent_response(self, llm_request: LlmRequest) -> types.Content:
+        user_texts = self._user_texts(llm_request)
+        prompt = user_texts[-1] if user_texts else ""
+
+        # Function responses for the current prompt
+        responses = []
+        for content in llm_request.contents:
+            if content.role == "user" and _texts(content):
+                responses = []
+            responses.extend(_function_responses(content))
+
+        if responses:
+            result = responses[-1].response or {}
+            if result.get("status") == "success":
+                text = format_books(result["books"], result.get("cursor"), result.get("relaxations"))
+            else:
+                # The search was already relaxed by query_books_db, so it isn't retried
+                text = "The search returned no results."
+            return types.Content(role="model", parts=[types.Part(text=text)])
+
+        arguments = await self._extract_arguments(prompt)
+
+        return types.Content(
+            role="model",
+            parts=[types.Part(function_call=types.FunctionCall(name="query_books_db", args=arguments))]
+        )
+
+    @staticmethod
+    async def _extract_arguments(prompt: str) -> dict:
+        cursor = extract_cursor(prompt)
+        if cursor is not None:
+            return {"cursor": cursor}
+
+        vocabulary = await asyncio.get_running_loop().run_in_executor(None, get_books_vocabulary)
+        arguments = extract_query_arguments(prompt, vocabulary)
+        if not arguments:
+            # Fall back to the longest word of the prompt that isn't a stop word as a keyword
+            words = [
+                w for w in _WORD_PATTERN.findall(prompt.lower())
+                if w not in REQUEST_STOP_WORDS and w not in NEGATION_WORDS and w not in vocabulary.stop_words
+            ]
+            arguments = {"included_keywords": [max(words, key=len)]} if words else {}
+        return {**arguments, "relax": True}
+
+    def _search_agent_response(self, llm_request: LlmRequest) -> types.Content:
+        user_texts = self._user_texts(llm_request)
+        prompt = user_texts[-1] if user_texts else ""
+
+        for content in reversed(llm_request.contents):
+            responses = _function_responses(content)
+            if responses:
+                result = (responses[-1].response or {}).get("result", "")
+                return types.Content(
+                    role="model",
+                    parts=[types.Part(text=f"Books search: {result}\nUser prompt: {prompt}")]
+                )
+            if content.role == "user" and _texts(content):
+                break
+
+        # A request for more books continues the last search that returned a cursor
+        if MORE_REQUEST_PATTERN.search(prompt):
+            cursor = self._last_cursor(llm_request)
+            if cursor is not None:
+                return types.Content(
+                    role="model",
+                    parts=[types.Part(function_call=types.FunctionCall(
+                        name="db_agent", args={"request": f"More books for results cursor {cursor}"}
+                    ))]
+                )
+
+        # Earlier dislikes are applied by db_agent from the dislike profile
+        return types.Content(
+            role="model",
+            parts=[types.Part(function_call=types.FunctionCall(name="db_agent", args={"request": prompt}))]
+        )
+
+    @staticmethod
+    def _last_cursor(llm_request: LlmRequest) -> Optional[str]:
+        for content in reversed(llm_request.contents):
+            texts = _texts(content) + [
+                str((response.response or {}).get("result", "")) for response in _function_responses(content)
+            ]
+            for text in reversed(texts):
+                cursor = extract_cursor(text)
+                if cursor is not None:
+                    return cursor
+        return None
+
+    def _recommend_agent_response(self, llm_request: LlmRequest) -> types.Content:
+        instruction = str(llm_request.config.system_instruction or "")
+        books = list(_BOOK_PATTERN.finditer(instruction))[:5]
+        if not books:
+            text = "The search was unsuccessful. Is there anything else I can help you with?"
+            return types.Content(role="model", parts=[types.Part(text=text)])
+
+        lines = ["The search was successful. Here are the books I recommend:"]
+        for book in books:
+            lines.append(
+                f"Title: {book['title']}\n"
+                f"Authors: {book['authors']}\n"
+                f"Category: {book['category']}\n"
+                f"Summary: {book['summary']}\n"
+                f"Publisher: {book['publisher']}\n"
+                f"Price: {book['price']}\n"
+                f"Publication Year: {book['year']}\n"
+            )
+        lines.append("If you want more recommendations feel free to ask")
+        return types.Content(role="model", parts=[types.Part(text="\n".join(lines))])
+
+
+def stand_in_model_from_env() -> Optional[StandInLlm]:
+    """
+    Return a StandInLlm configured from environment variables if STAND_IN_MODEL is set, otherwise None
+    """
+
+    if not os.getenv(STAND_IN_MODEL_ENV):
+        return None
+    return StandInLlm(
+        latency_seconds=float(os.getenv(STAND_IN_LATENCY_MS_ENV, "0")) / 1000,
+        error_rate=float(os.getenv(STAND_IN_ERROR_RATE_ENV, "0")),
+    )